@@ -5,8 +5,9 @@ from translation_utils import translate_text
 import os
 import shutil
 from pathlib import Path
-from pypdf import PdfReader, PdfWriter
-import subprocess
+import pikepdf
+from split_engine import range_parts, iter_split
+from compress_engine import compress
 from datetime import datetime
 
 # Global config (should match app.py or be injected)
@@ -63,39 +64,23 @@ def split_pdf(pdf_path: str, page_ranges: str) -> str:
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
     
     try:
-        reader = PdfReader(pdf_path)
-        total_pages = len(reader.pages)
         ranges = [r.strip() for r in page_ranges.split(',')]
         output_files = []
         base_name = os.path.splitext(os.path.basename(pdf_path))[0]
         
-        for i, r in enumerate(ranges):
-            writer = PdfWriter()
-            if '-' in r:
-                try:
-                    start, end = map(int, r.split('-'))
-                except ValueError:
-                    return f"Error: Invalid range format '{r}'"
-            else:
-                try:
-                    start = int(r)
-                    end = int(r)
-                except ValueError:
-                    return f"Error: Invalid page number '{r}'"
-                
-            if start < 1 or end > total_pages or start > end:
-                continue
-                
-            # pypdf is 0-indexed
-            for p in range(start - 1, end):
-                if p < total_pages:
-                    writer.add_page(reader.pages[p])
-                
-            out_name = f"{base_name}_split_{r}.pdf"
-            out_path = os.path.join(OUTPUT_FOLDER, out_name)
-            with open(out_path, "wb") as f:
-                writer.write(f)
-            output_files.append(str(out_path)) # Return absolute path
+        with pikepdf.open(pdf_path) as pdf:
+            try:
+                parts, _ = range_parts(ranges, len(pdf.pages))
+            except ValueError:
+                return f"Error: Invalid range format in '{page_ranges}'"
+            
+            # All parts are built from one open source
+            for part, data in iter_split(pdf, parts):
+                out_name = f"{base_name}_split_{part['label']}.pdf"
+                out_path = os.path.join(OUTPUT_FOLDER, out_name)
+                with open(out_path, "wb") as f:
+                    f.write(data)
+                output_files.append(str(out_path)) # Return absolute path
             
         if not output_files:
             return "No valid pages extracted. Check page numbers."
@@ -105,10 +90,13 @@ def split_pdf(pdf_path: str, page_ranges: str) -> str:
         return f"Error splitting PDF: {str(e)}"
 
 @tool
-def compress_pdf(pdf_path: str) -> str:
+def compress_pdf(pdf_path: str, quality: str = "ebook", engine: str = "ghostscript") -> str:
     """Compress the PDF file to reduce its size.
     Args:
         pdf_path: Path to the PDF file.
+        quality: screen (smallest), ebook (default), printer, prepress (highest),
+            or scan for scanned documents.
+        engine: ghostscript (default) or native (in-process; required for scan).
     Returns:
         Path to the compressed file.
     """
@@ -122,16 +110,12 @@ def compress_pdf(pdf_path: str) -> str:
     out_name = f"{base_name}_compressed_{timestamp}.pdf"
     out_path = os.path.join(OUTPUT_FOLDER, out_name)
     
-    cmd = [
-        "gs", "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.4", "-dPDFSETTINGS=/ebook",
-        "-dNOPAUSE", "-dQUIET", "-dBATCH",
-        f"-sOutputFile={out_path}",
-        pdf_path
-    ]
-    
     try:
-        subprocess.run(cmd, check=True)
-        return f"Compressed file saved to: {out_path}"
+        stats = compress(pdf_path, out_path, quality, engine)
+        return (
+            f"Compressed file saved to: {out_path} "
+            f"({stats['original_size']} -> {stats['compressed_size']} bytes)"
+        )
     except Exception as e:
         return f"Compression failed: {str(e)}"
 
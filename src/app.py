@@ -17,7 +17,6 @@ import zipfile
 import pdfplumber
 import redis
 from pypdf import PdfReader, PdfWriter
-from pdf2image import convert_from_path
 from PIL import Image, ImageChops, ImageDraw
 import pikepdf
 
@@ -32,6 +31,7 @@ from pipeline_executor import PipelineExecutor
 from dotenv import load_dotenv
 from cloud_routes import cloud_bp
 from database import init_db, get_document_state, update_document_state
+from zip_stream import iter_zip
 
 # Initialize logging
 setup_logging()
@@ -132,24 +132,12 @@ def create_zip():
     if not filenames:
         return {'error': 'No filenames provided'}, 400
 
-
-
-    memory_file = io.BytesIO()
-
-    with zipfile.ZipFile(memory_file, 'w') as zf:
-        for fname in filenames:
-            file_path = os.path.join(app.config['OUTPUT_FOLDER'], fname)
-            if os.path.exists(file_path):
-                zf.write(file_path, fname)
-    
-    memory_file.seek(0)
-    return  (
-        memory_file,
-        200,
-        {
-            'Content-Type': 'application/zip',
-            'Content-Disposition': 'attachment; filename="batch_results.zip"'
-        }
+    # Stream the archive as it is built instead of assembling it in memory
+    members = ((fname, os.path.join(app.config['OUTPUT_FOLDER'], fname)) for fname in filenames)
+    return Response(
+        stream_with_context(iter_zip(members)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename="batch_results.zip"'}
     )
 
 @app.route('/editor/<filename>')
@@ -323,6 +311,11 @@ def task_status(task_id):
                 'current': task.info.get('current', 0) if isinstance(task.info, dict) else 0,
                 'total': task.info.get('total', 100) if isinstance(task.info, dict) else 100,
             }
+            # Optional timing details reported by long-running tasks (e.g. OCR)
+            if isinstance(task.info, dict):
+                for key in ('elapsed', 'eta', 'pages_completed', 'pages_total'):
+                    if key in task.info:
+                        response[key] = task.info[key]
             if task.state == 'SUCCESS':
                  response['result_file'] = task.info.get('result_file')
         else:
@@ -342,11 +335,16 @@ def task_status(task_id):
 def show_results(filename):
     return render_template('results.html', files=[filename])
 
+# send_from_directory answers Range requests and ETag revalidation by
+# default, which the viewer relies on to load linearized PDFs (see
+# pdf_output) page by page.
 @app.route('/outputs/<filename>')
 def download_file(filename):
     if secure_filename(filename) != filename:
          return "Invalid filename", 400
-    return send_from_directory(app.config['OUTPUT_FOLDER'], filename, as_attachment=True)
+    # ?inline=1 lets a browser viewer open the file instead of downloading it
+    inline = request.args.get('inline') == '1'
+    return send_from_directory(app.config['OUTPUT_FOLDER'], filename, as_attachment=not inline)
 
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
@@ -0,0 +1,660 @@
+"""
+Native PDF compressor (pikepdf + Pillow), the in-process alternative to Ghostscript.
+
+Ghostscript re-interprets the whole document on one core, can make files
+larger and sometimes damages forms. This engine leaves the document structure
+alone and only rewrites image XObjects and stream encodings:
+
+1. Every page is scanned once with PyMuPDF to find the largest size at which
+   each image is drawn, which gives its effective resolution.
+2. Each image drawn above the preset's threshold is downsampled to the
+   preset's target DPI and re-encoded, in a pool of worker processes (see
+   worker_pool). Photos become JPEG at the preset quality. Line art and
+   images with few colors stay lossless (Flate), so text and diagrams keep
+   their sharp edges.
+3. A re-encoded image is kept only if it is smaller than the original stream.
+   Unused page resources are removed, streams are recompressed and the file
+   is written with object streams.
+
+If the result is not smaller than the input, the input is returned unchanged.
+
+The 'scan' preset targets scanned documents. Each page image is classified as
+bitonal, grayscale or color. Bitonal images (black text on white) are
+thresholded and stored as 1-bit CCITT Group 4. Grayscale and color images that
+contain text are split into mixed raster content (MRC): the image is replaced
+by a small form XObject that draws a low-resolution JPEG background and, over
+it, the dark text as a full-resolution G4 stencil mask in the text's color. Images without text
+fall back to the normal JPEG/Flate path. Pillow has no JBIG2 encoder, so G4 is
+used for every 1-bit layer.
+
+The Ghostscript presets map onto the engine's settings as listed in PRESETS.
+``compress`` runs either engine ('native' or 'ghostscript') with the same
+preset names and returns the same statistics. ``estimate`` predicts the
+native engine's output size and time for every preset from a small sample of
+images, so a preset can be chosen before a full run.
+"""
+import os
+import io
+import zlib
+import time
+import shutil
+import logging
+import threading
+import subprocess
+
+import fitz  # PyMuPDF
+import numpy as np
+import pikepdf
+from PIL import Image
+
+from worker_pool import imap_ordered, default_workers
+from pdf_output import linearize_file
+
+logger = logging.getLogger(__name__)
+
+# Ghostscript -dPDFSETTINGS names -> native settings
+PRESETS = {
+    'screen': {'dpi': 72, 'jpeg_quality': 40, 'reencode_jpeg': True},
+    'ebook': {'dpi': 150, 'jpeg_quality': 60, 'reencode_jpeg': True},
+    'printer': {'dpi': 300, 'jpeg_quality': 80, 'reencode_jpeg': False},
+    'prepress': {'dpi': 300, 'jpeg_quality': 90, 'reencode_jpeg': False},
+}
+PRESETS['default'] = PRESETS['ebook']
+# Scanned documents: 1-bit G4 text at up to 300 dpi, MRC backgrounds at 100 dpi
+PRESETS['scan'] = {'dpi': 300, 'jpeg_quality': 50, 'reencode_jpeg': True, 'scan': True, 'background_dpi': 100}
+
+ENGINES = ('native', 'ghostscript')
+ESTIMATE_QUALITIES = ('screen', 'ebook', 'printer', 'prepress')
+# Images decoded per estimate; each is encoded once per preset
+SAMPLE_IMAGES = 6
+DEFAULT_ENGINE = 'ghostscript'
+
+# Like Ghostscript, only downsample images above threshold x target DPI
+DOWNSAMPLE_THRESHOLD = 1.5
+# Images with at most this many distinct colors are treated as line art
+LINE_ART_MAX_COLORS = 64
+# Images smaller than this (in pixels) are not worth a worker round trip
+MIN_IMAGE_PIXELS = 32 * 32
+# Stream filters whose images are decoded and re-encoded
+DECODABLE_FILTERS = frozenset({
+    '/FlateDecode', '/DCTDecode', '/LZWDecode', '/RunLengthDecode', '/ASCII85Decode', '/ASCIIHexDecode',
+})
+
+# Scan classification: a pixel is colored if its channels differ by more than
+# COLOR_CHROMA, and an image is color if more than COLOR_FRACTION of pixels are
+COLOR_CHROMA = 40
+COLOR_FRACTION = 0.01
+# Grayscale images with fewer mid-tone pixels than this are treated as bitonal
+BITONAL_MIDTONES = 0.05
+# MRC: pixels darker than this (or the Otsu level, if lower) belong to the text mask
+MRC_TEXT_LEVEL = 128
+# MRC: pixels more saturated than this are never text (colored graphics)
+MRC_TEXT_CHROMA = 80
+# MRC is used when the text mask covers this fraction of the image
+MRC_TEXT_COVERAGE = (0.001, 0.4)
+# Pixels sampled per side when classifying
+CLASSIFY_SAMPLE = 512
+
+# (source key, pikepdf.Pdf) of the document being compressed, per worker process
+# or thread. Closed when compress_pdf/estimate return (inline runs share it).
+_worker = threading.local()
+
+
+def _image_placements(pdf_path):
+    """xref -> (largest drawn width, height) in points, and the first page it appears on.
+
+    ``get_image_bbox`` only interprets the content streams; images are not decoded.
+    """
+    placements = {}
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            for item in page.get_images(full=True):
+                xref = item[0]
+                try:
+                    rect = page.get_image_bbox(item)
+                except Exception:
+                    continue
+                if rect.is_empty or rect.is_infinite:
+                    continue
+                width, height, first_page = placements.get(xref, (0, 0, page.number + 1))
+                placements[xref] = (max(width, rect.width), max(height, rect.height), first_page)
+    return placements
+
+
+def _colorspace_components(colorspace):
+    """Number of color components for Device/ICC color spaces, else None."""
+    if colorspace in ('/DeviceRGB', '/DeviceGray'):
+        return 3 if colorspace == '/DeviceRGB' else 1
+    if isinstance(colorspace, pikepdf.Array) and len(colorspace) == 2 and colorspace[0] == '/ICCBased':
+        components = int(colorspace[1].get('/N', 0))
+        return components if components in (1, 3) else None
+    return None
+
+
+def _filters(image):
+    filters = image.get('/Filter')
+    if isinstance(filters, pikepdf.Array):
+        return [str(f) for f in filters]
+    return [str(filters)] if filters else []
+
+
+def _candidate(image):
+    """Whether an image stream can be decoded and rewritten without losing information."""
+    if image.get('/ImageMask') or '/SMask' in image or '/Mask' in image or '/Decode' in image:
+        return False
+    if int(image.get('/BitsPerComponent', 8)) not in (1, 8):
+        return False
+    if _colorspace_components(image.get('/ColorSpace')) is None:
+        return False
+    # JBIG2, CCITT and JPX are already efficient (or not decodable here)
+    return all(f in DECODABLE_FILTERS for f in _filters(image))
+
+
+def _source_key(pdf_path):
+    """Identifies one version of a file: a replaced upload at the same path gets a new key."""
+    st = os.stat(pdf_path)
+    return (os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _open_worker_pdf(source):
+    """The open document for ``source`` (a ``_source_key``), reopened when the key changes."""
+    cached = getattr(_worker, 'pdf', None)
+    if cached is None or cached[0] != source:
+        _close_worker_pdf()
+        _worker.pdf = (source, pikepdf.open(source[0]))
+    return _worker.pdf[1]
+
+
+def _close_worker_pdf():
+    cached = getattr(_worker, 'pdf', None)
+    _worker.pdf = None
+    if cached is not None:
+        cached[1].close()
+
+
+def _encode_image(image, target_size, settings):
+    """Downsamples (if ``target_size``) and encodes a decoded image: Flate for line art, else JPEG."""
+    if target_size is not None:
+        image = image.resize(target_size, Image.Resampling.LANCZOS)
+
+    line_art = image.mode == '1' or image.getcolors(LINE_ART_MAX_COLORS) is not None
+    if line_art:
+        if image.mode not in ('1', 'L', 'RGB'):
+            image = image.convert('RGB')
+        data = zlib.compress(image.tobytes(), 9)
+        encoding = 'flate'
+    else:
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=settings['jpeg_quality'], optimize=True)
+        data = buffer.getvalue()
+        encoding = 'jpeg'
+
+    return {
+        'data': data,
+        'size': len(data),
+        'encoding': encoding,
+        'width': image.width,
+        'height': image.height,
+        'mode': image.mode,
+    }
+
+
+def classify_scan(image):
+    """'bitonal', 'gray' or 'color' for a scanned image, judged on a nearest-neighbour sample."""
+    sample = image.convert('RGB')
+    if max(sample.size) > CLASSIFY_SAMPLE:
+        # Nearest neighbour keeps text edges sharp, so they are not counted as mid-tones
+        scale = CLASSIFY_SAMPLE / max(sample.size)
+        sample = sample.resize((max(1, round(sample.width * scale)), max(1, round(sample.height * scale))),
+                               Image.Resampling.NEAREST)
+    rgb = np.asarray(sample, dtype=np.int16)
+    chroma = rgb.max(axis=2) - rgb.min(axis=2)
+    if np.mean(chroma > COLOR_CHROMA) > COLOR_FRACTION:
+        return 'color'
+    gray = np.asarray(sample.convert('L'))
+    midtones = np.mean((gray > 64) & (gray < 192))
+    return 'bitonal' if midtones < BITONAL_MIDTONES else 'gray'
+
+
+def otsu_threshold(gray):
+    """Otsu's threshold of an 'L' image (the level that best separates dark from light)."""
+    histogram = np.asarray(gray.histogram(), dtype=np.float64)
+    total = histogram.sum()
+    if not total:
+        return MRC_TEXT_LEVEL
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = total - weight_dark
+    cumulative = np.cumsum(histogram * levels)
+    mean_dark = cumulative / np.maximum(weight_dark, 1)
+    mean_light = (cumulative[-1] - cumulative) / np.maximum(weight_light, 1)
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between))
+
+
+def _bitonal(gray, threshold):
+    """Mode '1' image: pixels at or below ``threshold`` black (0), the rest white."""
+    return gray.point(lambda v: 255 if v > threshold else 0, '1')
+
+
+def g4_encode(bitonal):
+    """CCITT Group 4 data of a mode '1' image, as one strip (decode with BlackIs1 true)."""
+    buffer = io.BytesIO()
+    bitonal.save(buffer, 'TIFF', compression='group4', strip_size=2 ** 31 - 1)
+    with Image.open(io.BytesIO(buffer.getvalue())) as tiff:
+        offset, length = tiff.tag_v2[273][0], tiff.tag_v2[279][0]
+    return buffer.getvalue()[offset:offset + length]
+
+
+def _encode_scan(image, target_size, settings, drawn_size):
+    """Scan preset encoding: G4 for bitonal images, MRC for text on gray/color, else JPEG/Flate."""
+    kind = classify_scan(image)
+    if target_size is not None:
+        image = image.resize(target_size, Image.Resampling.LANCZOS)
+    gray = image.convert('L')
+
+    if kind == 'bitonal':
+        data = g4_encode(_bitonal(gray, otsu_threshold(gray)))
+        return {
+            'data': data, 'size': len(data), 'encoding': 'ccitt', 'classification': kind,
+            'width': image.width, 'height': image.height, 'mode': '1',
+        }
+
+    text = np.asarray(gray) <= min(otsu_threshold(gray), MRC_TEXT_LEVEL)
+    rgb = np.asarray(image.convert('RGB'))
+    if kind == 'color':
+        # Dark but saturated areas (a red box) stay in the background
+        chroma = rgb.max(axis=2).astype(np.int16) - rgb.min(axis=2)
+        text &= chroma <= MRC_TEXT_CHROMA
+    coverage = np.count_nonzero(text) / text.size
+    if not MRC_TEXT_COVERAGE[0] <= coverage <= MRC_TEXT_COVERAGE[1]:
+        result = _encode_image(image, None, settings)
+        result['classification'] = kind
+        return result
+    mask = Image.fromarray(~text)  # mode '1': text black (0)
+    text_color = [round(float(c) / 255, 3) for c in rgb[text].mean(axis=0)]
+
+    width_pt, height_pt = drawn_size
+    background_size = (
+        max(1, min(image.width, round(width_pt / 72 * settings['background_dpi']))),
+        max(1, min(image.height, round(height_pt / 72 * settings['background_dpi']))),
+    )
+    background = (gray if kind == 'gray' else image.convert('RGB')).resize(
+        background_size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    background.save(buffer, 'JPEG', quality=settings['jpeg_quality'], optimize=True)
+    data, mask_data = buffer.getvalue(), g4_encode(mask)
+    return {
+        'data': data, 'mask': mask_data, 'size': len(data) + len(mask_data),
+        'encoding': 'mrc', 'classification': kind,
+        'width': image.width, 'height': image.height, 'mode': background.mode,
+        'background_size': background_size, 'text_color': text_color,
+    }
+
+
+def _encode(image, target_size, settings, drawn_size):
+    if settings.get('scan'):
+        return _encode_scan(image, target_size, settings, drawn_size)
+    return _encode_image(image, target_size, settings)
+
+
+def _recompress_image(task):
+    """Worker: decodes, downsamples and re-encodes one image.
+
+    Returns:
+        dict or None: New stream data and geometry, or None to keep the original.
+    """
+    source, objnum, target_size, settings, drawn_size = task
+    try:
+        image_obj = _open_worker_pdf(source).get_object(objnum, 0)
+        if target_size is None and not settings['reencode_jpeg'] and '/DCTDecode' in _filters(image_obj):
+            return None
+        image = pikepdf.PdfImage(image_obj).as_pil_image()
+        return _encode(image, target_size, settings, drawn_size)
+    except Exception as e:
+        logger.info(f"Image {objnum} left unchanged: {e}")
+        return None
+
+
+def _sample_image(task):
+    """Worker for ``estimate``: decodes one image once and encodes it for every preset.
+
+    Returns:
+        dict: quality -> (new stream size or None if the original is kept,
+        seconds a full run would spend on the image: decode plus encode).
+    """
+    source, objnum, drawn_size, variants = task
+    results = {}
+    try:
+        start = time.perf_counter()
+        image_obj = _open_worker_pdf(source).get_object(objnum, 0)
+        is_jpeg = '/DCTDecode' in _filters(image_obj)
+        image = pikepdf.PdfImage(image_obj).as_pil_image()
+        decode_seconds = time.perf_counter() - start
+
+        for quality, target_size, settings in variants:
+            start = time.perf_counter()
+            if target_size is None and not settings['reencode_jpeg'] and is_jpeg:
+                results[quality] = (None, 0.0)
+                continue
+            size = _encode(image, target_size, settings, drawn_size)['size']
+            results[quality] = (size, decode_seconds + time.perf_counter() - start)
+    except Exception as e:
+        logger.info(f"Image {objnum} not sampled: {e}")
+    return results
+
+
+def _target_size(width, height, width_pt, height_pt, settings):
+    """Pixel size to downsample to, or None if the image is already near the preset DPI."""
+    # Effective DPI of the largest placement
+    effective_dpi = min(width / max(width_pt, 1e-3), height / max(height_pt, 1e-3)) * 72
+    if effective_dpi <= settings['dpi'] * DOWNSAMPLE_THRESHOLD:
+        return None
+    scale = settings['dpi'] / effective_dpi
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+
+def _plan_images(pdf, placements):
+    """Images the engine may rewrite.
+
+    Returns:
+        list: ``(objnum, image_obj, first_page, width, height, width_pt, height_pt)``
+        in object order.
+    """
+    planned = []
+    for objnum, (width_pt, height_pt, first_page) in sorted(placements.items()):
+        image_obj = pdf.get_object(objnum, 0)
+        if not isinstance(image_obj, pikepdf.Stream) or image_obj.get('/Subtype') != '/Image':
+            continue
+        if not _candidate(image_obj):
+            continue
+        width, height = int(image_obj.Width), int(image_obj.Height)
+        if width * height < MIN_IMAGE_PIXELS:
+            continue
+        planned.append((objnum, image_obj, first_page, width, height, width_pt, height_pt))
+    return planned
+
+
+def _ccitt_parms(result):
+    return pikepdf.Dictionary(K=-1, Columns=result['width'], Rows=result['height'], BlackIs1=True)
+
+
+def _write_mrc(pdf, image_obj, result):
+    """Turns ``image_obj`` into a form XObject drawing the background and the text mask.
+
+    The mask is painted in the average color of the text pixels.
+
+    The form's bounding box is the unit square, like an image, so every page
+    that draws the image draws the form in the same place.
+    """
+    background = pikepdf.Stream(pdf, result['data'])
+    background.Type = pikepdf.Name.XObject
+    background.Subtype = pikepdf.Name.Image
+    background.Width, background.Height = result['background_size']
+    background.ColorSpace = pikepdf.Name.DeviceGray if result['mode'] == 'L' else pikepdf.Name.DeviceRGB
+    background.BitsPerComponent = 8
+    background.Filter = pikepdf.Name.DCTDecode
+
+    # Stencil mask: 0 (text) samples are painted in the current fill color
+    mask = pikepdf.Stream(pdf, result['mask'])
+    mask.Type = pikepdf.Name.XObject
+    mask.Subtype = pikepdf.Name.Image
+    mask.Width, mask.Height = result['width'], result['height']
+    mask.ImageMask = True
+    mask.Filter = pikepdf.Name.CCITTFaxDecode
+    mask.DecodeParms = _ccitt_parms(result)
+
+    red, green, blue = result['text_color']
+    image_obj.write(f"q /Bg Do Q q {red} {green} {blue} rg /Fg Do Q".encode())
+    for key in list(image_obj.keys()):
+        if key not in ('/Length', '/Type'):
+            del image_obj[key]
+    image_obj.Type = pikepdf.Name.XObject
+    image_obj.Subtype = pikepdf.Name.Form
+    image_obj.BBox = [0, 0, 1, 1]
+    image_obj.Resources = pikepdf.Dictionary(
+        XObject=pikepdf.Dictionary(Bg=pdf.make_indirect(background), Fg=pdf.make_indirect(mask)))
+
+
+def _write_image(image_obj, result):
+    components = 1 if result['mode'] in ('1', 'L') else 3
+    colorspace = image_obj.get('/ColorSpace')
+    if _colorspace_components(colorspace) != components:
+        colorspace = pikepdf.Name.DeviceGray if components == 1 else pikepdf.Name.DeviceRGB
+
+    for key in ('/DecodeParms', '/Interpolate'):
+        if key in image_obj:
+            del image_obj[key]
+    if result['encoding'] == 'ccitt':
+        image_obj.write(result['data'], filter=pikepdf.Name.CCITTFaxDecode, decode_parms=_ccitt_parms(result))
+    else:
+        image_filter = pikepdf.Name.DCTDecode if result['encoding'] == 'jpeg' else pikepdf.Name.FlateDecode
+        image_obj.write(result['data'], filter=image_filter)
+    image_obj.Width = result['width']
+    image_obj.Height = result['height']
+    image_obj.ColorSpace = colorspace
+    image_obj.BitsPerComponent = 1 if result['mode'] == '1' else 8
+
+
+def compress_pdf(input_path, output_path, quality='ebook', workers=None):
+    """Compresses ``input_path`` into ``output_path`` using a Ghostscript-style preset.
+
+    Args:
+        quality (str): 'screen', 'ebook', 'printer', 'prepress', 'default' or 'scan'.
+        workers (int, optional): Image worker processes. Defaults to the CPU count.
+
+    Returns:
+        dict: 'original_size', 'compressed_size', 'images_recompressed' and
+        'images', a list of per-image savings ('page', 'original_size',
+        'new_size', 'saved_bytes', 'original_dimensions', 'new_dimensions',
+        'encoding' and, for the scan preset, 'classification').
+    """
+    settings = PRESETS.get(quality, PRESETS['ebook'])
+    original_size = os.path.getsize(input_path)
+    placements = _image_placements(input_path)
+    source = _source_key(input_path)
+
+    images = []
+    with pikepdf.open(input_path) as pdf:
+        tasks, candidates = [], []
+        for objnum, image_obj, first_page, width, height, width_pt, height_pt in _plan_images(pdf, placements):
+            target_size = _target_size(width, height, width_pt, height_pt, settings)
+            tasks.append((source, objnum, target_size, settings, (width_pt, height_pt)))
+            candidates.append((image_obj, first_page, width, height))
+
+        try:
+            for (image_obj, first_page, width, height), result in zip(
+                    candidates, imap_ordered(_recompress_image, tasks, workers=workers)):
+                if result is None:
+                    continue
+                old_size = len(image_obj.read_raw_bytes())
+                if result['size'] >= old_size:
+                    continue
+                if result['encoding'] == 'mrc':
+                    _write_mrc(pdf, image_obj, result)
+                else:
+                    _write_image(image_obj, result)
+                entry = {
+                    'page': first_page,
+                    'original_size': old_size,
+                    'new_size': result['size'],
+                    'saved_bytes': old_size - result['size'],
+                    'original_dimensions': [width, height],
+                    'new_dimensions': [result['width'], result['height']],
+                    'encoding': result['encoding'],
+                }
+                if 'classification' in result:
+                    entry['classification'] = result['classification']
+                images.append(entry)
+        finally:
+            # Inline runs opened the source in this thread
+            _close_worker_pdf()
+
+        pdf.remove_unreferenced_resources()
+        pdf.save(
+            output_path,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+        )
+
+    compressed_size = os.path.getsize(output_path)
+    if compressed_size >= original_size:
+        # Never hand back a bigger file
+        shutil.copyfile(input_path, output_path)
+        compressed_size = original_size
+        images = []
+
+    return {
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'images_recompressed': len(images),
+        'images': images,
+    }
+
+
+def _spread(items, count):
+    """Up to ``count`` items evenly spaced through ``items`` (first and last included)."""
+    if len(items) <= count:
+        return list(items)
+    if count <= 1:
+        return [items[len(items) // 2]]
+    return [items[round(i * (len(items) - 1) / (count - 1))] for i in range(count)]
+
+
+def estimate(input_path, qualities=None, sample_images=SAMPLE_IMAGES, workers=None):
+    """Predicts the native engine's output size and run time for each preset without a full run.
+
+    Up to ``sample_images`` images, spread evenly through the document, are
+    decoded once each and encoded under every preset. The compression ratio of
+    the sample is applied to the bytes of all rewritable images, and the
+    per-pixel encode time to their total pixel count. Other bytes (text,
+    fonts, vector content) are assumed unchanged, so the estimates lean
+    towards larger sizes.
+
+    Args:
+        qualities (list, optional): Presets to estimate. Defaults to ESTIMATE_QUALITIES.
+
+    Returns:
+        dict: 'original_size', 'images' (rewritable images), 'sampled_images',
+        'image_bytes', 'seconds' (time spent estimating) and 'estimates', one
+        dict per preset with 'quality', 'estimated_size',
+        'estimated_reduction_percent' and 'estimated_seconds'.
+
+    Raises:
+        ValueError: For an unknown preset.
+    """
+    start = time.perf_counter()
+    qualities = list(qualities or ESTIMATE_QUALITIES)
+    unknown = [q for q in qualities if q not in PRESETS]
+    if unknown:
+        raise ValueError(f"Unknown quality preset(s): {', '.join(unknown)}")
+
+    original_size = os.path.getsize(input_path)
+    placements = _image_placements(input_path)
+    with pikepdf.open(input_path) as pdf:
+        planned = _plan_images(pdf, placements)
+        stream_sizes = {entry[0]: int(entry[1].get('/Length', 0)) for entry in planned}
+    scan_seconds = time.perf_counter() - start
+
+    sample = _spread(planned, sample_images)
+    source = _source_key(input_path)
+    tasks = [
+        (source, objnum, (width_pt, height_pt),
+         [(q, _target_size(width, height, width_pt, height_pt, PRESETS[q]), PRESETS[q]) for q in qualities])
+        for objnum, _, _, width, height, width_pt, height_pt in sample
+    ]
+    try:
+        samples = list(imap_ordered(_sample_image, tasks, workers=workers))
+    finally:
+        _close_worker_pdf()
+
+    image_bytes = sum(stream_sizes.values())
+    total_pixels = sum(width * height for _, _, _, width, height, _, _ in planned)
+    parallelism = max(1, min(workers or default_workers(), len(planned) or 1))
+
+    estimates = []
+    for quality in qualities:
+        old_bytes = new_bytes = pixels = 0
+        seconds = 0.0
+        for entry, result in zip(sample, samples):
+            if quality not in result:
+                continue
+            objnum, width, height = entry[0], entry[3], entry[4]
+            size, elapsed = result[quality]
+            old_bytes += stream_sizes[objnum]
+            # The engine keeps the original when re-encoding does not help
+            new_bytes += stream_sizes[objnum] if size is None else min(size, stream_sizes[objnum])
+            pixels += width * height
+            seconds += elapsed
+
+        ratio = new_bytes / old_bytes if old_bytes else 1.0
+        estimated_size = min(original_size, round(original_size - image_bytes * (1 - ratio)))
+        encode_seconds = seconds / pixels * total_pixels / parallelism if pixels else 0.0
+        estimates.append({
+            'quality': quality,
+            'estimated_size': estimated_size,
+            'estimated_reduction_percent':
+                round((original_size - estimated_size) / original_size * 100, 1) if original_size else 0,
+            'estimated_seconds': round(scan_seconds + encode_seconds, 2),
+        })
+
+    return {
+        'original_size': original_size,
+        'images': len(planned),
+        'sampled_images': len(sample),
+        'image_bytes': image_bytes,
+        'seconds': round(time.perf_counter() - start, 3),
+        'estimates': estimates,
+    }
+
+
+def ghostscript_command(input_path, output_path, quality='ebook'):
+    """The Ghostscript pdfwrite command line for a preset."""
+    setting = quality if quality in ESTIMATE_QUALITIES else 'ebook'
+    return [
+        "gs", "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.4",
+        f"-dPDFSETTINGS=/{setting}",
+        "-dNOPAUSE", "-dQUIET", "-dBATCH",
+        f"-sOutputFile={output_path}",
+        str(input_path)
+    ]
+
+
+def compress(input_path, output_path, quality='ebook', engine=DEFAULT_ENGINE, workers=None):
+    """Compresses with the chosen engine.
+
+    Large outputs are linearized for fast web view (see pdf_output).
+
+    Returns:
+        dict: The ``compress_pdf`` statistics plus 'engine' and 'linearized'.
+        Ghostscript does not report per-image savings, so its 'images' list
+        is empty.
+
+    Raises:
+        ValueError: For an unknown engine, or the scan preset with Ghostscript.
+        subprocess.CalledProcessError: If Ghostscript fails.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Allowed: {', '.join(ENGINES)}")
+    if engine == 'ghostscript' and PRESETS.get(quality, {}).get('scan'):
+        raise ValueError("The scan preset requires the native engine")
+    if engine == 'native':
+        stats = compress_pdf(input_path, output_path, quality, workers=workers)
+    else:
+        original_size = os.path.getsize(input_path)
+        subprocess.run(ghostscript_command(input_path, output_path, quality), check=True)
+        stats = {
+            'original_size': original_size,
+            'compressed_size': os.path.getsize(output_path) if os.path.exists(output_path) else 0,
+            'images_recompressed': 0,
+            'images': [],
+        }
+    stats['engine'] = engine
+    stats['linearized'] = False
+    if os.path.exists(output_path):
+        stats['linearized'] = linearize_file(output_path)
+        stats['compressed_size'] = os.path.getsize(output_path)
+    return stats
@@ -2,15 +2,15 @@ import os
 import uuid
 import logging
 import shutil
-import subprocess
 from pathlib import Path
 from flask import current_app
 from tasks import process_pdf_task, run_pdf_extraction
 from extract_full_document_to_word import extract_full_document_to_word
 from extract_tables_to_csv import extract_tables as extract_tables_to_csv
 from extract_tables_to_csv import extract_tables as extract_tables_to_csv
-import pdf2image
 from converters import pdf_to_images, pdf_to_txt
+from zip_stream import write_zip
+from pdfa_engine import convert as convert_pdfa
 
 logger = logging.getLogger(__name__)
 
@@ -66,30 +66,16 @@ class ConversionService:
 
 
     @staticmethod
-    def convert_to_pdfa(pdf_path: str, output_folder: str) -> str:
+    def convert_to_pdfa(pdf_path: str, output_folder: str, level: str = '1b') -> str:
         """
         Converts PDF to PDF/A using Ghostscript.
+        Inputs that already conform are copied without a rewrite (pdfa_engine.precheck).
         """
         base_name = Path(pdf_path).stem
         output_filename = f"{base_name}_pdfa.pdf"
         output_path = os.path.join(output_folder, output_filename)
 
-        # Ghostscript command for PDF/A
-        # This is a standard command, assuming gs is installed.
-        cmd = [
-            "gs",
-            "-dPDFA",
-            "-dBATCH",
-            "-dNOPAUSE",
-            "-sColorConversionStrategy=UseDeviceIndependentColor",
-            "-sProcessColorModel=DeviceCMYK",
-            "-sDEVICE=pdfwrite",
-            "-dPDFACompatibilityPolicy=1",
-            f"-sOutputFile={output_path}",
-            pdf_path
-        ]
-        
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        convert_pdfa(pdf_path, output_path, level)
         return output_filename
 
     @staticmethod
@@ -128,6 +114,7 @@ class ConversionService:
         pdf_path = os.path.join(upload_folder, filename)
         base_name = Path(filename).stem
         options = options or {}
+        stats = {}
         
         try:
             result_file = None
@@ -171,14 +158,13 @@ class ConversionService:
                 os.makedirs(temp_dir, exist_ok=True)
                 
                 try:
-                    files = pdf_to_images(pdf_path, temp_dir, target_format, options)
+                    files = pdf_to_images(pdf_path, temp_dir, target_format, options, stats=stats)
                     
                     if not files:
                         raise Exception("No images generated")
                         
                     if len(files) > 1:
-                        # Zip
-                        shutil.make_archive(temp_dir, 'zip', temp_dir)
+                        # Zip straight into the output folder, in page order
                         result_file = f"{base_name}_{target_format}.zip"
                         # Handle collision
                         final_path = os.path.join(output_folder, result_file)
@@ -186,7 +172,7 @@ class ConversionService:
                             result_file = f"{base_name}_{target_format}_{job_id}.zip"
                             final_path = os.path.join(output_folder, result_file)
                             
-                        shutil.move(f"{temp_dir}.zip", final_path)
+                        write_zip(final_path, ((f, os.path.join(temp_dir, f)) for f in files))
                     else:
                         # Single file (e.g. single page or multipage tiff)
                         # Move it to output
@@ -221,11 +207,13 @@ class ConversionService:
                     if os.path.exists(temp_dir):
                         shutil.rmtree(temp_dir)
             
-            return {
+            result = {
                 'job_id': job_id,
                 'status': 'completed',
                 'output_url': f"/outputs/{result_file}"
             }
+            result.update(stats)
+            return result
 
         except Exception as e:
             logger.error(f"Conversion failed: {e}")
@@ -1,8 +1,8 @@
 import os
-from pdf2image import convert_from_path
-from PIL import Image
+from PIL import TiffImagePlugin
+from page_renderer import iter_pages, render_to_files
 
-def pdf_to_images(pdf_path: str, output_dir: str, target_format='png', options=None):
+def pdf_to_images(pdf_path: str, output_dir: str, target_format='png', options=None, stats=None):
     """
     Converts a PDF to images (PNG, WEBP, TIFF).
     
@@ -10,7 +10,10 @@ def pdf_to_images(pdf_path: str, output_dir: str, target_format='png', options=N
         pdf_path: Path to source PDF
         output_dir: Directory to save output images
         target_format: 'png', 'webp', or 'tiff'
-        options: Dict containing 'dpi', 'quality', 'multipage'
+        options: Dict containing 'dpi', 'quality', 'multipage', 'workers'
+                 (render processes for single-page output; defaults to the CPU count)
+                 and 'passthrough' (export scanned pages from their embedded image)
+        stats: Optional dict that receives 'passthrough_pages'
     
     Returns:
         List of generated filenames
@@ -19,45 +22,51 @@ def pdf_to_images(pdf_path: str, output_dir: str, target_format='png', options=N
     dpi = int(options.get('dpi', 150))
     quality = int(options.get('quality', 85))
     is_multipage = bool(options.get('multipage', False))
+    workers = int(options['workers']) if options.get('workers') else None
+    passthrough = bool(options.get('passthrough', False))
     
-    # Convert PDF to PIL Images
-    images = convert_from_path(pdf_path, dpi=dpi)
     generated_files = []
     
-    base_name = "page"
-    
     if target_format == 'tiff' and is_multipage:
-        # Multi-page TIFF
+        # Multi-page TIFF, appended frame by frame; pages are rendered one at a
+        # time so memory stays bounded regardless of page count
+        pages = iter_pages(pdf_path, dpi=dpi)
         output_filename = "document.tiff"
         output_path = os.path.join(output_dir, output_filename)
         
-        if images:
-            images[0].save(
-                output_path, 
-                save_all=True, 
-                append_images=images[1:], 
-                compression="tiff_deflate"
-            )
+        frames = 0
+        with TiffImagePlugin.AppendingTiffWriter(output_path, True) as tf:
+            for _, img in pages:
+                img.save(tf, 'TIFF', compression="tiff_deflate")
+                tf.newFrame()
+                frames += 1
+        
+        if frames:
             generated_files.append(output_filename)
+        elif os.path.exists(output_path):
+            os.remove(output_path)
             
     else:
-        # Single page images (PNG, WEBP, or single-page TIFF)
-        for i, img in enumerate(images):
-            ext = target_format
-            filename = f"{base_name}_{i+1}.{ext}"
-            output_path = os.path.join(output_dir, filename)
-            
-            save_kwargs = {}
-            format_name = target_format.upper()
-            
-            if target_format == 'webp':
-                save_kwargs['quality'] = quality
-            
-            # PIL expects 'JPEG' not 'JPG'
-            if format_name == 'JPG':
-                format_name = 'JPEG'
-                
-            img.save(output_path, format_name, **save_kwargs)
-            generated_files.append(filename)
+        # Single page images (PNG, WEBP, or single-page TIFF), rendered, encoded
+        # and written by a pool of worker processes
+        save_kwargs = {}
+        format_name = target_format.upper()
+        
+        if target_format == 'webp':
+            save_kwargs['quality'] = quality
+        
+        # PIL expects 'JPEG' not 'JPG'
+        if format_name == 'JPG':
+            format_name = 'JPEG'
+        
+        generated_files = render_to_files(
+            pdf_path, output_dir, format_name,
+            extension=target_format,
+            save_options=save_kwargs,
+            dpi=dpi,
+            workers=workers,
+            passthrough=passthrough,
+            stats=stats,
+        )
             
     return generated_files
@@ -0,0 +1,125 @@
+"""
+OCR fallback for pages without a usable text layer.
+
+Pages are rendered in-process through page_renderer (one open document per job
+instead of one poppler subprocess per page) straight into 8-bit grayscale buffers.
+The raw pixel buffer is handed to Tesseract: via tesserocr's C API when it is
+installed (no encode/decode, no temp files), otherwise wrapped zero-copy in a
+PIL image for pytesseract.
+
+Rendering stays on the calling thread (PyMuPDF is not thread-safe) while
+recognition runs in a bounded thread pool; at most ``max_in_flight`` rendered
+pages exist at any time, which also bounds memory.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from page_renderer import PageRenderer
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+OCR_AVAILABLE = TESSEROCR_AVAILABLE or PYTESSERACT_AVAILABLE
+
+# Matches pdf2image's default, which the previous implementation used
+DEFAULT_OCR_DPI = 200
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class PageOcr:
+    """OCRs selected pages of one PDF.
+
+    Usage:
+        with PageOcr(pdf_path) as ocr:
+            texts = ocr.ocr_pages([0, 4, 7])  # {page_index: text}
+    """
+
+    def __init__(self, pdf_path, language='eng', dpi=DEFAULT_OCR_DPI, workers=None):
+        self.pdf_path = pdf_path
+        self.language = language
+        self.dpi = dpi
+        self.workers = workers or DEFAULT_WORKERS
+        self.max_in_flight = self.workers * 2
+        self._renderer = PageRenderer(pdf_path, dpi=dpi, mode='L')
+        self._pool = None
+        self._local = threading.local()
+        self._apis = []
+        self._apis_lock = threading.Lock()
+
+    def __enter__(self):
+        self._renderer.open()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._pool.shutdown(wait=True)
+        for api in self._apis:
+            api.End()
+        self._apis = []
+        self._renderer.close()
+        return False
+
+    def ocr_pages(self, page_indices):
+        """Renders and recognizes the given 0-based pages.
+
+        Returns:
+            dict: page index -> recognized text ('' if OCR failed for that page).
+        """
+        results = {}
+        pending = []
+
+        for index in page_indices:
+            # Bound the number of rendered pages waiting for a worker
+            while len(pending) >= self.max_in_flight:
+                done_index, future = pending.pop(0)
+                results[done_index] = self._result(future)
+
+            try:
+                pix = self._renderer.render_pixmap(index)
+            except Exception:
+                results[index] = ''
+                continue
+            pending.append((index, self._pool.submit(self._recognize, pix)))
+
+        for done_index, future in pending:
+            results[done_index] = self._result(future)
+        return results
+
+    @staticmethod
+    def _result(future):
+        try:
+            return future.result() or ''
+        except Exception:
+            return ''  # Fallback to empty if OCR fails too
+
+    def _recognize(self, pix):
+        if TESSEROCR_AVAILABLE:
+            api = self._thread_api()
+            api.SetImageBytes(pix.samples, pix.width, pix.height, 1, pix.stride)
+            return api.GetUTF8Text()
+
+        # pytesseract only accepts images/files; wrap the pixmap without copying
+        image = Image.frombuffer('L', (pix.width, pix.height), pix.samples_mv, 'raw', 'L', pix.stride, 1)
+        return pytesseract.image_to_string(image, lang=self.language)
+
+    def _thread_api(self):
+        """One initialized Tesseract instance per worker thread."""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=self.language)
+            api.SetVariable('user_defined_dpi', str(self.dpi))
+            self._local.api = api
+            with self._apis_lock:
+                self._apis.append(api)
+        return api
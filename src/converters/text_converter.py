@@ -1,75 +1,67 @@
 import os
-import pdfplumber
-from pdf2image import convert_from_path
-try:
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
+from contextlib import ExitStack
+from .ocr_fallback import PageOcr, OCR_AVAILABLE
+from .text_engines import iter_page_chunks
 
 def pdf_to_txt(pdf_path: str, output_dir: str, options=None):
     """
     Extracts text from PDF to a TXT file.
-    
+
     Args:
         pdf_path: Path to source PDF
         output_dir: Directory to save output
-        options: Dict containing 'page_separator', 'encoding'
-    
+        options: Dict containing 'page_separator', 'encoding', 'engine'
+                 ('pymupdf', 'pypdfium2' or 'pdfplumber'), 'workers',
+                 'ocr_language' and 'ocr_workers'
+
     Returns:
         List containing the generated filename (usually just one .txt)
     """
     options = options or {}
     use_separator = options.get('page_separator', True)
     encoding = options.get('encoding', 'utf-8')
-    
+    engine = options.get('engine')
+    workers = options.get('workers')
+    ocr_language = options.get('ocr_language', 'eng')
+    ocr_workers = options.get('ocr_workers')
+
     output_filename = "document.txt"
     output_path = os.path.join(output_dir, output_filename)
-    
-    full_text = []
-    
-    # Open PDF
-    with pdfplumber.open(pdf_path) as pdf:
-        total_pages = len(pdf.pages)
-        
-        # Check if we need OCR (if mostly empty)? 
-        # Strategy: Try extract_text. If empty/scant on a page, try OCR for that page.
-        
-        # Lazily load images only if needed to save perf? 
-        # Actually pdfplumber doesn't give images easily for OCR without pdf2image usually.
-        # We'll just iterate pages.
-        
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            
-            # Simple heuristic: if text is None or very short, try OCR
-            if (not text or len(text.strip()) < 5) and OCR_AVAILABLE:
-                # We need to render the page to image to OCR it.
-                # pdfplumber can .to_image() but pdf2image is more robust usually.
-                # Let's use pdfplumber's to_image if available to stay within context, 
-                # or simpler: just use pdf2image for that specific page index.
-                # For simplicity/speed in this slice, let's use global pdf2image if text failed.
+
+    # Opened lazily: most documents never need it
+    ocr = None
+
+    # Pages are extracted in parallel chunks and written as each chunk arrives,
+    # so only the chunks in flight are held in memory, never the whole text.
+    with ExitStack() as stack:
+        f = stack.enter_context(open(output_path, "w", encoding=encoding))
+        first_line = True
+
+        for start, page_texts in iter_page_chunks(pdf_path, engine=engine, workers=workers):
+
+            # Simple heuristic: if text is None or very short, try OCR for that page.
+            empty_pages = [start + j for j, text in enumerate(page_texts) if not text or len(text.strip()) < 5]
+            if empty_pages and OCR_AVAILABLE:
                 try:
-                    # Convert specific page to image
-                    images = convert_from_path(pdf_path, first_page=i+1, last_page=i+1)
-                    if images:
-                        text = pytesseract.image_to_string(images[0])
+                    if ocr is None:
+                        ocr = stack.enter_context(PageOcr(pdf_path, language=ocr_language, workers=ocr_workers))
+                    for i, text in ocr.ocr_pages(empty_pages).items():
+                        page_texts[i - start] = text or page_texts[i - start]
                 except Exception:
                     pass # Fallback to empty if OCR fails too
-            
-            text = text or ""
-            
-            if use_separator:
-                header = f"--- Page {i+1} ---"
-                full_text.append(header)
-                full_text.append(text)
-                full_text.append("") # Spacing
-            else:
-                full_text.append(text)
-    
-    # Write to file
-    content = "\n".join(full_text)
-    with open(output_path, "w", encoding=encoding) as f:
-        f.write(content)
-        
+
+            for j, text in enumerate(page_texts):
+                text = text or ""
+
+                if use_separator:
+                    lines = [f"--- Page {start + j + 1} ---", text, ""] # Spacing
+                else:
+                    lines = [text]
+
+                for line in lines:
+                    if not first_line:
+                        f.write("\n")
+                    f.write(line)
+                    first_line = False
+
     return [output_filename]
@@ -0,0 +1,137 @@
+"""
+Pluggable text-layer extraction engines for pdf_to_txt.
+
+Each engine extracts the text of a contiguous page range and is registered
+under a name selectable through ``options['engine']``:
+
+- ``pymupdf``: native MuPDF extraction, the fastest option (default).
+- ``pypdfium2``: native PDFium extraction, used when PyMuPDF is unavailable.
+- ``pdfplumber``: pure-Python pdfminer layout analysis, slowest but the most
+  faithful to the visual line layout.
+
+``iter_page_texts`` splits the document into page chunks, extracts them in
+parallel worker processes and yields the page texts in order, so callers can
+stream them to disk without holding the whole document.
+"""
+from worker_pool import imap_ordered, default_workers
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+try:
+    import pypdfium2 as pdfium
+    PYPDFIUM2_AVAILABLE = True
+except ImportError:
+    PYPDFIUM2_AVAILABLE = False
+
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+
+DEFAULT_CHUNK_SIZE = 16
+
+# Engine name -> (is_available, extract(pdf_path, start, end) -> list of page texts)
+ENGINES = {}
+# Preference order when no engine is requested
+ENGINE_PRIORITY = ['pymupdf', 'pypdfium2', 'pdfplumber']
+
+
+def register_engine(name, available=True):
+    def decorator(func):
+        ENGINES[name] = (available, func)
+        return func
+    return decorator
+
+
+@register_engine('pymupdf', available=PYMUPDF_AVAILABLE)
+def _extract_pymupdf(pdf_path, start, end):
+    with fitz.open(pdf_path) as doc:
+        return [doc.load_page(i).get_text('text').rstrip('\n') for i in range(start, end)]
+
+
+@register_engine('pypdfium2', available=PYPDFIUM2_AVAILABLE)
+def _extract_pypdfium2(pdf_path, start, end):
+    doc = pdfium.PdfDocument(pdf_path)
+    try:
+        texts = []
+        for i in range(start, end):
+            page = doc[i]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range().replace('\r\n', '\n').rstrip('\n'))
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        doc.close()
+
+
+@register_engine('pdfplumber', available=PDFPLUMBER_AVAILABLE)
+def _extract_pdfplumber(pdf_path, start, end):
+    with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+        return [page.extract_text() or '' for page in pdf.pages]
+
+
+def available_engines():
+    """Names of the engines whose backend library is installed."""
+    return [name for name, (available, _) in ENGINES.items() if available]
+
+
+def resolve_engine(name=None):
+    """Returns a usable engine name, validating an explicit choice.
+
+    Raises:
+        ValueError: If the requested engine is unknown or not installed.
+    """
+    if name:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown text engine '{name}'. Available: {', '.join(available_engines())}")
+        if not ENGINES[name][0]:
+            raise ValueError(f"Text engine '{name}' is not installed")
+        return name
+
+    for candidate in ENGINE_PRIORITY:
+        if ENGINES[candidate][0]:
+            return candidate
+    raise ValueError("No text extraction engine is installed")
+
+
+def page_count(pdf_path):
+    if PYMUPDF_AVAILABLE:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    if PYPDFIUM2_AVAILABLE:
+        doc = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_chunk(task):
+    engine, pdf_path, start, end = task
+    return ENGINES[engine][1](pdf_path, start, end)
+
+
+def iter_page_chunks(pdf_path, engine=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Yields ``(first_page_index, [page texts])`` for consecutive page chunks, in order."""
+    engine = resolve_engine(engine)
+    total = page_count(pdf_path)
+    chunks = [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+    workers = min(workers or default_workers(), max(len(chunks), 1))
+
+    tasks = ((engine, pdf_path, start, end) for start, end in chunks)
+    for (start, _), texts in zip(chunks, imap_ordered(_extract_chunk, tasks, workers=workers)):
+        yield start, texts
+
+
+def iter_page_texts(pdf_path, engine=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Yields the text of every page, in order."""
+    for _, texts in iter_page_chunks(pdf_path, engine, chunk_size, workers):
+        yield from texts
@@ -0,0 +1,366 @@
+"""
+Bulk AcroForm filling (mail merge) for /api/forms/fill and the command line.
+
+A template PDF's field tree is parsed once into a ``FormTemplate``: the
+fully qualified name of every terminal field, its kind (text, checkbox,
+radio, choice) and the object numbers of the field and its widgets, with
+each widget's "on" appearance state. Filling a record opens the template
+bytes (qpdf parses lazily, so this is cheap). It then goes straight to
+those objects by number, sets /V and, for buttons, the widgets' /AS. qpdf
+generates the text and choice appearances. With ``flatten`` the widgets are
+merged into the page content and the form is removed, so the output
+prints and displays the same everywhere.
+
+Records are filled in chunks by worker processes (``worker_pool``). The
+template bytes are read once, when the ``FormTemplate`` is built, and
+travel with it to the workers, so the field object numbers always match
+the document being filled, even if the file is replaced. Results come
+back in record order, with a bounded number of chunks in flight, so they
+can be streamed into a zip (``iter_zip``/``write_zip``) or merged into one
+PDF (``merge_engine.PdfMerger``, which stores shared fonts and backgrounds
+once) while later records are still being filled.
+
+qpdf draws generated appearances with the standard fonts, so characters
+outside WinAnsi show as '?' in flattened output. The field values
+themselves keep the full text.
+
+Command line:
+    python form_fill_engine.py template.pdf records.csv -o contracts.zip [--flatten]
+    python form_fill_engine.py template.pdf records.json -o all.pdf --merge
+"""
+import io
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import pikepdf
+
+from worker_pool import imap_ordered, default_workers
+from zip_stream import iter_zip, write_zip
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 25
+DEFAULT_NAME_PATTERN = '{index:05d}.pdf'
+# Filled records held in memory at once by write_merged
+MERGE_BATCH = 200
+TRUE_VALUES = frozenset({'1', 'true', 'yes', 'y', 'on', 'x', 'checked'})
+
+def _field_kind(field_type, flags):
+    if field_type == '/Tx':
+        return 'text'
+    if field_type == '/Ch':
+        return 'choice'
+    if field_type == '/Btn':
+        if flags & (1 << 16):
+            return 'pushbutton'
+        return 'radio' if flags & (1 << 15) else 'checkbox'
+    return 'signature' if field_type == '/Sig' else None
+
+
+def _on_state(widget):
+    """The widget's "on" appearance state name (e.g. '/Yes'), or None."""
+    appearances = widget.get('/AP')
+    normal = appearances.get('/N') if isinstance(appearances, pikepdf.Dictionary) else None
+    if isinstance(normal, pikepdf.Dictionary):
+        for state in normal.keys():
+            if state != '/Off':
+                return str(state)
+    return None
+
+
+class FormTemplate:
+    """A template PDF's bytes and its parsed field tree."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(self.path, 'rb') as f:
+            self.data = f.read()
+        # Fully qualified name -> {'kind', 'field': objgen, 'widgets': [(objgen, on state)], 'options'}
+        self.fields = {}
+        with pikepdf.open(io.BytesIO(self.data)) as pdf:
+            acroform = pdf.Root.get('/AcroForm')
+            if not isinstance(acroform, pikepdf.Dictionary) or not acroform.get('/Fields'):
+                raise ValueError("The template has no form fields")
+            self._walk(acroform.Fields, '', None, 0)
+
+    def _walk(self, fields, prefix, inherited_type, inherited_flags):
+        for field in fields:
+            if not isinstance(field, pikepdf.Dictionary):
+                continue
+            part = str(field.get('/T', ''))
+            name = f"{prefix}.{part}" if prefix and part else (part or prefix)
+            field_type = field.get('/FT', inherited_type)
+            flags = int(field.get('/Ff', inherited_flags))
+            kids = field.get('/Kids')
+            # Kids with names are fields; nameless kids are this field's widgets
+            named_kids = [kid for kid in kids or [] if '/T' in kid]
+            if named_kids:
+                self._walk(named_kids, name, field_type, flags)
+            if named_kids and len(named_kids) == len(kids):
+                continue
+
+            kind = _field_kind(field_type, flags)
+            if kind is None or not name:
+                continue
+            widgets = [kid for kid in kids or [] if '/T' not in kid] if kids else [field]
+            entry = self.fields.setdefault(name, {'kind': kind, 'field': field.objgen, 'widgets': [], 'options': []})
+            entry['widgets'].extend((widget.objgen, _on_state(widget)) for widget in widgets)
+            if kind in ('checkbox', 'radio'):
+                entry['options'] = sorted({state[1:] for _, state in entry['widgets'] if state})
+            elif kind == 'choice':
+                entry['options'] = [str(o[-1] if isinstance(o, pikepdf.Array) else o) for o in field.get('/Opt', [])]
+
+    def describe(self):
+        """Field names, kinds and options, for listing in the UI."""
+        return [{'name': name, 'kind': f['kind'], 'options': f['options']} for name, f in self.fields.items()]
+
+    def fill(self, record, flatten=False):
+        """The template with ``record``'s values filled in, as PDF bytes.
+
+        Keys that are not field names are ignored. Raises ValueError for a
+        radio or choice value that is not one of the field's options.
+        """
+        with pikepdf.open(io.BytesIO(self.data)) as pdf:
+            for name, value in record.items():
+                entry = self.fields.get(name)
+                if entry is None or value is None:
+                    continue
+                self._set(pdf, name, entry, value)
+            pdf.Root.AcroForm.NeedAppearances = True
+            pdf.generate_appearance_streams()
+            if flatten:
+                pdf.flatten_annotations('all')
+            output = io.BytesIO()
+            pdf.save(output, compress_streams=True)
+            return output.getvalue()
+
+    @staticmethod
+    def _set(pdf, name, entry, value):
+        field = pdf.get_object(entry['field'])
+        kind = entry['kind']
+        if kind in ('text', 'choice'):
+            text = value if isinstance(value, str) else str(value)
+            if kind == 'choice' and entry['options'] and text and text not in entry['options'] \
+                    and not int(field.get('/Ff', 0)) & (1 << 18):
+                raise ValueError(f"'{text}' is not an option of {name}")
+            field.V = pikepdf.String(text)
+        elif kind == 'checkbox':
+            text = str(value).strip()
+            checked = value is True or text.lower() in TRUE_VALUES or text in entry['options']
+            for objgen, on in entry['widgets']:
+                state = pikepdf.Name(on) if checked and on else pikepdf.Name.Off
+                pdf.get_object(objgen).AS = state
+                if checked and on:
+                    field.V = state
+            if not checked:
+                field.V = pikepdf.Name.Off
+        elif kind == 'radio':
+            text = str(value).strip()
+            if text and text not in entry['options']:
+                raise ValueError(f"'{text}' is not an option of {name}")
+            for objgen, on in entry['widgets']:
+                pdf.get_object(objgen).AS = pikepdf.Name(on) if text and on == '/' + text else pikepdf.Name.Off
+            field.V = pikepdf.Name('/' + text) if text else pikepdf.Name.Off
+
+
+def parse_records(source, fmt=None):
+    """Records (dicts of field name -> value) from CSV or JSON text, or a list.
+
+    JSON may be a list of objects or an object with a 'records' list. ``fmt``
+    ('csv' or 'json') defaults to the text's first character. Text is never
+    treated as a file name; see ``load_records_file``.
+
+    Raises:
+        ValueError: For JSON that is not a list of objects.
+    """
+    if isinstance(source, list):
+        records = source
+    else:
+        fmt = fmt or ('json' if source.lstrip()[:1] in ('[', '{') else 'csv')
+        if fmt == 'json':
+            records = json.loads(source)
+            if isinstance(records, dict):
+                records = records.get('records')
+        else:
+            return [dict(row) for row in csv.DictReader(io.StringIO(source))]
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError("JSON data must be a list of objects")
+    return records
+
+
+def load_records_file(path, fmt=None):
+    """Records from a CSV or JSON file; ``fmt`` defaults to the file extension."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        text = f.read()
+    return parse_records(text, fmt if fmt in ('csv', 'json') else None)
+
+
+def output_name(pattern, record, index):
+    """File name for a record: ``pattern`` formatted with its fields and 1-based ``index``.
+
+    Raises:
+        ValueError: If the pattern names a column the record does not have.
+    """
+    values = {key: value for key, value in record.items() if isinstance(key, str)}
+    values['index'] = index
+    try:
+        name = pattern.format_map(values)
+    except (KeyError, ValueError, IndexError) as e:
+        raise ValueError(f"Invalid name pattern '{pattern}': {e}")
+    name = re.sub(r'[^\w.-]+', '_', name).strip('._') or f"{index:05d}"
+    return name if name.lower().endswith('.pdf') else name + '.pdf'
+
+
+def _fill_chunk(task):
+    template, records, flatten = task
+    results = []
+    for record in records:
+        try:
+            results.append((template.fill(record, flatten), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+class MailMerge:
+    """One fill run. Iterate ``results()`` (or pass it to a sink), then read ``stats``."""
+
+    def __init__(self, template, records, flatten=False, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 name_pattern=DEFAULT_NAME_PATTERN):
+        self.template = template
+        self.records = records
+        self.flatten = flatten
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.name_pattern = name_pattern
+        self.errors = []
+        self.filled = 0
+        self.seconds = 0.0
+        columns = {key for record in records for key in record}
+        self.unknown_columns = sorted(columns - set(template.fields))
+
+    def results(self):
+        """Yields ``(name, pdf bytes)`` per filled record, in record order; failures go to ``errors``."""
+        start = time.perf_counter()
+        size = self.chunk_size
+        chunks = [self.records[i:i + size] for i in range(0, len(self.records), size)]
+        workers = min(self.workers or default_workers(), max(len(chunks), 1))
+        tasks = ((self.template, chunk, self.flatten) for chunk in chunks)
+        names = set()
+        index = 0
+        try:
+            for chunk, filled in zip(chunks, imap_ordered(_fill_chunk, tasks, workers=workers)):
+                for record, (data, error) in zip(chunk, filled):
+                    index += 1
+                    if error is None:
+                        try:
+                            name = output_name(self.name_pattern, record, index)
+                        except ValueError as e:
+                            error = str(e)
+                    if error is not None:
+                        self.errors.append({'record': index, 'error': error})
+                        continue
+                    if name in names:
+                        name = f"{name[:-4]}_{index}.pdf"
+                    names.add(name)
+                    self.filled += 1
+                    yield name, data
+        finally:
+            self.seconds = time.perf_counter() - start
+
+    @property
+    def stats(self):
+        return {
+            'records': len(self.records),
+            'filled': self.filled,
+            'failed': len(self.errors),
+            'errors': self.errors[:100],
+            'unknown_columns': self.unknown_columns,
+            'flattened': self.flatten,
+            'seconds': round(self.seconds, 3),
+            'records_per_second': round(self.filled / self.seconds, 1) if self.seconds else None,
+        }
+
+    def iter_zip(self):
+        """The filled PDFs as a streamed zip (see ``zip_stream.iter_zip``)."""
+        return iter_zip(self.results())
+
+    def write_zip(self, zip_path):
+        write_zip(zip_path, self.results())
+        return self.stats
+
+    def write_merged(self, output_path):
+        """Writes every filled record into one PDF, in record order.
+
+        Forms cannot be merged field by field (every record has the same
+        field names), so records are always flattened for this output.
+
+        At most ``MERGE_BATCH`` filled records are held in memory: each batch
+        is merged into a temporary PDF next to ``output_path``, and the
+        batches are then merged by path, so their page data is read from disk
+        while the output is written.
+        """
+        from merge_engine import PdfMerger
+
+        self.flatten = True
+        with tempfile.TemporaryDirectory(prefix='merge_', dir=os.path.dirname(os.path.abspath(output_path))) as spill:
+            batches = []
+            batch = None
+            for name, data in self.results():
+                if batch is None:
+                    batch = PdfMerger()
+                batch.append(data, name=name)
+                if len(batch.inputs) == MERGE_BATCH:
+                    batches.append(self._spill(batch, spill, len(batches)))
+                    batch = None
+            if batch is not None:
+                batches.append(self._spill(batch, spill, len(batches)))
+            if not self.filled:
+                raise ValueError("No record could be filled")
+            with PdfMerger() as merger:
+                for path in batches:
+                    merger.append(path)
+                merger.save(output_path)
+        return self.stats
+
+    @staticmethod
+    def _spill(batch, directory, number):
+        path = os.path.join(directory, f'{number:05d}.pdf')
+        with batch:
+            batch.save(path, linearize=False)
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a PDF form once per CSV/JSON record.")
+    parser.add_argument('template', help="Template PDF with AcroForm fields")
+    parser.add_argument('data', help="CSV (header row = field names) or JSON list of objects")
+    parser.add_argument('-o', '--output', required=True, help="Output .zip, or .pdf with --merge")
+    parser.add_argument('--merge', action='store_true', help="Write one merged PDF instead of a zip")
+    parser.add_argument('--flatten', action='store_true', help="Flatten the filled fields into the page")
+    parser.add_argument('--name', default=DEFAULT_NAME_PATTERN, help="File name pattern, e.g. '{last_name}.pdf'")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    merge = MailMerge(FormTemplate(args.template), load_records_file(args.data), flatten=args.flatten,
+                      workers=args.workers, name_pattern=args.name)
+    stats = merge.write_merged(args.output) if args.merge else merge.write_zip(args.output)
+    if stats['unknown_columns']:
+        print(f"Columns without a field: {', '.join(stats['unknown_columns'])}")
+    for error in stats['errors']:
+        print(f"Record {error['record']}: {error['error']}")
+    print(f"Filled {stats['filled']}/{stats['records']} records in {stats['seconds']}s "
+          f"({stats['records_per_second']} records/s) -> {args.output}")
+    return 0 if stats['filled'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
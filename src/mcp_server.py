@@ -26,10 +26,13 @@ from translation_utils import translate_text as _translate_text
 from ai_utils import get_pdf_chat_instance, LANGCHAIN_AVAILABLE
 
 # Libraries for local logic implementation
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfReader
 from pypdf.generic import RectangleObject
 import pikepdf
-from pdf2image import convert_from_path
+from page_renderer import iter_pages
+import merge_engine
+import compress_engine
+import split_engine
 
 # Initialize FastMCP server
 mcp = FastMCP("PDF Extractor")
@@ -134,31 +137,21 @@ def translate_text(input: TranslateInput) -> str:
 @mcp.tool()
 def compress_pdf(input: CompressPdfInput) -> str:
     """Compresses a PDF file to reduce size."""
-    logger.info(f"Compressing PDF: {input.pdf_path} (Quality: {input.quality})")
+    logger.info(f"Compressing PDF: {input.pdf_path} (Quality: {input.quality}, Engine: {input.engine})")
     try:
         valid_path = validate_path(input.pdf_path)
         
-        # Quality Presets
-        presets = {
-            'screen': '/screen', 'ebook': '/ebook', 
-            'printer': '/printer', 'prepress': '/prepress', 
-            'default': '/ebook'
-        }
-        gs_setting = presets.get(input.quality, '/ebook')
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = _get_output_path(valid_path, f"compressed_{input.quality}_{timestamp}.pdf")
         
-        cmd = [
-            "gs", "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.4",
-            f"-dPDFSETTINGS={gs_setting}",
-            "-dNOPAUSE", "-dQUIET", "-dBATCH",
-            f"-sOutputFile={output_path}",
-            str(valid_path)
-        ]
-        
-        subprocess.run(cmd, check=True)
-        return f"Compressed PDF saved to: {output_path}"
+        stats = compress_engine.compress(str(valid_path), str(output_path), input.quality, input.engine)
+        if input.engine == 'ghostscript':
+            return f"Compressed PDF saved to: {output_path}"
+        return (
+            f"Compressed PDF saved to: {output_path} "
+            f"({stats['original_size']} -> {stats['compressed_size']} bytes, "
+            f"{stats['images_recompressed']} images recompressed)"
+        )
     except subprocess.CalledProcessError:
         return "Error: Ghostscript compression failed. Ensure 'gs' is installed."
     except Exception as e:
@@ -169,14 +162,14 @@ def merge_pdfs(input: MergePdfsInput) -> str:
     """Merges multiple PDF files into one."""
     logger.info(f"Merging {len(input.pdf_paths)} PDFs")
     try:
-        merger = PdfWriter()
         parent_dir = None
+        input_paths = []
         
         for path in input.pdf_paths:
             valid_path = validate_path(path)
             if parent_dir is None:
                 parent_dir = valid_path.parent
-            merger.append(str(valid_path))
+            input_paths.append(str(valid_path))
             
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_name = input.output_filename or f"merged_{timestamp}.pdf"
@@ -190,9 +183,12 @@ def merge_pdfs(input: MergePdfsInput) -> str:
         # Validate output path
         output_path = validate_path(str(output_path), check_exists=False)
         
-        merger.write(str(output_path))
-        merger.close()
-        return f"Merged PDF saved to: {output_path}"
+        stats = merge_engine.merge_pdfs(input_paths, str(output_path))
+        return (
+            f"Merged PDF saved to: {output_path} "
+            f"({stats['pages']} pages, {stats['duplicates_removed']} duplicate resources shared, "
+            f"{stats['deduplicated_bytes']} bytes of duplicates dropped)"
+        )
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -202,35 +198,23 @@ def split_pdf(input: SplitPdfInput) -> str:
     logger.info(f"Splitting PDF: {input.pdf_path} (Ranges: {input.page_ranges})")
     try:
         valid_path = validate_path(input.pdf_path)
-        reader = PdfReader(str(valid_path))
-        total_pages = len(reader.pages)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         ranges = [r.strip() for r in input.page_ranges.split(',')]
         output_files = []
         
-        for i, r in enumerate(ranges):
-            writer = PdfWriter()
+        with pikepdf.open(str(valid_path)) as pdf:
+            total_pages = len(pdf.pages)
             try:
-                if '-' in r:
-                    start, end = map(int, r.split('-'))
-                else:
-                    start = int(r)
-                    end = int(r)
+                parts, invalid = split_engine.range_parts(ranges, total_pages)
             except ValueError:
-                return f"Error: Invalid range format '{r}'"
-                
-            if start < 1 or end > total_pages or start > end:
-                return f"Error: Invalid page range {start}-{end} (Total pages: {total_pages})"
+                return f"Error: Invalid range format in '{input.page_ranges}'"
+            if invalid:
+                return f"Error: Invalid page range {invalid[0]} (Total pages: {total_pages})"
             
-            # 1-based to 0-based
-            for p in range(start - 1, end):
-                writer.add_page(reader.pages[p])
-                
-            out_name = f"{valid_path.stem}_part{i+1}_{r}.pdf"
-            out_path = valid_path.parent / out_name
-            writer.write(str(out_path))
-            output_files.append(str(out_path))
+            # All parts are built from one open source
+            for part, data in split_engine.iter_split(pdf, parts):
+                out_path = valid_path.parent / split_engine.part_filename(valid_path.stem, part)
+                out_path.write_bytes(data)
+                output_files.append(str(out_path))
             
         return f"Created {len(output_files)} split files:\n" + "\n".join(output_files)
     except Exception as e:
@@ -283,10 +267,10 @@ def pdf_to_images(input: PdfToImagesInput) -> str:
         output_dir = valid_path.parent / f"{valid_path.stem}_images"
         output_dir.mkdir(exist_ok=True)
         
-        images = convert_from_path(str(valid_path), dpi=150)
         saved_files = []
         
-        for i, image in enumerate(images):
+        # Pages are rendered and saved one at a time
+        for i, image in iter_pages(str(valid_path), dpi=150):
             fname = f"page_{i+1}.{input.output_format}"
             fpath = output_dir / fname
             image.save(str(fpath), input.output_format.upper())
@@ -56,9 +56,13 @@ class CompressPdfInput(BaseModel):
         ...,
         description="Absolute path to the PDF file to compress."
     )
-    quality: Literal['screen', 'ebook', 'printer', 'prepress', 'default'] = Field(
+    quality: Literal['screen', 'ebook', 'printer', 'prepress', 'default', 'scan'] = Field(
         default='ebook',
-        description="Compression quality preset: screen (lowest/smallest), ebook (medium), printer (high), prepress (highest)."
+        description="Compression quality preset: screen (lowest/smallest), ebook (medium), printer (high), prepress (highest), scan (scanned documents: bitonal G4 / mixed raster content; native engine only)."
+    )
+    engine: Literal['native', 'ghostscript'] = Field(
+        default='ghostscript',
+        description="Compressor: ghostscript (requires 'gs') or native (in-process image recompression; required for scan)."
     )
 
 class MergePdfsInput(BaseModel):
@@ -0,0 +1,236 @@
+"""
+Resource-deduplicating merge engine for /merge and the MCP merge_pdfs tool.
+
+Inputs are appended one at a time with pikepdf. Right after each input is
+copied in, its new objects are hashed with ``pdf_digest.object_digest``. Any
+stream, font or graphics-state object whose content equals one already in the
+output is replaced by a reference to the existing copy. The duplicate is then
+unreferenced and is not written, so fonts, ICC profiles and logos shared by
+many inputs are stored once. The output is saved with object streams, which
+packs the many small dictionaries of a merged file into compressed streams.
+
+Pages are copied with ``Pdf.add_pages_from``, which keeps form fields working
+(renaming ones whose names collide) and carries the named destinations that
+links point at. Named destinations nothing links to yet are copied as well,
+and bookmarks keep their page whether they use a destination array, a named
+destination or a /GoTo action (see ``pdf_outline``).
+
+Inputs are opened lazily. Page content and images are not decoded; stream data
+is copied from the source files when the output is written, so every input
+stays open (as a file handle, not in memory) until then.
+"""
+import io
+import os
+import time
+import logging
+from contextlib import ExitStack
+
+import pikepdf
+
+from pdf_digest import object_digest
+from pdf_outline import page_numbers, named_destinations, resolve_destination, destination_page, outline_page
+from pdf_output import save_pdf
+
+logger = logging.getLogger(__name__)
+
+# Dictionary types that are safe to share between pages
+SHAREABLE_TYPES = frozenset({'/Font', '/FontDescriptor', '/Encoding', '/ExtGState', '/Pattern', '/Shading'})
+
+
+def _is_shareable(obj):
+    if isinstance(obj, pikepdf.Stream):
+        return True
+    if isinstance(obj, pikepdf.Dictionary):
+        return obj.get('/Type') in SHAREABLE_TYPES
+    return False
+
+
+def _replace_refs(obj, remap):
+    """Points references inside ``obj`` (and its direct children) at canonical objects."""
+    if isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+        for key in list(obj.keys()):
+            value = obj[key]
+            if isinstance(value, pikepdf.Object) and value.is_indirect:
+                if value.objgen in remap:
+                    obj[key] = remap[value.objgen]
+            else:
+                _replace_refs(value, remap)
+    elif isinstance(obj, pikepdf.Array):
+        for i, value in enumerate(obj):
+            if isinstance(value, pikepdf.Object) and value.is_indirect:
+                if value.objgen in remap:
+                    obj[i] = remap[value.objgen]
+            else:
+                _replace_refs(value, remap)
+
+
+def _copy_outline(source_items, target_items, page_offset, pages, dests):
+    """Copies bookmarks, pointing those that open a page at it shifted by ``page_offset``."""
+    for item in source_items:
+        index = outline_page(item, pages, dests)
+        copied = pikepdf.OutlineItem(item.title, None if index is None else index + page_offset)
+        _copy_outline(item.children, copied.children, page_offset, pages, dests)
+        target_items.append(copied)
+
+
+class PdfMerger:
+    """Appends PDFs into one output, sharing identical resources.
+
+    Usage:
+        with PdfMerger() as merger:
+            for path in paths:
+                merger.append(path)
+            stats = merger.save(output_path)
+    """
+
+    def __init__(self):
+        self._pdf = pikepdf.new()
+        self._sources = ExitStack()
+        self._canonical = {}  # digest -> canonical object
+        self._memo = {}  # objgen -> digest, for objects in the output
+        self._outline = []
+        self.inputs = []
+        self.duplicates_removed = 0
+        self.deduplicated_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        self._sources.close()
+        self._pdf.close()
+
+    def append(self, pdf_path, name=None):
+        """Appends every page of ``pdf_path`` (and its page bookmarks).
+
+        ``pdf_path`` may also be the PDF's bytes, listed under ``name``.
+        """
+        start = time.perf_counter()
+        if isinstance(pdf_path, (bytes, bytearray)):
+            size = len(pdf_path)
+            source = self._sources.enter_context(pikepdf.open(io.BytesIO(pdf_path)))
+        else:
+            size = os.path.getsize(pdf_path)
+            name = name or os.path.basename(pdf_path)
+            source = self._sources.enter_context(pikepdf.open(pdf_path))
+        page_offset = len(self._pdf.pages)
+        # Copied objects get the next free object numbers
+        first_new = len(self._pdf.objects) + 1
+
+        self._pdf.add_pages_from(source)
+        new_objects = [self._pdf.get_object(objid, 0) for objid in range(first_new, len(self._pdf.objects) + 1)]
+        self._deduplicate(new_objects)
+
+        pages = page_numbers(source)
+        dests = named_destinations(source)
+        self._copy_named_destinations(dests, pages, page_offset)
+        try:
+            with source.open_outline() as outline:
+                _copy_outline(outline.root, self._outline, page_offset, pages, dests)
+        except Exception as e:
+            logger.info(f"Bookmarks of {name} not copied: {e}")
+
+        self.inputs.append({
+            'file': name,
+            'pages': len(source.pages),
+            'bytes': size,
+            'seconds': round(time.perf_counter() - start, 4),
+        })
+
+    def _copy_named_destinations(self, dests, pages, page_offset):
+        """Adds the input's named destinations that are not in the output yet.
+
+        ``add_pages_from`` only carries the ones the copied links use (renaming
+        clashes); the rest are still targets for links from other documents.
+        The first input to use a name keeps it.
+        """
+        root = self._pdf.Root
+        tree = None
+        for name, dest in dests.items():
+            target = resolve_destination(dest, dests)
+            index = destination_page(target, pages)
+            if index is None:
+                continue
+            copied = pikepdf.Array([self._pdf.pages[page_offset + index].obj, *target[1:]])
+            if name.startswith('/'):
+                if '/Dests' not in root:
+                    root.Dests = pikepdf.Dictionary()
+                if name not in root.Dests:
+                    root.Dests[name] = copied
+                continue
+            if tree is None:
+                if '/Names' not in root:
+                    root.Names = pikepdf.Dictionary()
+                if '/Dests' not in root.Names:
+                    root.Names.Dests = pikepdf.NameTree.new(self._pdf).obj
+                tree = pikepdf.NameTree(root.Names.Dests)
+            if name not in tree:
+                tree[name] = copied
+
+    def _deduplicate(self, new_objects):
+        remap = {}
+        for obj in new_objects:
+            if not _is_shareable(obj):
+                continue
+            digest = object_digest(obj, self._memo)
+            canonical = self._canonical.get(digest)
+            if canonical is None:
+                self._canonical[digest] = obj
+            elif canonical.objgen != obj.objgen:
+                remap[obj.objgen] = canonical
+                if isinstance(obj, pikepdf.Stream):
+                    self.deduplicated_bytes += len(obj.read_raw_bytes())
+
+        if remap:
+            self.duplicates_removed += len(remap)
+            for obj in new_objects:
+                if obj.objgen not in remap:
+                    _replace_refs(obj, remap)
+
+    def save(self, output_path, linearize=None):
+        """Writes the merged PDF and returns merge statistics.
+
+        ``linearize`` forces linearization on or off (see ``pdf_output.save_pdf``).
+        """
+        start = time.perf_counter()
+        if self._outline:
+            with self._pdf.open_outline() as outline:
+                outline.root.extend(self._outline)
+        input_bytes = sum(entry['bytes'] for entry in self.inputs)
+        linearized = save_pdf(
+            self._pdf,
+            output_path,
+            linearize=linearize,
+            size_hint=input_bytes - self.deduplicated_bytes,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            compress_streams=True,
+        )
+        output_bytes = os.path.getsize(output_path)
+        return {
+            'inputs': self.inputs,
+            'pages': len(self._pdf.pages),
+            'input_bytes': input_bytes,
+            'output_bytes': output_bytes,
+            'duplicates_removed': self.duplicates_removed,
+            'deduplicated_bytes': self.deduplicated_bytes,
+            'linearized': linearized,
+            'write_seconds': round(time.perf_counter() - start, 4),
+        }
+
+
+def merge_pdfs(pdf_paths, output_path):
+    """Merges ``pdf_paths`` in order into ``output_path``.
+
+    Returns:
+        dict: 'inputs' (per input: file, pages, bytes, seconds), 'pages',
+        'input_bytes', 'output_bytes', 'duplicates_removed',
+        'deduplicated_bytes', 'linearized' and 'write_seconds'.
+    """
+    with PdfMerger() as merger:
+        for path in pdf_paths:
+            merger.append(path)
+        return merger.save(output_path)
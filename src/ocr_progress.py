@@ -0,0 +1,175 @@
+"""
+ocrmypdf plugin that forwards the engine's progress bars to a task callback.
+
+ocrmypdf reports its progress through a progress-bar class obtained from the
+``get_progressbar_class`` plugin hook. This module provides a class that, instead
+of drawing a terminal bar, translates every update into the
+``progress_callback(state, meta)`` convention used by ``tasks.py``.
+
+Usage:
+    with forward_progress(progress_callback):
+        ocrmypdf.ocr(..., plugins=[PLUGIN_NAME])
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from ocrmypdf import hookimpl
+except ImportError:
+    # Keep the module importable (and testable) without ocrmypdf installed.
+    def hookimpl(func):
+        return func
+
+# Module name passed to ocrmypdf.ocr(plugins=[...])
+PLUGIN_NAME = 'ocr_progress'
+
+# Minimum seconds between two updates sent to the result backend
+DEFAULT_MIN_INTERVAL = 1.0
+
+# Percentage band (start, end) of the overall job covered by each ocrmypdf stage.
+# Stages are matched by a substring of the progress bar description.
+STAGE_BANDS = [
+    ('scan', (5, 15)),
+    ('graft', (80, 85)),
+    ('ocr', (15, 80)),
+    ('pdf/a', (85, 92)),
+    ('linear', (92, 95)),
+    ('recompress', (85, 95)),
+    ('deflat', (85, 95)),
+    ('jbig2', (85, 95)),
+    ('png', (85, 95)),
+    ('check', (95, 96)),
+]
+DEFAULT_BAND = (15, 80)
+
+_local = threading.local()
+
+
+class ThrottledProgress:
+    """Rate-limits calls to a ``progress_callback(state, meta)``.
+
+    Updates arriving faster than ``min_interval`` seconds are dropped, except
+    when ``force=True`` (stage start/end), so the backend sees at most one
+    write per interval no matter how many pages finish in between.
+    """
+
+    def __init__(self, callback, min_interval=DEFAULT_MIN_INTERVAL, clock=time.monotonic):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.clock = clock
+        self.started_at = clock()
+        self._last_sent = None
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return self.clock() - self.started_at
+
+    def report(self, meta, state='PROCESSING', force=False):
+        """Sends ``meta`` unless the previous update was too recent.
+
+        Returns:
+            bool: True if the callback was invoked.
+        """
+        with self._lock:
+            now = self.clock()
+            if not force and self._last_sent is not None and now - self._last_sent < self.min_interval:
+                return False
+            self._last_sent = now
+        self.callback(state, meta)
+        return True
+
+
+def _stage_band(desc):
+    desc = (desc or '').lower()
+    for key, band in STAGE_BANDS:
+        if key in desc:
+            return band
+    return DEFAULT_BAND
+
+
+class CallbackProgressBar:
+    """Progress bar implementing ocrmypdf's ``ProgressBar`` protocol.
+
+    Each instance covers one pipeline stage (e.g. "OCR" over N pages). The
+    ``disable`` flag that ocrmypdf derives from ``progress_bar=False`` only
+    concerns terminal output and is ignored here.
+    """
+
+    def __init__(self, *, total=None, desc=None, unit=None, disable=False, **kwargs):
+        self.total = total
+        self.desc = desc or 'Processing'
+        self.unit = unit
+        self.completed = 0
+        self.stage_started_at = time.monotonic()
+        self.band = _stage_band(desc)
+        # Captured here because ocrmypdf may call update() from worker threads
+        self.reporter = getattr(_local, 'reporter', None)
+
+    def __enter__(self):
+        self._send(force=True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.total:
+            self.completed = self.total
+        self._send(force=True)
+        return False
+
+    def update(self, n=1, *, completed=None):
+        if completed is not None:
+            self.completed = completed
+        else:
+            self.completed += n
+        self._send()
+
+    def _eta(self):
+        if not self.total or self.completed <= 0 or self.completed >= self.total:
+            return None
+        elapsed = time.monotonic() - self.stage_started_at
+        return round(elapsed / self.completed * (self.total - self.completed), 1)
+
+    def _send(self, force=False):
+        if self.reporter is None:
+            return
+
+        start, end = self.band
+        fraction = 0.0
+        if self.total:
+            fraction = min(float(self.completed) / float(self.total), 1.0)
+        current = int(start + (end - start) * fraction)
+
+        meta = {
+            'status': self.desc,
+            'current': current,
+            'total': 100,
+            'elapsed': round(self.reporter.elapsed(), 1),
+            'eta': self._eta(),
+        }
+        if self.unit == 'page' and self.total:
+            meta['status'] = f'{self.desc} ({int(self.completed)}/{int(self.total)} pages)'
+            meta['pages_completed'] = int(self.completed)
+            meta['pages_total'] = int(self.total)
+
+        self.reporter.report(meta, force=force)
+
+
+@hookimpl
+def get_progressbar_class():
+    return CallbackProgressBar
+
+
+@contextmanager
+def forward_progress(progress_callback, min_interval=DEFAULT_MIN_INTERVAL):
+    """Routes progress bars created in this thread to ``progress_callback``.
+
+    Args:
+        progress_callback (callable): function(state, meta), may be None.
+        min_interval (float): Throttle interval in seconds.
+    """
+    previous = getattr(_local, 'reporter', None)
+    _local.reporter = ThrottledProgress(progress_callback, min_interval) if progress_callback else None
+    try:
+        yield _local.reporter
+    finally:
+        _local.reporter = previous
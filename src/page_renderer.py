@@ -0,0 +1,300 @@
+"""
+Shared in-process page rendering service.
+
+Every code path that rasterizes PDF pages (image export, /pdf-to-jpg, /compare,
+the MCP pdf_to_images tool and the OCR fallback) renders through this module
+instead of ``pdf2image.convert_from_path``, which spawns poppler and returns the
+whole document as a list of PIL images.
+
+Pages are rendered with PyMuPDF one at a time and yielded to the caller, so
+memory use does not depend on the page count.
+
+Memory budget:
+    Each page raster is capped at ``max_page_bytes`` (default 64 MB). A page
+    whose requested DPI would exceed the cap is rendered at the highest DPI
+    that fits. While a page is converted to PIL the MuPDF pixmap and the PIL
+    copy briefly coexist, so the peak raster memory of an ``iter_pages`` loop
+    is at most ``2 * max_page_bytes`` (the pixmap is freed before the page is
+    yielded). MuPDF's shared resource store is emptied after every page so
+    decoded fonts and images do not accumulate across a long document.
+    tests/test_page_renderer.py validates this bound.
+
+Parallel export:
+    ``render_to_files`` shards the document into page ranges and renders them
+    in worker processes (see worker_pool). Each worker opens its own copy of
+    the document, encodes the images itself and writes ``page_N.ext`` straight
+    to the output directory, so only file names travel back to the parent.
+    The per-page budget applies per worker.
+
+Image passthrough:
+    Scanned PDFs usually hold one full-page image per page. With
+    ``passthrough=True`` such pages are exported from the embedded image
+    itself: the original stream is written as-is when it already has the
+    target format (e.g. a DCT/JPEG stream exported to JPG), otherwise the
+    decoded image is transcoded. The image keeps its native resolution, so the
+    requested DPI does not apply to these pages. Every other page is rendered.
+"""
+import io
+import os
+import math
+import logging
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from worker_pool import imap_ordered, default_workers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DPI = 150
+DEFAULT_MAX_PAGE_BYTES = 64 * 1024 * 1024
+# Pages per render_to_files task; small enough to balance uneven pages across workers
+DEFAULT_RENDER_CHUNK = 8
+
+# Share of the page an image must cover to count as a scanned page
+FULL_PAGE_COVERAGE = 0.99
+# Text render mode 3 draws nothing (e.g. the OCR layer of a searchable scan)
+_INVISIBLE_TEXT_MODE = 3
+# extract_image() extension -> PIL format names it can be written as unchanged
+_PASSTHROUGH_FORMATS = {
+    'jpeg': {'JPEG'},
+    'png': {'PNG'},
+}
+
+# PIL mode -> (MuPDF colorspace, bytes per pixel)
+_COLORSPACES = {
+    'RGB': (fitz.csRGB, 3),
+    'L': (fitz.csGRAY, 1),
+}
+
+
+def page_count(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def fit_dpi(width_pt, height_pt, dpi, bytes_per_pixel, max_page_bytes):
+    """Returns the largest DPI <= ``dpi`` whose raster fits in ``max_page_bytes``."""
+    if not max_page_bytes:
+        return dpi
+    scale = dpi / 72.0
+    raster_bytes = (width_pt * scale) * (height_pt * scale) * bytes_per_pixel
+    if raster_bytes <= max_page_bytes:
+        return dpi
+    # Raster size grows with the square of the DPI; floor to stay under budget
+    return max(1, math.floor(dpi * math.sqrt(max_page_bytes / raster_bytes)))
+
+
+class PageRenderer:
+    """Renders pages of one open document under a per-page memory budget.
+
+    Usage:
+        with PageRenderer(pdf_path, dpi=150) as renderer:
+            for index, image in renderer.iter_pages():
+                image.save(...)
+    """
+
+    def __init__(self, pdf_path, dpi=DEFAULT_DPI, mode='RGB', max_page_bytes=DEFAULT_MAX_PAGE_BYTES):
+        if mode not in _COLORSPACES:
+            raise ValueError(f"Unsupported render mode '{mode}'. Allowed: {', '.join(_COLORSPACES)}")
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        self.mode = mode
+        self.max_page_bytes = max_page_bytes
+        self._doc = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def open(self):
+        if self._doc is None:
+            self._doc = fitz.open(self.pdf_path)
+        return self
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+            fitz.TOOLS.store_shrink(100)
+
+    @property
+    def page_count(self):
+        return self._doc.page_count
+
+    def page_size(self, index):
+        """Page size in points (after rotation), as (width, height)."""
+        rect = self._doc.load_page(index).rect
+        return rect.width, rect.height
+
+    def render_pixmap(self, index, dpi=None, clip=None):
+        """Renders one page (or the ``clip`` rectangle of it, in points) to a MuPDF pixmap."""
+        page = self._doc.load_page(index)
+        area = fitz.Rect(clip) if clip is not None else page.rect
+        colorspace, bytes_per_pixel = _COLORSPACES[self.mode]
+
+        requested = dpi or self.dpi
+        dpi = fit_dpi(area.width, area.height, requested, bytes_per_pixel, self.max_page_bytes)
+        if dpi < requested:
+            logger.info(f"Page {index + 1} rendered at {dpi} DPI instead of {requested} to stay within the memory budget")
+
+        return page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False, clip=clip)
+
+    def render(self, index, dpi=None, clip=None):
+        """Renders one page to a PIL image."""
+        pix = self.render_pixmap(index, dpi=dpi, clip=clip)
+        image = Image.frombytes(self.mode, (pix.width, pix.height), pix.samples)
+        del pix
+        fitz.TOOLS.store_shrink(100)
+        return image
+
+    def full_page_image_xref(self, index):
+        """Returns the xref of the image a page consists of, or None.
+
+        A page qualifies when it is unrotated, draws exactly one image placed
+        upright and covering the page, has no vector graphics and carries at
+        most invisible text. Masked images and images with a /Decode array are
+        excluded because their stream alone does not reproduce the page.
+        """
+        page = self._doc.load_page(index)
+        if page.rotation:
+            return None
+
+        infos = page.get_image_info(xrefs=True)
+        if len(infos) != 1 or not infos[0]['xref']:
+            return None
+        info = infos[0]
+        a, b, c, d, _, _ = info['transform']
+        if b or c or a <= 0 or d <= 0 or info['has-mask']:
+            return None
+
+        covered = fitz.Rect(info['bbox']) & page.rect
+        if covered.is_empty or covered.get_area() < page.rect.get_area() * FULL_PAGE_COVERAGE:
+            return None
+
+        if page.get_drawings():
+            return None
+        for span in page.get_texttrace():
+            if span['type'] != _INVISIBLE_TEXT_MODE and span['opacity'] > 0:
+                return None
+
+        xref = info['xref']
+        for key in ('SMask', 'Mask', 'ImageMask', 'Decode'):
+            if self._doc.xref_get_key(xref, key)[0] != 'null':
+                return None
+        return xref
+
+    def extract_page_image(self, index, image_format, save_options=None):
+        """Encoded bytes of a scanned page's embedded image in ``image_format``, or None.
+
+        The original stream is returned untouched when it is already in the
+        target format; otherwise it is decoded and re-encoded with PIL.
+        """
+        xref = self.full_page_image_xref(index)
+        if xref is None:
+            return None
+
+        extracted = self._doc.extract_image(xref)
+        if not extracted or not extracted.get('image'):
+            return None
+        # Only gray/RGB streams are written raw; CMYK JPEGs are transcoded
+        if image_format in _PASSTHROUGH_FORMATS.get(extracted['ext'], ()) and extracted['colorspace'] in (1, 3):
+            return extracted['image']
+
+        try:
+            with Image.open(io.BytesIO(extracted['image'])) as source:
+                image = source.convert('L' if source.mode in ('1', 'L') else 'RGB')
+        except Exception as e:
+            logger.info(f"Page {index + 1}: embedded image could not be decoded ({e}), rendering instead")
+            return None
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, **(save_options or {}))
+        return buffer.getvalue()
+
+    def iter_pages(self, pages=None):
+        """Yields ``(index, PIL image)`` for the given 0-based pages (default: all), one at a time."""
+        indices = range(self.page_count) if pages is None else pages
+        for index in indices:
+            yield index, self.render(index)
+
+
+def iter_pages(pdf_path, dpi=DEFAULT_DPI, mode='RGB', pages=None, max_page_bytes=DEFAULT_MAX_PAGE_BYTES):
+    """Convenience generator: opens ``pdf_path`` and yields ``(index, PIL image)`` per page."""
+    with PageRenderer(pdf_path, dpi=dpi, mode=mode, max_page_bytes=max_page_bytes) as renderer:
+        yield from renderer.iter_pages(pages)
+
+
+def _render_chunk(task):
+    """Worker: exports pages [start, end), returning (file names, passthrough page count)."""
+    (pdf_path, output_dir, start, end, dpi, mode, max_page_bytes,
+     image_format, save_options, extension, passthrough) = task
+    filenames = []
+    passthrough_pages = 0
+    with PageRenderer(pdf_path, dpi=dpi, mode=mode, max_page_bytes=max_page_bytes) as renderer:
+        for index in range(start, end):
+            filename = f"page_{index + 1}.{extension}"
+            output_path = os.path.join(output_dir, filename)
+            data = renderer.extract_page_image(index, image_format, save_options) if passthrough else None
+            if data is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+                passthrough_pages += 1
+            else:
+                renderer.render(index).save(output_path, image_format, **save_options)
+            filenames.append(filename)
+    return filenames, passthrough_pages
+
+
+def render_to_files(pdf_path, output_dir, image_format, extension=None, save_options=None,
+                    dpi=DEFAULT_DPI, mode='RGB', pages=None, workers=None,
+                    chunk_size=DEFAULT_RENDER_CHUNK, max_page_bytes=DEFAULT_MAX_PAGE_BYTES,
+                    passthrough=False, stats=None):
+    """Renders pages to ``output_dir/page_N.<extension>`` across a process pool.
+
+    Args:
+        pdf_path (str): Source PDF.
+        output_dir (str): Existing directory the images are written to.
+        image_format (str): PIL format name ('PNG', 'WEBP', 'JPEG', 'TIFF').
+        extension (str, optional): File extension. Defaults to ``image_format.lower()``.
+        save_options (dict, optional): Keyword arguments for ``Image.save``.
+        pages (iterable, optional): 0-based page indices. Defaults to all pages.
+        workers (int, optional): Worker processes. Defaults to the CPU count;
+            1 renders inline.
+        chunk_size (int): Consecutive pages per worker task.
+        passthrough (bool): Export scanned pages from their embedded image
+            instead of rendering them (see module docstring).
+        stats (dict, optional): Receives ``passthrough_pages``, the number of
+            pages that took the passthrough path.
+
+    Returns:
+        list: Generated file names, in page order.
+    """
+    extension = extension or image_format.lower()
+    save_options = save_options or {}
+    indices = sorted(set(pages)) if pages is not None else list(range(page_count(pdf_path)))
+
+    # Shard into runs of consecutive pages so each task renders a contiguous range
+    ranges = []
+    for index in indices:
+        if ranges and ranges[-1][1] == index and ranges[-1][1] - ranges[-1][0] < chunk_size:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+
+    workers = min(workers or default_workers(), max(len(ranges), 1))
+    tasks = ((pdf_path, output_dir, start, end, dpi, mode, max_page_bytes,
+              image_format, save_options, extension, passthrough)
+             for start, end in ranges)
+
+    filenames = []
+    passthrough_pages = 0
+    for chunk, chunk_passthrough in imap_ordered(_render_chunk, tasks, workers=workers):
+        filenames.extend(chunk)
+        passthrough_pages += chunk_passthrough
+    if stats is not None:
+        stats['passthrough_pages'] = passthrough_pages
+    return filenames
@@ -0,0 +1,103 @@
+"""
+Content hashes of PDF objects.
+
+``object_digest`` hashes an object together with everything it references
+(dictionaries, arrays, streams). Object numbers are ignored, so equal content
+in two files, or twice in one file, gets the same digest. /compare uses it to
+prove pages identical, and the merge engine uses it to find duplicate fonts,
+images and other resources.
+
+The object graph is walked with an explicit stack, so long reference chains
+(e.g. link annotations leading from page to page) cannot exhaust the Python
+recursion limit.
+"""
+import hashlib
+
+import pikepdf
+
+# Back-references that would pull the page tree into an object's digest
+SKIP_KEYS = frozenset({'/Parent', '/P'})
+
+
+def _leaf_digest(obj, memo, pages, visiting):
+    """The digest of ``obj`` when it needs no walk (scalars, known objects), else None."""
+    if not isinstance(obj, pikepdf.Object):
+        # Numbers and booleans come back as Python values
+        return hashlib.sha256(repr(obj).encode()).digest()
+    if obj.is_indirect:
+        key = obj.objgen
+        if key in pages:
+            # A link target: the page's position, not its content
+            return hashlib.sha256(b'page %d' % pages[key]).digest()
+        if key in memo:
+            return memo[key]
+        if key in visiting:
+            return b'cycle'
+    if not isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream, pikepdf.Array)):
+        return hashlib.sha256(obj.unparse()).digest()
+    return None
+
+
+def object_digest(obj, memo=None, pages=None):
+    """Structural SHA-256 of ``obj``, independent of object numbers.
+
+    Args:
+        obj: A pikepdf object (or a Python scalar, as pikepdf returns numbers).
+        memo (dict, optional): objgen -> digest cache. Pass the same dict for
+            every call on one document so shared objects are hashed only once.
+        pages (dict, optional): objgen -> index of the document's pages.
+            References to these pages (other than ``obj`` itself) are hashed by
+            index, so a page's digest does not include the pages it links to.
+
+    Returns:
+        bytes: The 32-byte digest.
+    """
+    memo = {} if memo is None else memo
+    pages = pages or {}
+    visiting = set()
+    if not isinstance(obj, pikepdf.Object) or not obj.is_indirect or obj.objgen not in pages:
+        digest = _leaf_digest(obj, memo, pages, visiting)
+        if digest is not None:
+            return digest
+    elif obj.objgen in memo:
+        return memo[obj.objgen]
+
+    # Post-order walk; a frame is (object, objgen or None, hash so far, (key, child) iterator)
+    stack = []
+
+    def enter(node):
+        key = node.objgen if node.is_indirect else None
+        if key is not None:
+            visiting.add(key)
+        h = hashlib.sha256()
+        if isinstance(node, pikepdf.Array):
+            h.update(b'array')
+            children = ((None, item) for item in list(node))
+        else:
+            h.update(b'stream' if isinstance(node, pikepdf.Stream) else b'dict')
+            children = ((name, node[name]) for name in sorted(node.keys()) if name not in SKIP_KEYS)
+        stack.append((node, key, h, children))
+
+    enter(obj)
+    while True:
+        node, key, h, children = stack[-1]
+        for name, child in children:
+            if name is not None:
+                h.update(name.encode())
+            digest = _leaf_digest(child, memo, pages, visiting)
+            if digest is None:
+                enter(child)
+                break
+            h.update(digest)
+        else:
+            stack.pop()
+            if isinstance(node, pikepdf.Stream):
+                # Raw (still encoded) bytes: equal encodings of equal data match
+                h.update(node.read_raw_bytes())
+            digest = h.digest()
+            if key is not None:
+                visiting.discard(key)
+                memo[key] = digest
+            if not stack:
+                return digest
+            stack[-1][2].update(digest)
@@ -0,0 +1,81 @@
+"""
+Page targets of bookmarks and named destinations.
+
+A bookmark points at a page in one of several ways: an explicit destination
+array (``/Dest [page /Fit]``), a named destination (a string looked up in the
+/Names/Dests name tree, or a name in the PDF 1.1 /Root/Dests dictionary), or
+a /GoTo action whose /D is either of those, as LaTeX hyperref writes them.
+A named destination may itself be a dictionary holding the array in /D.
+``outline_page`` resolves all of them to a page index; the merge and split
+engines use it to carry bookmarks over.
+"""
+import pikepdf
+
+# Named destinations can point at dictionaries that point at arrays; stop at this depth
+MAX_INDIRECTIONS = 4
+
+
+def page_numbers(pdf):
+    """objgen -> 0-based index of every page of ``pdf``."""
+    return {page.obj.objgen: index for index, page in enumerate(pdf.pages)}
+
+
+def named_destinations(pdf):
+    """Named destinations of ``pdf``: name tree entries by string, /Root/Dests ones as '/name'."""
+    dests = {}
+    legacy = pdf.Root.get('/Dests')
+    if isinstance(legacy, pikepdf.Dictionary):
+        for key in legacy.keys():
+            dests[key] = legacy[key]
+    names = pdf.Root.get('/Names')
+    tree = names.get('/Dests') if isinstance(names, pikepdf.Dictionary) else None
+    if isinstance(tree, pikepdf.Dictionary):
+        for key, value in pikepdf.NameTree(tree).items():
+            dests[key] = value
+    return dests
+
+
+def resolve_destination(target, dests=None):
+    """The explicit destination array (``[page /Fit ...]``) ``target`` leads to, or None.
+
+    Args:
+        target: The destination object (array, name, string or dict with /D).
+        dests (dict, optional): From ``named_destinations``, to resolve names.
+    """
+    for _ in range(MAX_INDIRECTIONS):
+        if isinstance(target, pikepdf.Dictionary):
+            target = target.get('/D')
+        elif isinstance(target, (pikepdf.Name, pikepdf.String)):
+            target = (dests or {}).get(str(target))
+        else:
+            break
+    if isinstance(target, pikepdf.Array) and len(target) > 0:
+        return target
+    return None
+
+
+def destination_page(target, pages, dests=None):
+    """0-based page index of a destination, or None.
+
+    ``pages`` maps objgen -> index (see ``page_numbers``); ``dests`` resolves names.
+    """
+    target = resolve_destination(target, dests)
+    if target is None:
+        return None
+    page = target[0]
+    if isinstance(page, pikepdf.Dictionary) and page.is_indirect:
+        return pages.get(page.objgen)
+    # Some producers write a page number where a reference belongs
+    if isinstance(page, int) and 0 <= page < len(pages):
+        return page
+    return None
+
+
+def outline_page(item, pages, dests=None):
+    """0-based page index an ``OutlineItem`` opens (its /Dest or /GoTo action), or None."""
+    target = item.obj.get('/Dest')
+    if target is None:
+        action = item.obj.get('/A')
+        if isinstance(action, pikepdf.Dictionary) and action.get('/S') == pikepdf.Name.GoTo:
+            target = action.get('/D')
+    return destination_page(target, pages, dests)
@@ -0,0 +1,82 @@
+"""
+Saving finished PDFs for the web viewer.
+
+Outputs of at least ``LINEARIZE_MIN_BYTES`` are written linearized ("fast web
+view"). qpdf moves the first page's objects and a hint table to the start of
+the file. A viewer that fetches byte ranges (pdf.js against /uploads or
+/outputs, which answer Range requests with 206) can then show page 1 after
+the first few hundred KB instead of the whole file. Smaller files are saved
+normally; they load quickly anyway and linearizing costs an extra pass.
+
+Set the ``LINEARIZE_MIN_BYTES`` environment variable to change the threshold:
+0 linearizes everything and a negative value turns it off.
+
+``save_pdf`` saves an open pikepdf document. ``linearize_file`` rewrites a
+file written by another tool (pypdf, Ghostscript, PyMuPDF) in place.
+"""
+import os
+import logging
+
+import pikepdf
+
+logger = logging.getLogger(__name__)
+
+LINEARIZE_MIN_BYTES = int(os.environ.get('LINEARIZE_MIN_BYTES', 4 * 1024 * 1024))
+
+
+def should_linearize(size, linearize=None):
+    """Whether an output of ``size`` bytes is linearized (``linearize`` overrides the threshold)."""
+    if linearize is not None:
+        return bool(linearize)
+    return LINEARIZE_MIN_BYTES >= 0 and size >= LINEARIZE_MIN_BYTES
+
+
+def save_pdf(pdf, output_path, linearize=None, size_hint=None, **save_options):
+    """Saves ``pdf``, linearized if it is expected to reach the threshold.
+
+    Args:
+        pdf (pikepdf.Pdf): Document to save.
+        linearize (bool, optional): Force linearization on or off.
+        size_hint (int, optional): Expected output size. Defaults to the size
+            of the file ``pdf`` was opened from.
+        **save_options: Passed to ``pikepdf.Pdf.save``.
+
+    Returns:
+        bool: Whether the file was linearized.
+    """
+    if size_hint is None:
+        source = getattr(pdf, 'filename', None)
+        size_hint = os.path.getsize(source) if source and os.path.isfile(source) else 0
+    linearized = should_linearize(size_hint, linearize)
+    pdf.save(output_path, linearize=linearized, **save_options)
+    return linearized
+
+
+def linearize_file(path, linearize=None):
+    """Rewrites the PDF at ``path`` linearized if it reaches the threshold.
+
+    Files that are already linearized, or cannot be parsed, are left alone.
+
+    Returns:
+        bool: Whether the file is linearized afterwards.
+    """
+    if not should_linearize(os.path.getsize(path), linearize):
+        return False
+    try:
+        with pikepdf.open(path, allow_overwriting_input=True) as pdf:
+            if pdf.is_linearized:
+                return True
+            pdf.save(path, linearize=True, object_stream_mode=pikepdf.ObjectStreamMode.preserve)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not linearize {os.path.basename(path)}: {e}")
+        return False
+
+
+def is_linearized(path):
+    """Whether the PDF at ``path`` is linearized."""
+    try:
+        with pikepdf.open(path) as pdf:
+            return bool(pdf.is_linearized)
+    except Exception:
+        return False
@@ -0,0 +1,215 @@
+"""
+PDF/A conversion with Ghostscript, skipped when the input already conforms.
+
+A Ghostscript ``-dPDFA`` rewrite re-renders every page and re-embeds every
+font, which costs seconds per document. Many uploads are already PDF/A,
+typically archive exports and scans from capture software. ``precheck``
+reads what a document declares and the prerequisites that are cheap to
+verify:
+
+- the XMP ``pdfaid`` part and conformance (e.g. 2B),
+- a PDF/A OutputIntent (/S /GTS_PDFA1) with an ICC profile,
+- embedded font programs for every font (Type 3 fonts draw with content
+  streams and need none),
+- no encryption.
+
+When the declared part matches the requested level and nothing is missing,
+``convert`` copies the file instead of running Ghostscript. The precheck is
+not a full validator (veraPDF checks hundreds of rules); it trusts the
+declaration once the prerequisites a rewrite would fix are in place. Pass
+``force=True`` to always convert.
+
+``convert_batch`` converts many files with at most ``workers`` Ghostscript
+processes at a time, each waited on from a thread, and reports throughput.
+"""
+import os
+import time
+import shutil
+import logging
+import subprocess
+
+import pikepdf
+
+from worker_pool import imap_ordered, memory_bound_workers
+
+logger = logging.getLogger(__name__)
+
+PDFA_LEVELS = {'1b': 1, '2b': 2, '3b': 3}
+
+# Budget per Ghostscript process when sizing a batch
+GS_MEMORY_PER_PROCESS = 256 * 1024 * 1024
+
+FONT_FILE_KEYS = ('/FontFile', '/FontFile2', '/FontFile3')
+
+
+def pdfa_part(level):
+    """PDF/A part number of ``level`` ('1b', '2b' or '3b').
+
+    Raises:
+        ValueError: For any other level.
+    """
+    if level not in PDFA_LEVELS:
+        raise ValueError(f"Unsupported PDF/A level: {level!r} (expected one of {', '.join(PDFA_LEVELS)})")
+    return PDFA_LEVELS[level]
+
+
+def pdfa_command(input_path, output_path, level='2b'):
+    """Ghostscript command line converting ``input_path`` to PDF/A (level '1b', '2b' or '3b')."""
+    return [
+        "gs",
+        f"-dPDFA={pdfa_part(level)}",
+        "-dBATCH", "-dNOPAUSE",
+        "-sColorConversionStrategy=RGB",
+        "-sDEVICE=pdfwrite",
+        "-dPDFACompatibilityPolicy=1",
+        f"-sOutputFile={output_path}",
+        input_path
+    ]
+
+
+def _declared(pdf):
+    try:
+        return pdf.open_metadata().pdfa_status or None
+    except Exception as e:
+        logger.debug(f"Unreadable XMP metadata: {e}")
+        return None
+
+
+def _has_output_intent(pdf):
+    for intent in pdf.Root.get('/OutputIntents', []):
+        if isinstance(intent, pikepdf.Dictionary) and intent.get('/S') == '/GTS_PDFA1' \
+                and '/DestOutputProfile' in intent:
+            return True
+    return False
+
+
+def _unembedded_fonts(pdf):
+    """Base names of fonts without an embedded program, in one pass over the objects."""
+    missing = []
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Dictionary) or obj.get('/Type') != '/Font':
+            continue
+        # Type 0 fonts are checked through their descendant CIDFont
+        if obj.get('/Subtype') in ('/Type0', '/Type3'):
+            continue
+        descriptor = obj.get('/FontDescriptor')
+        if not isinstance(descriptor, pikepdf.Dictionary) or \
+                not any(key in descriptor for key in FONT_FILE_KEYS):
+            missing.append(str(obj.get('/BaseFont', '/unnamed'))[1:])
+    return sorted(set(missing))
+
+
+def precheck(input_path, level='2b'):
+    """Whether ``input_path`` already conforms to PDF/A at ``level``, as far as cheaply known.
+
+    Returns:
+        dict: 'declared' (e.g. '2B', or None), 'output_intent', 'unembedded_fonts',
+        'encrypted', 'issues' (what would need a conversion) and 'conformant'.
+    """
+    part = pdfa_part(level)
+    try:
+        pdf = pikepdf.open(input_path)
+    except pikepdf.PasswordError:
+        return {'declared': None, 'output_intent': False, 'unembedded_fonts': [],
+                'encrypted': True, 'issues': ['Encrypted'], 'conformant': False}
+
+    with pdf:
+        declared = _declared(pdf)
+        output_intent = _has_output_intent(pdf)
+        unembedded = _unembedded_fonts(pdf)
+        encrypted = pdf.is_encrypted
+
+    issues = []
+    if not declared:
+        issues.append('No PDF/A declaration in the XMP metadata')
+    elif declared[0] != str(part):
+        issues.append(f"Declares PDF/A-{declared}, not part {part}")
+    if not output_intent:
+        issues.append('No PDF/A OutputIntent')
+    if unembedded:
+        issues.append(f"Fonts not embedded: {', '.join(unembedded)}")
+    if encrypted:
+        issues.append('Encrypted')
+
+    return {
+        'declared': declared,
+        'output_intent': output_intent,
+        'unembedded_fonts': unembedded,
+        'encrypted': encrypted,
+        'issues': issues,
+        'conformant': not issues,
+    }
+
+
+def convert(input_path, output_path, level='2b', timeout=300, force=False):
+    """Writes a PDF/A version of ``input_path`` to ``output_path``.
+
+    Raises:
+        subprocess.CalledProcessError, subprocess.TimeoutExpired: When Ghostscript fails.
+
+    Returns:
+        dict: 'skipped' (already conformant, copied unchanged), 'precheck' and 'seconds'.
+    """
+    start = time.perf_counter()
+    check = precheck(input_path, level)
+    skipped = check['conformant'] and not force
+    if skipped:
+        shutil.copyfile(input_path, output_path)
+    else:
+        subprocess.run(pdfa_command(input_path, output_path, level), check=True,
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    return {'skipped': skipped, 'precheck': check, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def _convert_job(task):
+    input_path, output_path, level, timeout, force = task
+    try:
+        result = convert(input_path, output_path, level, timeout, force)
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.decode(errors='replace').strip() if e.stderr else str(e)
+        result = {'error': f'PDF/A conversion failed: {error}'}
+    except subprocess.TimeoutExpired:
+        result = {'error': 'Conversion timed out'}
+    except Exception as e:
+        result = {'error': str(e)}
+    if 'error' in result and os.path.exists(output_path):
+        os.remove(output_path)
+    return result
+
+
+def convert_batch(jobs, level='2b', workers=None, timeout=300, force=False):
+    """Converts ``(input_path, output_path)`` pairs, running a bounded number of Ghostscripts.
+
+    Args:
+        workers (int, optional): Most conversions at once. Defaults to the CPU
+            count, lowered to fit ``GS_MEMORY_PER_PROCESS`` each in free memory.
+
+    Returns:
+        dict: 'results' (per job, in order: the ``convert`` result or 'error')
+        and 'stats' (files, converted, skipped, failed, workers, seconds,
+        files_per_second, bytes_per_second over the input sizes).
+    """
+    jobs = list(jobs)
+    workers = memory_bound_workers(GS_MEMORY_PER_PROCESS, limit=min(workers or len(jobs), len(jobs)) or 1)
+    start = time.perf_counter()
+    tasks = ((input_path, output_path, level, timeout, force) for input_path, output_path in jobs)
+    # Ghostscript runs in its own process; threads only wait on it
+    results = list(imap_ordered(_convert_job, tasks, workers=workers, use_threads=True))
+    seconds = time.perf_counter() - start
+
+    total_bytes = sum(os.path.getsize(path) for path, _ in jobs if os.path.exists(path))
+    failed = sum(1 for r in results if 'error' in r)
+    skipped = sum(1 for r in results if r.get('skipped'))
+    return {
+        'results': results,
+        'stats': {
+            'files': len(jobs),
+            'converted': len(jobs) - failed - skipped,
+            'skipped': skipped,
+            'failed': failed,
+            'workers': workers,
+            'seconds': round(seconds, 3),
+            'files_per_second': round(len(jobs) / seconds, 2) if seconds else None,
+            'bytes_per_second': round(total_bytes / seconds) if seconds else None,
+        },
+    }
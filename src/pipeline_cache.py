@@ -0,0 +1,155 @@
+"""
+Memoized pipeline step outputs.
+
+A step's output is stored under a key built from what determines it: the
+keys of its inputs, the operation name and its parameters, serialized as
+canonical JSON (sorted keys, no whitespace, ``None`` values dropped). The
+key of the pipeline's input file is the SHA-256 of its content. Keys are
+chained from there, so every step's key is known before anything runs,
+without hashing intermediate files.
+
+When the same pipeline is re-run with only its last step changed, the
+executor finds the longest cached prefix of each chain and resumes after it.
+
+Entries are directories holding the step's output files and a manifest
+that keeps their order. Files are copied in and out, never linked, so later
+writes to an output cannot alter an entry. The cache is pruned least
+recently used first whenever it exceeds ``PIPELINE_CACHE_MAX_BYTES`` or
+``PIPELINE_CACHE_MAX_ENTRIES``. A hit refreshes the entry. Setting either
+limit to 0 disables the cache.
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Bump when an operation's output for the same parameters changes
+CACHE_VERSION = 3
+
+PIPELINE_CACHE_DIR = os.environ.get('PIPELINE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pipeline_cache'))
+PIPELINE_CACHE_MAX_BYTES = int(os.environ.get('PIPELINE_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+PIPELINE_CACHE_MAX_ENTRIES = int(os.environ.get('PIPELINE_CACHE_MAX_ENTRIES', 1000))
+
+MANIFEST = 'manifest.json'
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's content."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def canonical_params(params):
+    """``params`` as canonical JSON: sorted keys, compact, ``None`` values dropped."""
+    cleaned = {key: value for key, value in (params or {}).items() if value is not None}
+    return json.dumps(cleaned, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def step_key(input_keys, operation, params):
+    """Cache key of a step applied to inputs with the given keys."""
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}\0{operation}\0{canonical_params(params)}".encode())
+    for key in input_keys:
+        h.update(b'\0' + key.encode())
+    return h.hexdigest()
+
+
+class StepCache:
+    """A size-bounded directory of step outputs, shared by worker processes."""
+
+    def __init__(self, directory=None, max_bytes=None, max_entries=None):
+        self.directory = directory or PIPELINE_CACHE_DIR
+        self.max_bytes = PIPELINE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_entries = PIPELINE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def contains(self, key):
+        return self.enabled and os.path.isfile(os.path.join(self._entry(key), MANIFEST))
+
+    def get(self, key, destination):
+        """Copies an entry's files into ``destination``.
+
+        Returns:
+            list: The copied paths, in order, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, MANIFEST)) as f:
+                names = json.load(f)['files']
+            os.makedirs(destination, exist_ok=True)
+            paths = []
+            for index, name in enumerate(names):
+                path = os.path.join(destination, name)
+                shutil.copyfile(os.path.join(entry, f"{index}"), path)
+                paths.append(path)
+            os.utime(os.path.join(entry, MANIFEST))
+            return paths
+        except (OSError, ValueError, KeyError):
+            # Missing, pruned meanwhile or half-written
+            return None
+
+    def put(self, key, paths):
+        """Stores copies of ``paths`` under ``key`` (a no-op if it is already stored)."""
+        if not self.enabled or self.contains(key):
+            return
+        staging = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}")
+        try:
+            os.makedirs(staging)
+            for index, path in enumerate(paths):
+                shutil.copyfile(path, os.path.join(staging, f"{index}"))
+            with open(os.path.join(staging, MANIFEST), 'w') as f:
+                json.dump({'files': [os.path.basename(p) for p in paths]}, f)
+            os.rename(staging, self._entry(key))
+        except OSError as e:
+            # Another worker stored it first, or the disk is full
+            logger.debug(f"Pipeline cache put skipped for {key}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self.prune()
+
+    def usage(self):
+        """Entries as (last used, bytes, path), oldest first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            entry = os.path.join(self.directory, name)
+            try:
+                last_used = os.path.getmtime(os.path.join(entry, MANIFEST))
+                size = sum(e.stat().st_size for e in os.scandir(entry))
+            except OSError:
+                continue
+            entries.append((last_used, size, entry))
+        return sorted(entries)
+
+    def prune(self):
+        """Removes least recently used entries until the cache is within its limits."""
+        entries = self.usage()
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, entry = entries.pop(0)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        entries = self.usage()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'max_entries': self.max_entries}
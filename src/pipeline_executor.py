@@ -2,103 +2,530 @@
 import logging
 import pikepdf
 import os
+import shutil
+import queue
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from pdf_output import save_pdf, linearize_file
+from pipeline_ops import get_operation, resolve_operation, kind_of, CPU
+from pipeline_cache import StepCache, file_digest, step_key
+from worker_pool import default_workers, can_spawn_processes, memory_bound_workers
+from zip_stream import write_zip
 
 logger = logging.getLogger(__name__)
 
+# Output filename prefix per operation (the last step names the result)
+OUTPUT_PREFIXES = {'sanitize': 'pipeline_san', 'flatten': 'pipeline_flat', 'compress': 'pipeline_comp'}
+
+# Threads for I/O-bound and subprocess segments, which mostly wait
+THREAD_WORKERS = 4
+
+# Memory budget per file of a batch: a fixed base plus a multiple of its size
+BATCH_MEMORY_BASE = 64 * 1024 * 1024
+BATCH_MEMORY_FACTOR = 4
+
+
+def run_segment(task):
+    """Runs a chain of steps on the files ``input_paths``.
+
+    Consecutive in-memory steps share one open ``Pdf``: it is opened once,
+    handed from step to step and serialized once. File steps get a file: the
+    open document is written out first, and their output is opened again by
+    the next in-memory step. Each file step writes into its own directory
+    under ``work_dir``.
+
+    When ``final_path`` is given the chain's single PDF result is written
+    there (linearized when large) instead of into ``work_dir``.
+
+    With a ``cache``, the chain starts after its first ``resume`` steps,
+    from the cached output of the last of them. Every output written to
+    disk (file step results, an in-memory document handed to a file step,
+    the chain's result) is stored under its step's cache key. When the
+    chain ends with two in-memory steps, the document is also written out
+    once before the last one, so re-running with only the last step changed
+    resumes from there. Other in-memory steps in the middle of a chain are
+    not written out just to be cached.
+
+    Returns:
+        tuple: (output paths, number of steps taken from the cache). The
+        count is 0 when the cached entry was pruned after planning.
+    """
+    input_paths, steps, work_dir, final_path, cache, resume = task
+    paths = list(input_paths)
+    if resume:
+        dir_key, _, _, key = steps[resume - 1]
+        cached = cache.get(key, os.path.join(work_dir, dir_key))
+        if cached is None:
+            # Pruned since the executor looked
+            resume = 0
+        else:
+            paths = cached
+
+    pdf, save_options = None, {}
+    previous_key = None
+    # Step whose in-memory result is checkpointed for the cache
+    checkpoint = len(steps) - 2 if cache is not None and get_operation(steps[-1][1])['in_memory'] else None
+    try:
+        for position, (dir_key, name, params, key) in enumerate(steps[resume:], start=resume):
+            operation = get_operation(name)
+            if operation['in_memory']:
+                if pdf is None:
+                    pdf = pikepdf.Pdf.open(paths[0])
+                operation['func'](pdf, params, save_options)
+                previous_key = key
+                if position == checkpoint and key and not cache.contains(key):
+                    step_dir = os.path.join(work_dir, dir_key)
+                    os.makedirs(step_dir, exist_ok=True)
+                    checkpoint_path = os.path.join(step_dir, f"{dir_key}.pdf")
+                    pdf.save(checkpoint_path, **save_options)
+                    _store(cache, key, [checkpoint_path])
+                continue
+
+            step_dir = os.path.join(work_dir, dir_key)
+            os.makedirs(step_dir, exist_ok=True)
+            if pdf is not None:
+                # Hand the in-memory result to the file-based step
+                paths = [os.path.join(step_dir, 'input.pdf')]
+                pdf.save(paths[0], **save_options)
+                pdf.close()
+                pdf, save_options = None, {}
+                _store(cache, previous_key, paths)
+            paths = operation['func'](paths, step_dir, params)
+            _store(cache, key, paths)
+            previous_key = key
+
+        if pdf is not None:
+            output_path = final_path or os.path.join(work_dir, f"{steps[-1][0]}.pdf")
+            if final_path:
+                save_pdf(pdf, output_path, size_hint=os.path.getsize(paths[0]), **save_options)
+            else:
+                pdf.save(output_path, **save_options)
+            paths = [output_path]
+            _store(cache, previous_key, paths)
+        elif final_path:
+            os.replace(paths[0], final_path)
+            # Only the final output is served to the viewer
+            linearize_file(final_path)
+            paths = [final_path]
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return paths, resume
+
+
+def make_pools(workers):
+    """(CPU pool, thread pool) for running segments.
+
+    CPU-bound segments use the CPU pool: a process pool, or a single thread
+    running them one at a time when only one worker is allowed or processes
+    cannot be spawned. Their operations use the whole process (worker pools,
+    native libraries), so they never run concurrently in one.
+    """
+    threads = ThreadPoolExecutor(max_workers=max(workers, THREAD_WORKERS))
+    if workers > 1 and can_spawn_processes():
+        cpu = ProcessPoolExecutor(max_workers=workers)
+    else:
+        cpu = ThreadPoolExecutor(max_workers=1)
+    return cpu, threads
+
+
+def batch_workers(paths, limit=None):
+    """Files to run at once: bounded by the CPU count and by available memory.
+
+    A pipeline holds its document in memory and writes intermediates next to
+    it, so each file is budgeted ``BATCH_MEMORY_FACTOR`` times its size plus
+    ``BATCH_MEMORY_BASE``. The largest file sets the budget.
+    """
+    largest = max((os.path.getsize(path) for path in paths if os.path.exists(path)), default=0)
+    per_file = BATCH_MEMORY_BASE + BATCH_MEMORY_FACTOR * largest
+    return memory_bound_workers(per_file, limit=min(limit or len(paths), len(paths)) or 1)
+
+
+def _store(cache, key, paths):
+    if cache is not None and key:
+        cache.put(key, paths)
+
+
 class PipelineExecutor:
-    def __init__(self, upload_folder, output_folder):
+    """Runs a graph of operations on one PDF.
+
+    ``steps`` is a list of ``{'op', 'params'}`` dicts run in order. A step
+    may also have an ``'id'`` and name the steps it consumes in ``'after'``
+    (an id or a list of ids); once any step has ``'after'`` the steps form a
+    DAG instead of a sequence, and steps without it read the input file. One
+    step can feed several (fan-out, e.g. OCR then DOCX and CSV) and ``merge``
+    can consume several (fan-in). Operations and their input/output kinds
+    come from the ``pipeline_ops`` registry; edges are checked before
+    anything runs.
+
+    Chains without branches are grouped into segments that run in one worker
+    (see ``run_segment``). Segments whose inputs are ready run concurrently:
+    CPU-bound ones on a process pool (one at a time without one), I/O-bound
+    and subprocess ones on threads. A pipeline that is a single chain runs
+    inline. Intermediate files live in a temporary directory removed when
+    the pipeline ends, whether it succeeds or not.
+
+    Step outputs are memoized in a ``StepCache`` (see ``pipeline_cache``):
+    steps whose result is cached are reported as progress with 'cached'
+    and not run again. If the entry is pruned before the segment runs, the
+    steps run anyway and a later progress update says so.
+    """
+
+    def __init__(self, upload_folder, output_folder, workers=None, cache=None, pools=None):
         self.upload_folder = upload_folder
         self.output_folder = output_folder
-        
+        self.workers = workers
+        self.cache = StepCache() if cache is None else cache
+        # (process pool, thread pool) shared with other executors (see execute_batch)
+        self.pools = pools
+
     def execute(self, filename, steps):
         """
         Execute a list of steps on a PDF.
         steps: List of dicts, e.g., [{'op': 'sanitize', 'params': {...}}, {'op': 'compress'}]
+        Yields progress dicts; the final one has the output filename as 'download_url'.
+        When the pipeline has several results they are also listed in 'outputs'
+        and 'download_url' names a zip of all of them.
         """
-        current_filename = filename
-        history = []
-        
-        # Generator to yield progress updates
         total_steps = len(steps)
         yield {'status': 'start', 'total_steps': total_steps}
-        
+
+        work_dir = None
+        written = []
         try:
-            for i, step in enumerate(steps):
-                op = step.get('op')
-                params = step.get('params', {})
-                
-                yield {'status': 'progress', 'step_index': i, 'step_name': op, 'message': f'Running {op}...'}
-                
-                # Execute operation
-                new_filename = self._run_operation(current_filename, op, params)
-                
-                history.append(new_filename)
-                current_filename = new_filename
-                
-            yield {'status': 'complete', 'download_url': current_filename}
-            
+            if not steps:
+                yield {'status': 'complete', 'download_url': filename}
+                return
+
+            segments = self.plan(steps)
+            input_path = self._find_input(filename)
+            work_dir = tempfile.mkdtemp(prefix='pipeline_tmp_', dir=self.output_folder)
+            self._name_outputs(segments, filename)
+            written.extend(s['final_path'] for s in segments if s['final_path'])
+            if self.cache.enabled:
+                self._assign_keys(segments, file_digest(input_path))
+
+            results = {}
+            yield from self._schedule(segments, input_path, work_dir, results)
+
+            outputs = self._collect(segments, results, filename, written)
+            update = {'status': 'complete', 'download_url': outputs[0]['filename']}
+            if self.cache.enabled:
+                # Steps run_segment actually took from the cache
+                hits = sum(s['resume'] for s in segments)
+                update['cache'] = dict(self.cache.stats(), hits=hits, misses=total_steps - hits)
+            if len(outputs) > 1:
+                update['outputs'] = outputs
+                update['download_url'] = self._zip_outputs(outputs, filename, written)
+            yield update
+
         except Exception as e:
-            logger.error(f"Pipeline failed at step {op}: {e}")
+            logger.error(f"Pipeline failed: {e}")
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
             yield {'status': 'error', 'message': str(e)}
+        finally:
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
 
-    def _run_operation(self, filename, op, params):
-        # Try finding the file in output then upload folder
-        potential_paths = [
-            os.path.join(self.output_folder, filename),
-            os.path.join(self.upload_folder, filename)
-        ]
-        input_path = None
-        for p in potential_paths:
-            if os.path.exists(p):
-                input_path = p
-                break
-        
-        if not input_path:
-            raise FileNotFoundError(f"Input file {filename} not found")
-
-        # Define Operations
-        if op == 'sanitize':
-            return self._op_sanitize(input_path, params)
-        elif op == 'flatten':
-            return self._op_flatten(input_path, params)
-        elif op == 'compress':
-            return self._op_compress(input_path, params)
+    def execute_batch(self, filenames, steps, workers=None):
+        """
+        Run the same steps on several PDFs, a bounded number at a time.
+        Yields the updates of every file (duplicates run once), tagged with
+        'file', interleaved as they happen, plus 'batch_progress' updates after each file ends. The
+        final 'batch_complete' update lists each file's 'download_url' or
+        error 'message' in 'results'.
+
+        Every file's segments run on one shared process pool and thread pool,
+        sized by ``batch_workers`` unless ``workers`` is given.
+        """
+        filenames = list(dict.fromkeys(filenames))
+        total = len(filenames)
+        paths = []
+        for filename in filenames:
+            try:
+                paths.append(self._find_input(filename))
+            except FileNotFoundError:
+                pass
+        workers = min(workers, total) if workers else batch_workers(paths, self.workers)
+        yield {'status': 'batch_start', 'total_files': total, 'total_steps': len(steps), 'workers': workers}
+
+        updates = queue.Queue()
+        cancelled = threading.Event()
+        done = object()
+        pools = make_pools(workers)
+
+        def run_file(filename):
+            if cancelled.is_set():
+                return
+            executor = PipelineExecutor(self.upload_folder, self.output_folder, cache=self.cache, pools=pools)
+            last = None
+            try:
+                for update in executor.execute(filename, steps):
+                    last = update
+                    updates.put(dict(update, file=filename))
+            finally:
+                updates.put((done, filename, last))
+
+        drivers = ThreadPoolExecutor(max_workers=workers)
+        results = {}
+        try:
+            for filename in filenames:
+                drivers.submit(run_file, filename)
+            while len(results) < total:
+                item = updates.get()
+                if isinstance(item, dict):
+                    yield item
+                    continue
+                _, filename, last = item
+                last = last or {'status': 'error', 'message': 'Pipeline did not run'}
+                if last['status'] == 'complete':
+                    results[filename] = {'file': filename, 'status': 'complete', 'download_url': last['download_url']}
+                else:
+                    results[filename] = {'file': filename, 'status': 'error', 'message': last.get('message')}
+                failed = sum(1 for r in results.values() if r['status'] == 'error')
+                yield {'status': 'batch_progress', 'completed': len(results) - failed, 'failed': failed,
+                       'total_files': total, 'percent': round(100 * len(results) / total)}
+
+            ordered = [results[filename] for filename in filenames]
+            failed = sum(1 for r in ordered if r['status'] == 'error')
+            yield {'status': 'batch_complete', 'completed': total - failed, 'failed': failed, 'results': ordered}
+        finally:
+            # A closed stream stops files that have not started
+            cancelled.set()
+            drivers.shutdown(wait=True)
+            for pool in pools:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def plan(self, steps):
+        """Checks ``steps`` and groups them into segments, in dependency order.
+
+        Returns:
+            list: Segment dicts with 'id', 'nodes' (the chain of steps),
+            'parents' and 'children' (segment ids) and 'cost'.
+
+        Raises:
+            ValueError: For unknown operations or step ids, cycles, or edges
+                whose file kinds do not match.
+        """
+        nodes = {}
+        dag = any('after' in step for step in steps)
+        previous = None
+        for index, step in enumerate(steps):
+            params = step.get('params') or {}
+            node_id = str(step.get('id', index))
+            if node_id in nodes:
+                raise ValueError(f"Duplicate step id '{node_id}'")
+            if dag:
+                after = step.get('after') or []
+                after = [str(a) for a in ([after] if isinstance(after, (str, int)) else after)]
+            else:
+                after = [previous] if previous is not None else []
+            name = resolve_operation(step.get('op'), params)
+            nodes[node_id] = {
+                'id': node_id, 'index': index, 'op': step.get('op'), 'name': name,
+                'operation': get_operation(name), 'params': params, 'after': after, 'children': [],
+            }
+            previous = node_id
+
+        for node in nodes.values():
+            for parent in node['after']:
+                if parent not in nodes:
+                    raise ValueError(f"Step '{node['id']}' runs after unknown step '{parent}'")
+                nodes[parent]['children'].append(node['id'])
+            self._check_kinds(node, nodes)
+
+        order = self._topological_order(nodes)
+
+        segments, segment_of = [], {}
+        for node_id in order:
+            node = nodes[node_id]
+            parent = nodes[node['after'][0]] if len(node['after']) == 1 else None
+            if parent is not None and len(parent['children']) == 1:
+                segment = segment_of[parent['id']]
+                segment['nodes'].append(node)
+            else:
+                segment = {'id': node_id, 'nodes': [node], 'parents': [], 'children': [],
+                           'final_path': None, 'resume': 0}
+                for parent_id in node['after']:
+                    # Several edges from one segment feed a fan-in once per edge
+                    segment['parents'].append(segment_of[parent_id]['id'])
+                    segment_of[parent_id]['children'].append(node_id)
+                segments.append(segment)
+            segment_of[node_id] = segment
+
+        for segment in segments:
+            costs = {node['operation']['cost'] for node in segment['nodes']}
+            segment['cost'] = CPU if CPU in costs else sorted(costs)[0]
+        return segments
+
+    def _check_kinds(self, node, nodes):
+        operation = node['operation']
+        wanted, many = kind_of(operation['inputs'][0])
+        sources = [kind_of(nodes[p]['operation']['outputs'][0]) for p in node['after']]
+        if not node['after']:
+            sources = [('pdf', False)]
+        for kind, several in sources:
+            if kind != wanted:
+                raise ValueError(f"Step '{node['id']}' ({node['name']}) takes {wanted}, got {kind}")
+            if several and not many:
+                raise ValueError(f"Step '{node['id']}' ({node['name']}) takes one {wanted}, "
+                                 f"its input produces several")
+        if len(sources) > 1 and not many:
+            raise ValueError(f"Step '{node['id']}' ({node['name']}) takes one input, got {len(sources)}")
+
+    def _topological_order(self, nodes):
+        indegree = {node_id: len(node['after']) for node_id, node in nodes.items()}
+        ready = deque(node_id for node_id, count in indegree.items() if count == 0)
+        order = []
+        while ready:
+            node_id = ready.popleft()
+            order.append(node_id)
+            for child in nodes[node_id]['children']:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if len(order) != len(nodes):
+            raise ValueError("Pipeline steps form a cycle")
+        return order
+
+    def _assign_keys(self, segments, input_digest):
+        # Segments are in dependency order, so parents are keyed first
+        keys = {}
+        for segment in segments:
+            for node in segment['nodes']:
+                inputs = [keys[parent] for parent in node['after']] or [input_digest]
+                node['key'] = keys[node['id']] = step_key(inputs, node['name'], node['params'])
+            # Resume after the longest cached prefix
+            for position in range(len(segment['nodes']), 0, -1):
+                if self.cache.contains(segment['nodes'][position - 1]['key']):
+                    segment['resume'] = position
+                    break
+
+    def _name_outputs(self, segments, filename):
+        # A sink ending in a single PDF writes it straight to the output folder
+        sinks = [s for s in segments if not s['children']]
+        stamp = datetime.now().strftime('%H%M%S')
+        base_name = secure_filename(os.path.basename(filename))
+        for segment in sinks:
+            node = segment['nodes'][-1]
+            segment['prefix'] = f"{OUTPUT_PREFIXES.get(node['op'], 'pipeline')}_{stamp}"
+            if len(sinks) > 1:
+                segment['prefix'] += f"_{secure_filename(node['id']) or node['index']}"
+            if node['operation']['outputs'][0] == 'pdf':
+                segment['final_path'] = os.path.join(self.output_folder, f"{segment['prefix']}_{base_name}")
+
+    def _task(self, segment, input_path, work_dir, results):
+        if segment['parents']:
+            inputs = [path for parent in segment['parents'] for path in results[parent]]
         else:
-            raise ValueError(f"Unknown operation: {op}")
-
-    def _op_flatten(self, input_path, params):
-        pdf = pikepdf.Pdf.open(input_path)
-        pdf.flatten_annotations()
-        
-        output_filename = f"pipeline_flat_{datetime.now().strftime('%H%M%S')}_{os.path.basename(input_path)}"
-        output_path = os.path.join(self.output_folder, output_filename)
-        pdf.save(output_path)
-        pdf.close()
-        return output_filename
-
-    def _op_sanitize(self, input_path, params):
-        pdf = pikepdf.Pdf.open(input_path)
-        # Apply params logic similar to sanitize endpoint
-        # For MVP, just do all if no params? Or assume params passed
-        
-        # Simple sanitize (remove JS)
-        if '/Names' in pdf.Root and '/JavaScript' in pdf.Root.Names:
-            del pdf.Root.Names['/JavaScript']
-            
-        output_filename = f"pipeline_san_{datetime.now().strftime('%H%M%S')}_{os.path.basename(input_path)}"
-        output_path = os.path.join(self.output_folder, output_filename)
-        pdf.save(output_path)
-        pdf.close()
-        return output_filename
-
-    def _op_compress(self, input_path, params):
-        # Using simple pikepdf save with compression
-        pdf = pikepdf.Pdf.open(input_path)
-        output_filename = f"pipeline_comp_{datetime.now().strftime('%H%M%S')}_{os.path.basename(input_path)}"
-        output_path = os.path.join(self.output_folder, output_filename)
-        
-        pdf.save(output_path, compress_streams=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
-        pdf.close()
-        return output_filename
+            inputs = [input_path]
+        steps = [(f"{node['index']}_{secure_filename(node['id'])}", node['name'], node['params'], node.get('key'))
+                 for node in segment['nodes']]
+        cache = self.cache if self.cache.enabled else None
+        return inputs, steps, work_dir, segment['final_path'], cache, segment['resume']
+
+    def _progress(self, segment):
+        for position, node in enumerate(segment['nodes']):
+            update = {'status': 'progress', 'step_index': node['index'], 'step_id': node['id'],
+                      'step_name': node['op'], 'message': f"Running {node['op']}..."}
+            if position < segment['resume']:
+                update.update(cached=True, message=f"Using cached {node['op']} result")
+            yield update
+
+    def _completed(self, segment, outcome):
+        """Records a finished segment's outputs; yields progress for steps that were not cached after all."""
+        paths, resume = outcome
+        for node in segment['nodes'][resume:segment['resume']]:
+            # The entry was pruned between planning and running
+            yield {'status': 'progress', 'step_index': node['index'], 'step_id': node['id'],
+                   'step_name': node['op'], 'cached': False,
+                   'message': f"Cached {node['op']} result expired, ran it again"}
+        segment['resume'] = resume
+        node = segment['nodes'][-1]
+        yield {'status': 'step_complete', 'step_index': node['index'], 'step_id': node['id'],
+               'step_name': node['op'], 'files': len(paths)}
+        return paths
+
+    def _schedule(self, segments, input_path, work_dir, results):
+        """Runs the segments as their inputs become ready, yielding progress."""
+        def task(segment):
+            return self._task(segment, input_path, work_dir, results)
+
+        if len(segments) == 1 and self.pools is None:
+            segment = segments[0]
+            yield from self._progress(segment)
+            results[segment['id']] = yield from self._completed(segment, run_segment(task(segment)))
+            return
+
+        cpu, threads = self.pools or make_pools(self.workers or default_workers())
+        waiting = list(segments)
+        pending = {}
+        try:
+            while waiting or pending:
+                for segment in [s for s in waiting if all(p in results for p in s['parents'])]:
+                    waiting.remove(segment)
+                    pool = cpu if segment['cost'] == CPU else threads
+                    pending[pool.submit(run_segment, task(segment))] = segment
+                    yield from self._progress(segment)
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    segment = pending.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        names = ', '.join(node['op'] for node in segment['nodes'])
+                        logger.error(f"Pipeline failed at step {names}: {e}")
+                        raise
+                    results[segment['id']] = yield from self._completed(segment, outcome)
+        finally:
+            if self.pools is None:
+                for pool in (threads, cpu):
+                    pool.shutdown(wait=True, cancel_futures=True)
+            else:
+                # Shared pools keep running other files; finish ours before cleanup
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+
+    def _collect(self, segments, results, filename, written):
+        """Moves the results of the final steps into the output folder."""
+        outputs = []
+        stem = Path(secure_filename(os.path.basename(filename))).stem
+        for segment in segments:
+            if segment['children']:
+                continue
+            node = segment['nodes'][-1]
+            for path in results[segment['id']]:
+                if path != segment['final_path']:
+                    destination = os.path.join(self.output_folder,
+                                               f"{segment['prefix']}_{stem}_{os.path.basename(path)}")
+                    shutil.move(path, destination)
+                    path = destination
+                    written.append(path)
+                outputs.append({'step_id': node['id'], 'step_name': node['op'],
+                                'filename': os.path.basename(path)})
+        return outputs
+
+    def _zip_outputs(self, outputs, filename, written):
+        stem = Path(secure_filename(os.path.basename(filename))).stem
+        zip_name = f"pipeline_{datetime.now().strftime('%H%M%S')}_{stem}.zip"
+        zip_path = os.path.join(self.output_folder, zip_name)
+        written.append(zip_path)
+        write_zip(zip_path, ((o['filename'], os.path.join(self.output_folder, o['filename'])) for o in outputs))
+        return zip_name
+
+    def _find_input(self, filename):
+        # Try finding the file in output then upload folder
+        for folder in (self.output_folder, self.upload_folder):
+            path = os.path.join(folder, secure_filename(filename))
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"Input file {filename} not found")
@@ -0,0 +1,284 @@
+"""
+Operation registry for the pipeline executor.
+
+Every operation a pipeline step can name is registered here with what it
+consumes, what it produces and how it should be scheduled:
+
+- ``inputs`` / ``outputs``: file kinds ('pdf', 'docx', 'zip', 'txt',
+  'image'). A trailing ``*`` means any number of files of that kind, so
+  ``merge`` takes 'pdf*' and ``split`` produces 'pdf*'. The executor checks
+  that every edge of a pipeline connects matching kinds before running it.
+- ``cost``: ``CPU`` work runs in worker processes, ``IO`` and ``SUBPROCESS``
+  work (waiting on disk, Ghostscript or Tesseract) runs in threads.
+- ``in_memory``: the operation edits an open pikepdf document instead of
+  reading and writing files. Consecutive in-memory steps share one open
+  document, which is serialized once.
+
+File operations are called as ``func(input_paths, output_dir, params)`` and
+return the paths of the files they wrote into ``output_dir``. In-memory
+operations are called as ``func(pdf, params, save_options)``; options they
+add to ``save_options`` are applied when the document is saved.
+"""
+import os
+import uuid
+import shutil
+
+import pikepdf
+
+from compress_engine import compress
+from merge_engine import merge_pdfs
+from pdfa_engine import convert as convert_pdfa
+from sanitize_engine import SanitizePolicy, sanitize
+from split_engine import plan_split, iter_split, part_filename
+from watermark_engine import Watermark, STAMP_DEFAULTS, apply_watermark, select_pages
+from pdf_output import LINEARIZE_MIN_BYTES
+from zip_stream import write_zip
+
+# Cost classes
+CPU = 'cpu'
+IO = 'io'
+SUBPROCESS = 'subprocess'
+COSTS = (CPU, IO, SUBPROCESS)
+
+# Operation name -> dict(name, func, inputs, outputs, cost, in_memory, description)
+OPERATIONS = {}
+
+
+def register_operation(name, inputs=('pdf',), outputs=('pdf',), cost=CPU, in_memory=False):
+    def decorator(func):
+        if cost not in COSTS:
+            raise ValueError(f"Unknown cost class '{cost}'")
+        OPERATIONS[name] = {
+            'name': name,
+            'func': func,
+            'inputs': tuple(inputs),
+            'outputs': tuple(outputs),
+            'cost': cost,
+            'in_memory': in_memory,
+            'description': (func.__doc__ or '').strip().split('\n')[0],
+        }
+        return func
+    return decorator
+
+
+def get_operation(name):
+    """Returns the registry entry for ``name``.
+
+    Raises:
+        ValueError: If no operation is registered under that name.
+    """
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {name}")
+    return OPERATIONS[name]
+
+
+def resolve_operation(name, params):
+    """Maps a step's op name and params to a registered operation name.
+
+    'compress' with a quality preset or engine runs the image compressor,
+    which works on files; plain 'compress' only compresses streams on save.
+    """
+    if name == 'compress' and ('quality' in params or 'engine' in params):
+        return 'compress_images'
+    return name
+
+
+def kind_of(spec):
+    """('pdf*') -> ('pdf', True): the file kind and whether any number is allowed."""
+    return spec.rstrip('*'), spec.endswith('*')
+
+
+def describe_operations():
+    """The registry without the callables, for listing in the UI."""
+    return [
+        {key: value for key, value in operation.items() if key != 'func'}
+        for operation in OPERATIONS.values()
+    ]
+
+
+def _single(input_paths, name):
+    if len(input_paths) != 1:
+        raise ValueError(f"{name} takes one file, got {len(input_paths)}")
+    return input_paths[0]
+
+
+def _uniquely_named(input_path, output_dir):
+    # The Docling extractors write next to the working directory, named after
+    # the input's stem; give each call a stem no other call shares
+    path = os.path.join(output_dir, f"{uuid.uuid4().hex}.pdf")
+    shutil.copyfile(input_path, path)
+    return path
+
+
+# --- In-memory operations -----------------------------------------------------
+
+@register_operation('sanitize', in_memory=True)
+def op_sanitize(pdf, params, save_options):
+    """Removes active content (JavaScript, launch actions), or what the params select."""
+    sanitize(pdf, SanitizePolicy.from_params(params, javascript=True, launch_actions=True))
+
+
+@register_operation('flatten', in_memory=True)
+def op_flatten(pdf, params, save_options):
+    """Flattens annotations into the page content."""
+    pdf.flatten_annotations()
+
+
+@register_operation('watermark', in_memory=True)
+def op_watermark(pdf, params, save_options):
+    """Adds a text watermark to the pages, drawn once as a shared Form XObject."""
+    apply_watermark(pdf, Watermark.from_params(params), select_pages(params.get('pages'), len(pdf.pages)))
+
+
+@register_operation('stamp', in_memory=True)
+def op_stamp(pdf, params, save_options):
+    """Adds a small text stamp in a corner of the pages."""
+    apply_watermark(pdf, Watermark.from_params(params, **STAMP_DEFAULTS),
+                    select_pages(params.get('pages'), len(pdf.pages)))
+
+
+@register_operation('compress', in_memory=True)
+def op_compress(pdf, params, save_options):
+    """Compresses streams and packs objects into object streams on save."""
+    save_options.update(compress_streams=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+
+# --- File operations ----------------------------------------------------------
+
+@register_operation('compress_images', cost=CPU)
+def op_compress_images(input_paths, output_dir, params):
+    """Recompresses images with a quality preset (compress_engine)."""
+    output_path = os.path.join(output_dir, 'compressed.pdf')
+    compress(_single(input_paths, 'compress'), output_path,
+             params.get('quality', 'ebook'), params.get('engine', 'native'))
+    return [output_path]
+
+
+@register_operation('ocr', cost=SUBPROCESS)
+def op_ocr(input_paths, output_dir, params):
+    """Adds a text layer with ocrmypdf (Tesseract)."""
+    import ocrmypdf
+
+    output_path = os.path.join(output_dir, 'ocr.pdf')
+    ocrmypdf.ocr(
+        _single(input_paths, 'ocr'),
+        output_path,
+        language=params.get('language', 'eng'),
+        deskew=True,
+        skip_text=True,
+        fast_web_view=LINEARIZE_MIN_BYTES / 1e6 if LINEARIZE_MIN_BYTES >= 0 else 1e9,
+        progress_bar=False,
+    )
+    return [output_path]
+
+
+@register_operation('split', outputs=('pdf*',), cost=CPU)
+def op_split(input_paths, output_dir, params):
+    """Splits into parts by ranges, page count, bookmarks or size (split_engine)."""
+    with pikepdf.open(_single(input_paths, 'split')) as pdf:
+        parts, invalid = plan_split(
+            pdf,
+            mode=params.get('mode', 'ranges'),
+            ranges=params.get('ranges'),
+            pages_per_part=params.get('pages_per_part'),
+            max_bytes=params.get('max_bytes'),
+        )
+        if invalid:
+            raise ValueError(f"Invalid page ranges: {', '.join(invalid)}")
+        if not parts:
+            raise ValueError("The split produced no parts")
+        paths = []
+        for part, data in iter_split(pdf, parts):
+            path = os.path.join(output_dir, part_filename('part', part))
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+@register_operation('merge', inputs=('pdf*',), cost=IO)
+def op_merge(input_paths, output_dir, params):
+    """Merges the inputs in order (merge_engine)."""
+    output_path = os.path.join(output_dir, 'merged.pdf')
+    merge_pdfs(input_paths, output_path)
+    return [output_path]
+
+
+@register_operation('pdfa', cost=SUBPROCESS)
+def op_pdfa(input_paths, output_dir, params):
+    """Converts to PDF/A with Ghostscript, unless the input already conforms."""
+    output_path = os.path.join(output_dir, 'pdfa.pdf')
+    convert_pdfa(_single(input_paths, 'pdfa'), output_path, params.get('level', '2b'),
+                 timeout=params.get('timeout', 300), force=params.get('force', False))
+    return [output_path]
+
+
+@register_operation('translate', cost=CPU)
+def op_translate(input_paths, output_dir, params):
+    """Translates the text in place, keeping the layout."""
+    from pdf_translation_service import PDFTranslationService
+
+    target_lang = params.get('target_lang')
+    if not target_lang:
+        raise ValueError("translate requires 'target_lang'")
+    output_path = os.path.join(output_dir, f"translated_{target_lang}.pdf")
+    PDFTranslationService().translate_pdf_in_place(
+        _single(input_paths, 'translate'), output_path, params.get('source_lang', 'en'), target_lang)
+    return [output_path]
+
+
+@register_operation('docx', outputs=('docx',), cost=CPU)
+def op_docx(input_paths, output_dir, params):
+    """Extracts the full document to Word (Docling)."""
+    from extract_full_document_to_word import extract_full_document_to_word
+
+    source = _uniquely_named(_single(input_paths, 'docx'), output_dir)
+    try:
+        produced = extract_full_document_to_word(source)
+    finally:
+        os.remove(source)
+    if not produced:
+        raise ValueError("Word extraction produced no document")
+    output_path = os.path.join(output_dir, 'document.docx')
+    shutil.move(str(produced), output_path)
+    return [output_path]
+
+
+@register_operation('csv', outputs=('zip',), cost=CPU)
+def op_csv(input_paths, output_dir, params):
+    """Extracts tables to CSV files, zipped (Docling)."""
+    from extract_tables_to_csv import extract_tables
+
+    source = _uniquely_named(_single(input_paths, 'csv'), output_dir)
+    try:
+        tables_dir = extract_tables(source)
+    finally:
+        os.remove(source)
+    if not tables_dir:
+        raise ValueError("Table extraction produced no output")
+    output_path = os.path.join(output_dir, 'tables.zip')
+    try:
+        names = sorted(os.listdir(tables_dir))
+        write_zip(output_path, ((name, os.path.join(tables_dir, name)) for name in names))
+    finally:
+        shutil.rmtree(tables_dir, ignore_errors=True)
+    return [output_path]
+
+
+@register_operation('txt', outputs=('txt',), cost=CPU)
+def op_txt(input_paths, output_dir, params):
+    """Extracts the text layer to a TXT file."""
+    from converters import pdf_to_txt
+
+    return [os.path.join(output_dir, name)
+            for name in pdf_to_txt(_single(input_paths, 'txt'), output_dir, params)]
+
+
+@register_operation('images', outputs=('image*',), cost=CPU)
+def op_images(input_paths, output_dir, params):
+    """Renders pages to images (png, jpg, webp or tiff)."""
+    from converters import pdf_to_images
+
+    names = pdf_to_images(_single(input_paths, 'images'), output_dir, params.get('format', 'png'), params)
+    return [os.path.join(output_dir, name) for name in names]
+
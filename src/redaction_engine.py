@@ -0,0 +1,245 @@
+"""
+Server-side redaction for /api/apply_redactions.
+
+Redaction targets come from two sources:
+
+- Search patterns, matched against each page's text layer: regular
+  expressions, term lists (literal, optionally whole-word) and PII presets
+  (``PII_PRESETS``: e-mail addresses, phone numbers, US SSNs, Luhn-valid
+  card numbers, IBANs, IPv4 addresses).
+- Rectangles drawn in the viewer: ``{'pageIndex', 'x', 'y', 'width',
+  'height'}`` in points from the page's top-left corner.
+
+Searching is the expensive part, so ``find_matches`` splits the document
+into page chunks and searches them in parallel worker processes. Each
+worker opens the file once and rebuilds every page's text with the box of
+each character, so a match maps to exact per-line rectangles (no second
+text search that could also hit unrelated occurrences).
+
+``apply_redactions`` then makes one pass over the pages that have targets
+and applies true redactions with PyMuPDF. Text under a target is removed
+from the content stream, overlapped image pixels are blanked and covered
+vector graphics are dropped. A black box marks each area. Large outputs
+are linearized like the other editor outputs.
+"""
+import re
+import logging
+
+import fitz  # PyMuPDF
+
+from worker_pool import imap_ordered, default_workers
+from pdf_output import linearize_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 16
+
+PII_PRESETS = {
+    'email': r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',
+    # Digit groups not starting or ending inside a longer number; see _phone_valid
+    'phone': r'(?<![\w.,+])(?<!\d[ .,-])(?:\+\d{1,3}[ .-]?)?(?:\(\d{1,4}\)[ .-]?)?\d{2,4}(?:[ .-]\d{2,4}){1,4}'
+             r'(?!\w|[.,]\d)',
+    'ssn': r'(?<!\d)\d{3}-\d{2}-\d{4}(?!\d)',
+    'credit_card': r'(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)',
+    'iban': r'\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,4})?\b',
+    'ipv4': r'(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\d.])',
+}
+
+
+def _luhn_valid(text):
+    digits = [int(c) for c in text if c.isdigit()]
+    checksum = 0
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        checksum += digit
+    return checksum % 10 == 0
+
+
+# Digit runs shaped like phone numbers that are something else
+NOT_PHONE = re.compile(
+    r'\d{4}-\d{2}-\d{2}'                  # ISO date
+    r'|\d{1,2}[./-]\d{1,2}[./-]\d{4}'      # day.month.year
+    r'|\d{1,3}(?:[ ,.]\d{3})+[.,]\d{2}'    # amount with thousands and cents
+    r'|\d{1,3}(?:\.\d{1,3}){3}'            # IPv4 address
+    r'|\d{3}-\d{2}-\d{4}'                  # SSN
+)
+
+
+def _phone_valid(text):
+    """7 to 15 digits, and a leading +, an (area code) or at least three digit groups."""
+    if NOT_PHONE.fullmatch(text):
+        return False
+    groups = re.findall(r'\d+', text)
+    digits = sum(len(group) for group in groups)
+    if not 7 <= digits <= 15:
+        return False
+    return text.startswith(('+', '(')) or len(groups) >= 3
+
+
+# Extra checks a preset match must pass
+PRESET_VALIDATORS = {'credit_card': _luhn_valid, 'phone': _phone_valid}
+
+
+def build_patterns(patterns=None, presets=None, terms=None, case_sensitive=False, whole_words=False):
+    """Normalizes search requests into ``(label, regex source, flags)`` tuples.
+
+    Raises:
+        ValueError: For an unknown preset or an invalid regular expression.
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+    built = []
+    for name in presets or []:
+        if name not in PII_PRESETS:
+            raise ValueError(f"Unknown PII preset '{name}'. Available: {', '.join(PII_PRESETS)}")
+        # Presets define their own case rules
+        built.append((name, PII_PRESETS[name], 0))
+    for source in patterns or []:
+        try:
+            re.compile(source, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern '{source}': {e}")
+        built.append(('pattern', source, flags))
+    literal = [re.escape(term) for term in terms or [] if term.strip()]
+    if literal:
+        source = '|'.join(sorted(literal, key=len, reverse=True))
+        built.append(('term', rf'\b(?:{source})\b' if whole_words else source, flags))
+    return built
+
+
+def _page_text(page):
+    """The page text and, per character, its box (None for line breaks)."""
+    chars, boxes = [], []
+    for block in page.get_text('rawdict')['blocks']:
+        for line in block.get('lines', []):
+            for span in line['spans']:
+                for char in span['chars']:
+                    chars.append(char['c'])
+                    boxes.append(char['bbox'])
+            chars.append('\n')
+            boxes.append(None)
+    return ''.join(chars), boxes
+
+
+def _match_rects(boxes, start, end):
+    """One rectangle per line covered by the characters ``start:end``."""
+    rects, current = [], None
+    for box in boxes[start:end]:
+        if box is None:
+            if current is not None:
+                rects.append(current)
+            current = None
+            continue
+        rect = fitz.Rect(box)
+        current = rect if current is None else current | rect
+    if current is not None:
+        rects.append(current)
+    return [tuple(r) for r in rects if not r.is_empty]
+
+
+def search_page(page, compiled):
+    """Matches on one page: list of {'label', 'text', 'rects'}."""
+    text, boxes = _page_text(page)
+    matches = []
+    for label, regex in compiled:
+        validator = PRESET_VALIDATORS.get(label)
+        for match in regex.finditer(text):
+            if not match.group(0).strip() or (validator and not validator(match.group(0))):
+                continue
+            rects = _match_rects(boxes, match.start(), match.end())
+            if rects:
+                matches.append({'label': label, 'text': match.group(0), 'rects': rects})
+    return matches
+
+
+def _search_chunk(task):
+    pdf_path, start, end, patterns = task
+    compiled = [(label, re.compile(source, flags)) for label, source, flags in patterns]
+    with fitz.open(pdf_path) as doc:
+        return [search_page(doc.load_page(i), compiled) for i in range(start, end)]
+
+
+def find_matches(pdf_path, patterns, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Searches every page for ``patterns`` (see ``build_patterns``), in parallel page chunks.
+
+    Returns:
+        dict: page index -> list of matches, for pages with at least one.
+    """
+    if not patterns:
+        return {}
+    with fitz.open(pdf_path) as doc:
+        total = doc.page_count
+    chunks = [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+    workers = min(workers or default_workers(), max(len(chunks), 1))
+
+    found = {}
+    tasks = ((pdf_path, start, end, patterns) for start, end in chunks)
+    for (start, _), pages in zip(chunks, imap_ordered(_search_chunk, tasks, workers=workers)):
+        for offset, matches in enumerate(pages):
+            if matches:
+                found[start + offset] = matches
+    return found
+
+
+def group_rectangles(rectangles):
+    """Viewer rectangles grouped by page index, in one pass."""
+    by_page = {}
+    for r in rectangles or []:
+        x, y = float(r['x']), float(r['y'])
+        rect = (x, y, x + float(r['width']), y + float(r['height']))
+        by_page.setdefault(int(r['pageIndex']), []).append(rect)
+    return by_page
+
+
+def apply_redactions(pdf_path, output_path, matches=None, rectangles=None, fill=(0, 0, 0)):
+    """Writes ``pdf_path`` to ``output_path`` with the matches and rectangles truly redacted.
+
+    Args:
+        matches (dict): page index -> matches, from ``find_matches``.
+        rectangles (dict): page index -> (x0, y0, x1, y1) in the page's
+            displayed (rotated) space, from ``group_rectangles``.
+
+    Returns:
+        dict: 'hits_per_page' (page number -> pattern matches), 'total_hits',
+        'areas' (rectangles redacted, including drawn ones) and 'pages_redacted'.
+    """
+    matches = matches or {}
+    rectangles = rectangles or {}
+    hits_per_page = {}
+    areas = 0
+    pages_redacted = 0
+
+    with fitz.open(pdf_path) as doc:
+        for index in sorted(set(matches) | set(rectangles)):
+            if not 0 <= index < doc.page_count:
+                continue
+            page = doc.load_page(index)
+            for match in matches.get(index, []):
+                for rect in match['rects']:
+                    page.add_redact_annot(fitz.Rect(rect), fill=fill)
+                    areas += 1
+            for rect in rectangles.get(index, []):
+                # Drawn on the displayed page; annotations use unrotated coordinates
+                page.add_redact_annot(fitz.Rect(rect) * page.derotation_matrix, fill=fill)
+                areas += 1
+            page.apply_redactions(
+                images=fitz.PDF_REDACT_IMAGE_PIXELS,
+                graphics=fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED,
+                text=fitz.PDF_REDACT_TEXT_REMOVE,
+            )
+            pages_redacted += 1
+            if matches.get(index):
+                hits_per_page[index + 1] = len(matches[index])
+
+        # garbage=3 drops the replaced content streams and unused objects
+        doc.save(output_path, garbage=3, deflate=True)
+    linearize_file(output_path)
+
+    return {
+        'hits_per_page': hits_per_page,
+        'total_hits': sum(hits_per_page.values()),
+        'areas': areas,
+        'pages_redacted': pages_redacted,
+    }
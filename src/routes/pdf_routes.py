@@ -6,73 +6,109 @@ import io
 import subprocess
 import logging
 from datetime import datetime
-from PIL import Image, ImageChops
+from PIL import Image
 from flask import Blueprint, request, jsonify, url_for, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from pypdf import PdfReader, PdfWriter
-from pypdf.generic import RectangleObject
-from pdf2image import convert_from_path
+from page_renderer import PageRenderer
+from zip_stream import iter_zip, write_zip
+from split_engine import plan_split, iter_split, part_filename
+from merge_engine import merge_pdfs
+from compress_engine import compress, estimate as estimate_compression, ENGINES, DEFAULT_ENGINE
+from pdf_output import save_pdf, linearize_file
+from sanitize_engine import SanitizePolicy, sanitize
+from watermark_engine import Watermark, STAMP_DEFAULTS, apply_watermark, select_pages
+from form_fill_engine import FormTemplate, MailMerge, parse_records, load_records_file, DEFAULT_NAME_PATTERN
+from redaction_engine import build_patterns, find_matches, group_rectangles, apply_redactions as redact_pdf
+from compare_engine import (
+    align, compare_pages, compare_page_adaptive, side_by_side, page_fingerprints, identical_pages,
+    page_texts, word_diff, DEFAULT_TILE_SIZE, DEFAULT_DPI_LADDER
+)
 import pikepdf
 from pipeline_executor import PipelineExecutor
+from pipeline_ops import describe_operations
+from pdfa_engine import PDFA_LEVELS, convert as convert_pdfa, convert_batch as convert_pdfa_batch
 
 logger = logging.getLogger(__name__)
 
 pdf_bp = Blueprint('pdf', __name__)
 
+COMPARE_DPI = 150
+
 @pdf_bp.route('/split', methods=['POST'])
 def split_pdf():
+    """Splits a PDF into parts and zips them.
+
+    Body: 'filename' plus a 'mode':
+        'ranges' (default): 'ranges', a list of strings such as "1-3", "5", "8-end"
+        'every': 'pages_per_part'
+        'bookmarks': one part per top-level bookmark
+        'size': 'max_bytes', the estimated size limit per part
+    With 'stream': true the zip is returned directly as a chunked download
+    instead of being saved to the outputs folder.
+    """
     filename = request.json.get('filename')
+    mode = request.json.get('mode', 'ranges')
     ranges = request.json.get('ranges') # List of strings "1-3", "5", etc.
     
-    if not filename or not ranges:
+    if not filename or (mode == 'ranges' and not ranges):
         return jsonify({'error': 'Filename and ranges required'}), 400
         
     input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
     if not os.path.exists(input_path):
         return jsonify({'error': 'File not found'}), 404
         
+    base_name = os.path.splitext(secure_filename(filename))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    zip_filename = f"split_{timestamp}_{base_name}.zip"
+    
+    try:
+        pdf = pikepdf.open(input_path)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    try:
+        parts, _invalid = plan_split(
+            pdf, mode,
+            ranges=ranges,
+            pages_per_part=request.json.get('pages_per_part'),
+            max_bytes=request.json.get('max_bytes')
+        )
+    except ValueError as e:
+        pdf.close()
+        return jsonify({'error': str(e)}), 400
+    
+    if not parts:
+        pdf.close()
+        return jsonify({'error': 'No valid ranges processed'}), 400
+    
+    # Every part is built from the one open source and zipped as it is produced
+    def members():
+        try:
+            for part, data in iter_split(pdf, parts):
+                yield part_filename(base_name, part), data
+        finally:
+            pdf.close()
+    
+    if request.json.get('stream'):
+        return Response(
+            stream_with_context(iter_zip(members())),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
+        )
+    
     try:
-        reader = PdfReader(input_path)
-        total_pages = len(reader.pages)
-        
-        output_files = []
-        base_name = os.path.splitext(secure_filename(filename))[0]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        for i, r in enumerate(ranges):
-            writer = PdfWriter()
-            r = r.strip()
-            if '-' in r:
-                start, end = map(int, r.split('-'))
-            else:
-                start = int(r)
-                end = int(r)
-                
-            # validation
-            if start < 1 or end > total_pages or start > end:
-                continue # Skip invalid
-                
-            # pypdf is 0-indexed, user is 1-indexed
-            for p in range(start - 1, end):
-                writer.add_page(reader.pages[p])
-                
-            out_name = f"{base_name}_part{i+1}_{r}.pdf"
-            out_path = os.path.join(current_app.config['OUTPUT_FOLDER'], out_name)
-            writer.write(out_path)
-            output_files.append(out_name)
-            
-        if not output_files:
-             return jsonify({'error': 'No valid ranges processed'}), 400
-             
-        # Create ZIP
-        zip_filename = f"split_{timestamp}_{base_name}.zip"
         zip_path = os.path.join(current_app.config['OUTPUT_FOLDER'], zip_filename)
-        
-        with zipfile.ZipFile(zip_path, 'w') as zf:
-            for f in output_files:
-                zf.write(os.path.join(current_app.config['OUTPUT_FOLDER'], f), f)
+        write_zip(zip_path, members())
                 
-        return jsonify({'filename': zip_filename, 'url': url_for('download_file', filename=zip_filename)})
+        return jsonify({
+            'filename': zip_filename,
+            'url': url_for('download_file', filename=zip_filename),
+            'parts': [
+                {'filename': part_filename(base_name, part), 'pages': [part['start'] + 1, part['end']]}
+                for part in parts
+            ]
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -87,21 +123,25 @@ def merge_files():
         return jsonify({'error': 'At least two files are required for merging.'}), 400
         
     try:
-        merger = PdfWriter()
+        file_paths = []
         for filename in filenames:
             file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
             if not os.path.exists(file_path):
                  return jsonify({'error': f'File not found: {filename}'}), 404
-            merger.append(file_path)
+            file_paths.append(file_path)
             
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_filename = f"merged_{timestamp}.pdf"
         output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
         
-        merger.write(output_path)
-        merger.close()
+        # Shared fonts/images are stored once; stats include bytes saved and time per input
+        stats = merge_pdfs(file_paths, output_path)
         
-        return jsonify({'filename': output_filename, 'url': url_for('download_file', filename=output_filename)})
+        return jsonify({
+            'filename': output_filename,
+            'url': url_for('download_file', filename=output_filename),
+            'stats': stats
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -109,46 +149,36 @@ def merge_files():
 
 @pdf_bp.route('/compress', methods=['POST'])
 def compress_file():
+    """Compresses an uploaded PDF.
+
+    Body: 'filename', 'quality' (screen, ebook, printer, prepress; default ebook;
+    or scan for scanned documents, native engine only) and 'engine':
+    'ghostscript' (default) or 'native' (in-process image recompression). The
+    native engine also reports per-image savings in 'images'.
+    """
     data = request.json
     filename = data.get('filename')
     quality = data.get('quality', 'ebook')  # Default to ebook
+    engine = data.get('engine', DEFAULT_ENGINE)
 
     if not filename:
          return jsonify({'error': 'Filename required'}), 400
+    if engine not in ENGINES:
+         return jsonify({'error': f"Invalid engine. Allowed: {', '.join(ENGINES)}"}), 400
          
     input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
     if not os.path.exists(input_path):
          return jsonify({'error': 'File not found'}), 404
-         
-    original_size = os.path.getsize(input_path)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_filename = f"compressed_{quality}_{timestamp}_{secure_filename(filename)}"
     output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
     
-    # Quality Presets Mapping
-    QUALITY_PRESETS = {
-        'screen': '/screen',    # 72 dpi
-        'ebook': '/ebook',      # 150 dpi
-        'printer': '/printer',  # 300 dpi
-        'prepress': '/prepress' # 300 dpi + color
-    }
-    
-    preset = QUALITY_PRESETS.get(quality, '/ebook')
-
-    # GS Command
-    cmd = [
-        "gs", "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.4", 
-        f"-dPDFSETTINGS={preset}",
-        "-dNOPAUSE", "-dQUIET", "-dBATCH",
-        f"-sOutputFile={output_path}",
-        input_path
-    ]
-    
     try:
-        subprocess.run(cmd, check=True)
+        stats = compress(input_path, output_path, quality, engine)
         
-        compressed_size = os.path.getsize(output_path)
+        original_size = stats['original_size']
+        compressed_size = stats['compressed_size']
         reduction_percent = 0
         if original_size > 0:
             reduction_percent = round(((original_size - compressed_size) / original_size) * 100, 1)
@@ -158,10 +188,49 @@ def compress_file():
             'url': url_for('download_file', filename=output_filename),
             'original_size': original_size,
             'compressed_size': compressed_size,
-            'reduction_percent': reduction_percent
+            'reduction_percent': reduction_percent,
+            'engine': engine,
+            'images_recompressed': stats['images_recompressed'],
+            'images': stats['images']
         })
-    except subprocess.CalledProcessError as e:
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
         return jsonify({'error': 'Compression failed'}), 500
+    except Exception as e:
+        logger.error(f"Compression failed: {e}")
+        return jsonify({'error': f'Compression failed: {e}'}), 500
+
+
+@pdf_bp.route('/compress/estimate', methods=['POST'])
+def compress_estimate():
+    """Predicts the native engine's output size and time per preset from a sample of images.
+
+    Body: 'filename' and optionally 'qualities' (list of presets, default all four).
+    """
+    data = request.json or {}
+    filename = data.get('filename')
+    qualities = data.get('qualities')
+
+    if not filename:
+         return jsonify({'error': 'Filename required'}), 400
+    if qualities is not None and (not isinstance(qualities, list) or not qualities):
+         return jsonify({'error': 'qualities must be a non-empty list'}), 400
+
+    input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
+    if not os.path.exists(input_path):
+         return jsonify({'error': 'File not found'}), 404
+
+    try:
+        result = estimate_compression(input_path, qualities)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Compression estimate failed: {e}")
+        return jsonify({'error': f'Estimate failed: {e}'}), 500
+
+    result['engine'] = 'native'
+    return jsonify(result)
 
 
 @pdf_bp.route('/pdf-to-jpg', methods=['POST'])
@@ -175,24 +244,35 @@ def pdf_to_jpg():
         if not os.path.exists(input_path):
              return jsonify({'error': 'File not found'}), 404
              
-        # Convert
-        images = convert_from_path(input_path, dpi=150)
-        
         base_name = os.path.splitext(secure_filename(filename))[0]
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         zip_filename = f"images_{timestamp}_{base_name}.zip"
         zip_path = os.path.join(current_app.config['OUTPUT_FOLDER'], zip_filename)
         
-        with zipfile.ZipFile(zip_path, 'w') as zf:
-            for i, image in enumerate(images):
-                img_name = f"{base_name}_page{i+1}.jpg"
-                img_path = os.path.join(current_app.config['OUTPUT_FOLDER'], img_name)
-                image.save(img_path, 'JPEG')
-                zf.write(img_path, img_name)
-                # Cleanup individual image
-                os.remove(img_path)
+        # Scanned pages can be exported from their embedded image instead of rendered
+        passthrough = bool(request.json.get('passthrough', False))
+        stats = {'passthrough_pages': 0}
+        
+        def page_members(renderer):
+            # Encode one page at a time; JPEGs are stored in the zip as-is
+            for i in range(renderer.page_count):
+                data = renderer.extract_page_image(i, 'JPEG') if passthrough else None
+                if data is not None:
+                    stats['passthrough_pages'] += 1
+                else:
+                    img_buffer = io.BytesIO()
+                    renderer.render(i).save(img_buffer, 'JPEG')
+                    data = img_buffer.getvalue()
+                yield f"{base_name}_page{i+1}.jpg", data
+        
+        with PageRenderer(input_path, dpi=150) as renderer:
+            write_zip(zip_path, page_members(renderer))
                 
-        return jsonify({'filename': zip_filename, 'url': url_for('download_file', filename=zip_filename)})
+        return jsonify({
+            'filename': zip_filename,
+            'url': url_for('download_file', filename=zip_filename),
+            'passthrough_pages': stats['passthrough_pages']
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -225,6 +305,7 @@ def repair_pdf():
             
             with open(output_path, "wb") as f:
                 writer.write(f)
+            linearize_file(output_path)
                 
             return jsonify({'filename': output_filename, 'url': url_for('download_file', filename=output_filename)})
             
@@ -253,13 +334,35 @@ def compare_pdfs():
     if not os.path.exists(path2):
         return jsonify({'error': f'File not found: {filename2}'}), 404
     
+    # 'full' diffs whole pages at COMPARE_DPI; 'adaptive' screens at low DPI and
+    # re-renders only changed tiles up the DPI ladder
+    mode = request.json.get('mode', 'full')
+    if mode not in ('full', 'adaptive'):
+        return jsonify({'error': "mode must be 'full' or 'adaptive'"}), 400
+    try:
+        tile_size = float(request.json.get('tile_size', DEFAULT_TILE_SIZE))
+        dpi_ladder = [int(dpi) for dpi in request.json.get('dpi_ladder', DEFAULT_DPI_LADDER)]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'tile_size must be a number and dpi_ladder a list of integers'}), 400
+    if not 18 <= tile_size <= 1440:
+        return jsonify({'error': 'tile_size must be between 18 and 1440 points'}), 400
+    if len(dpi_ladder) < 2 or dpi_ladder != sorted(set(dpi_ladder)) or not 18 <= dpi_ladder[0] <= dpi_ladder[-1] <= 1200:
+        return jsonify({'error': 'dpi_ladder must list at least two increasing DPIs between 18 and 1200'}), 400
+    
     try:
-        # Convert PDFs to images
-        images1 = convert_from_path(path1, dpi=150)
-        images2 = convert_from_path(path2, dpi=150)
+        # Pages whose content, resources and annotations hash the same are
+        # identical; only the others are rendered and diffed
+        fingerprints1 = page_fingerprints(path1)
+        fingerprints2 = page_fingerprints(path2)
+        pages1 = len(fingerprints1)
+        pages2 = len(fingerprints2)
         
         # Handle page count differences
-        max_pages = max(len(images1), len(images2))
+        max_pages = max(pages1, pages2)
+        unchanged = set(identical_pages(fingerprints1, fingerprints2))
+        changed_pages = [i for i in range(max_pages) if i not in unchanged]
+        texts1 = page_texts(path1, changed_pages)
+        texts2 = page_texts(path2, changed_pages)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         base1 = os.path.splitext(secure_filename(filename1))[0]
@@ -268,86 +371,96 @@ def compare_pdfs():
         zip_path = os.path.join(current_app.config['OUTPUT_FOLDER'], zip_filename)
         
         differences_found = []
-        
-        with zipfile.ZipFile(zip_path, 'w') as zf:
-            for i in range(max_pages):
-                # Get images for this page (or create blank if one PDF is shorter)
-                if i < len(images1):
-                    img1 = images1[i].convert('RGB')
-                else:
-                    # Create blank image matching img2 size
-                    img1 = Image.new('RGB', images2[i].size, (255, 255, 255))
-                
-                if i < len(images2):
-                    img2 = images2[i].convert('RGB')
-                else:
-                    # Create blank image matching img1 size
-                    img2 = Image.new('RGB', images1[i].size, (255, 255, 255))
-                
-                # Resize to match if dimensions differ
-                if img1.size != img2.size:
-                    # Resize img2 to match img1
-                    img2 = img2.resize(img1.size, Image.Resampling.LANCZOS)
-                
-                # Calculate difference
-                diff = ImageChops.difference(img1, img2)
+        page_scores = {}
+        changed_regions = {}
+        text_changes = {}
+        changed_tiles = {}
+        # Regions are reported in pixels at this DPI
+        region_dpi = dpi_ladder[-1] if mode == 'adaptive' else COMPARE_DPI
+        
+        def record(i, result):
+            if result['has_diff']:
+                differences_found.append(i + 1)
+                page_scores[str(i + 1)] = round(result['score'], 6)
+                changed_regions[str(i + 1)] = result['regions']
+                changes = word_diff(texts1.get(i, ''), texts2.get(i, ''))
+                if changes:
+                    text_changes[str(i + 1)] = changes
+        
+        with zipfile.ZipFile(zip_path, 'w') as zf, \
+                PageRenderer(path1, dpi=region_dpi) as renderer1, \
+                PageRenderer(path2, dpi=region_dpi) as renderer2:
+            for i in changed_pages:
+                # Adaptive mode needs the page in both documents at the same size
+                if mode == 'adaptive' and i < pages1 and i < pages2 \
+                        and renderer1.page_size(i) == renderer2.page_size(i):
+                    result = compare_page_adaptive(renderer1, renderer2, i, dpi_ladder, tile_size)
+                    record(i, result)
+                    
+                    # Low-DPI overview plus a high-DPI crop of every confirmed tile
+                    sbs_buffer = io.BytesIO()
+                    side_by_side(*result['preview']).save(sbs_buffer, 'JPEG', quality=85)
+                    zf.writestr(f"page_{i+1}_sidebyside.jpg", sbs_buffer.getvalue())
+                    page_tiles = []
+                    for tile in result['tiles']:
+                        tile_name = f"page_{i+1}_tile_{tile['row']}_{tile['col']}.png"
+                        tile_buffer = io.BytesIO()
+                        tile['image'].save(tile_buffer, 'PNG')
+                        zf.writestr(tile_name, tile_buffer.getvalue())
+                        page_tiles.append({'image': tile_name, 'bbox': tile['bbox'], 'score': round(tile['score'], 6)})
+                    if page_tiles:
+                        changed_tiles[str(i + 1)] = page_tiles
+                    continue
                 
-                # Check if there are any differences
-                diff_bbox = diff.getbbox()
-                has_diff = diff_bbox is not None
+                page1 = renderer1.render(i) if i < pages1 else None
+                page2 = renderer2.render(i) if i < pages2 else None
                 
-                if has_diff:
-                    differences_found.append(i + 1)
+                # Create blank image matching the other page if one PDF is shorter
+                img1 = page1 if page1 is not None else Image.new('RGB', page2.size, (255, 255, 255))
+                img2 = page2 if page2 is not None else Image.new('RGB', page1.size, (255, 255, 255))
                 
-                # Create side-by-side comparison
-                width = img1.width + img2.width + 20  # 20px gap
-                height = max(img1.height, img2.height)
-                side_by_side = Image.new('RGB', (width, height), (240, 240, 240))
-                side_by_side.paste(img1, (0, 0))
-                side_by_side.paste(img2, (img1.width + 20, 0))
+                # Resize to match if dimensions differ, then diff as arrays
+                img1, img2 = align(img1, img2)
+                result = compare_pages(img1, img2)
+                record(i, result)
                 
                 # Save side-by-side
                 sbs_name = f"page_{i+1}_sidebyside.jpg"
                 sbs_buffer = io.BytesIO()
-                side_by_side.save(sbs_buffer, 'JPEG', quality=85)
-                sbs_buffer.seek(0)
+                side_by_side(img1, img2).save(sbs_buffer, 'JPEG', quality=85)
                 zf.writestr(sbs_name, sbs_buffer.getvalue())
                 
-                # Create diff overlay (highlight differences in red)
-                if has_diff:
-                    # Convert diff to grayscale and threshold
-                    diff_gray = diff.convert('L')
-                    # Create a red overlay for differences
-                    diff_overlay = Image.new('RGBA', img1.size, (0, 0, 0, 0))
-                    
-                    # Iterate pixels and highlight differences
-                    diff_pixels = diff_gray.load()
-                    overlay_pixels = diff_overlay.load()
-                    
-                    for x in range(diff_gray.width):
-                        for y in range(diff_gray.height):
-                            if diff_pixels[x, y] > 20:  # Threshold for noise
-                                overlay_pixels[x, y] = (255, 0, 0, 128)  # Semi-transparent red
-                    
-                    # Composite overlay on img1
-                    img1_rgba = img1.convert('RGBA')
-                    diff_result = Image.alpha_composite(img1_rgba, diff_overlay)
-                    
+                # Diff overlay (differences highlighted in red)
+                if result['has_diff']:
                     diff_name = f"page_{i+1}_diff.png"
                     diff_buffer = io.BytesIO()
-                    diff_result.save(diff_buffer, 'PNG')
-                    diff_buffer.seek(0)
+                    result['overlay'].save(diff_buffer, 'PNG')
                     zf.writestr(diff_name, diff_buffer.getvalue())
             
             # Create summary JSON
             summary = {
                 'pdf1': filename1,
                 'pdf2': filename2,
-                'pages_pdf1': len(images1),
-                'pages_pdf2': len(images2),
+                'pages_pdf1': pages1,
+                'pages_pdf2': pages2,
                 'pages_with_differences': differences_found,
-                'total_differences': len(differences_found)
+                'total_differences': len(differences_found),
+                # Fraction of changed pixels and changed areas (pixels at `dpi`) per differing page
+                'mode': mode,
+                'dpi': region_dpi,
+                'page_scores': page_scores,
+                'changed_regions': changed_regions,
+                # Word-level text changes per differing page
+                'text_diff': text_changes,
+                # Pages skipped without rendering because their content is identical
+                'identical_pages': sorted(i + 1 for i in unchanged),
+                'pages_rendered': len(changed_pages)
             }
+            if mode == 'adaptive':
+                summary['tile_size'] = tile_size
+                summary['dpi_ladder'] = dpi_ladder
+                # High-DPI crops of the confirmed changes per page
+                summary['changed_tiles'] = changed_tiles
 
             zf.writestr('summary.json', json.dumps(summary, indent=2))
         
@@ -424,64 +537,59 @@ def crop_pdf():
 
 @pdf_bp.route('/api/apply_redactions', methods=['POST'])
 def apply_redactions():
+    """Truly redacts text and image content (redaction_engine).
+
+    Body: 'filename' plus at least one target:
+        'redactions': rectangles {pageIndex, x, y, width, height} drawn in the viewer
+        'patterns': regular expressions
+        'presets': PII presets ('email', 'phone', 'ssn', 'credit_card', 'iban', 'ipv4')
+        'terms': literal terms
+    Options: 'case_sensitive', 'whole_words' (for terms), 'workers' for the
+    page search and 'preview': true to only report the matches.
+    """
     data = request.json
     filename = data.get('filename')
     redactions = data.get('redactions', [])
-    
-    if not filename or not redactions:
-        return jsonify({'error': 'Filename and redactions required'}), 400
-        
+    patterns = data.get('patterns', [])
+    presets = data.get('presets', [])
+    terms = data.get('terms', [])
+    preview = data.get('preview', False)
+
+    if not filename or not (redactions or patterns or presets or terms):
+        return jsonify({'error': 'Filename and redactions, patterns, presets or terms required'}), 400
+
     input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
     if not os.path.exists(input_path):
         return jsonify({'error': 'File not found'}), 404
-        
+
     try:
-        reader = PdfReader(input_path)
-        writer = PdfWriter()
-        
-        for i, page in enumerate(reader.pages):
-            writer.add_page(page)
-            
-            page_redactions = [r for r in redactions if r['pageIndex'] == i]
-            
-            for r in page_redactions:
-                page_height = float(page.mediabox.height)
-                
-                x = float(r['x'])
-                y = float(r['y'])
-                w = float(r['width'])
-                h = float(r['height'])
-                
-                pdf_y = page_height - y - h
-                
-                writer_page = writer.pages[i]
-                rect = RectangleObject([x, pdf_y, x + w, pdf_y + h])
-                
-                annotation = {
-                    '/Type': '/Annot',
-                    '/Subtype': '/Square',
-                    '/Rect': rect,
-                    '/BS': {'/W': 0},
-                    '/IC': [0, 0, 0],
-                    '/C': [0, 0, 0],
-                    '/F': 4,
-                    '/T': 'Redaction'
-                }
-                
-                if '/Annots' not in writer_page:
-                    writer_page['/Annots'] = []
-                writer_page['/Annots'].append(annotation)
+        search = build_patterns(patterns, presets, terms,
+                                case_sensitive=data.get('case_sensitive', False),
+                                whole_words=data.get('whole_words', False))
+        rectangles = group_rectangles(redactions)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        matches = find_matches(input_path, search, workers=data.get('workers'))
+        hits_per_page = {index + 1: len(found) for index, found in matches.items()}
+        if preview:
+            return jsonify({
+                'matches': {index + 1: found for index, found in matches.items()},
+                'hits_per_page': hits_per_page,
+                'total_hits': sum(hits_per_page.values()),
+            })
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_filename = f"redacted_{timestamp}_{secure_filename(filename)}"
         output_path = os.path.join(current_app.config['UPLOAD_FOLDER'], output_filename)
-        
-        with open(output_path, "wb") as f:
-            writer.write(f)
-            
+
+        report = redact_pdf(input_path, output_path, matches, rectangles)
+
         return jsonify({
             'filename': output_filename,
-            'download_url': url_for('uploaded_file', filename=output_filename)
+            'download_url': url_for('uploaded_file', filename=output_filename),
+            **report
         })
 
     except Exception as e:
@@ -491,13 +599,18 @@ def apply_redactions():
 
 @pdf_bp.route('/pdf-to-pdfa', methods=['POST'])
 def convert_to_pdfa():
+    """Converts to PDF/A. An input that already conforms is copied unless 'force' is set."""
     filename = request.json.get('filename')
     level = request.json.get('level', '2b')
+    force = bool(request.json.get('force', False))
     
     logger.info(f"PDF/A conversion requested for {filename} at level {level}")
     
     if not filename:
          return jsonify({'error': 'Filename required'}), 400
+    # level becomes part of the output filename
+    if level not in PDFA_LEVELS:
+         return jsonify({'error': f"level must be one of {', '.join(PDFA_LEVELS)}"}), 400
          
     input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
     if not os.path.exists(input_path):
@@ -507,25 +620,14 @@ def convert_to_pdfa():
     output_filename = f"pdfa_{level}_{timestamp}_{secure_filename(filename)}"
     output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
     
-    gs_level = 2
-    if level == '1b': gs_level = 1
-    elif level == '2b': gs_level = 2
-    elif level == '3b': gs_level = 3
-    
-    cmd = [
-        "gs", 
-        f"-dPDFA={gs_level}",
-        "-dBATCH", "-dNOPAUSE", 
-        "-sColorConversionStrategy=RGB",
-        "-sDEVICE=pdfwrite", 
-        "-dPDFACompatibilityPolicy=1", 
-        f"-sOutputFile={output_path}",
-        input_path
-    ]
-    
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
-        return jsonify({'filename': output_filename, 'url': url_for('download_file', filename=output_filename)})
+        result = convert_pdfa(input_path, output_path, level, timeout=30, force=force)
+        return jsonify({
+            'filename': output_filename,
+            'url': url_for('download_file', filename=output_filename),
+            'skipped': result['skipped'],
+            'precheck': result['precheck'],
+        })
     except subprocess.TimeoutExpired:
         return jsonify({'error': 'Conversion timed out'}), 504
     except subprocess.CalledProcessError as e:
@@ -534,13 +636,71 @@ def convert_to_pdfa():
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@pdf_bp.route('/api/pdfa/batch', methods=['POST'])
+def convert_to_pdfa_batch():
+    """Converts many uploads to PDF/A with a bounded number of Ghostscript processes.
+
+    Body: 'filenames', optional 'level', 'force', 'workers' and 'zip' (adds a
+    'zip_url' streaming every output). Returns per-file results and
+    throughput 'stats'.
+    """
+    data = request.json or {}
+    filenames = data.get('filenames') or []
+    level = data.get('level', '2b')
+
+    if not filenames:
+        return jsonify({'error': 'Filenames required'}), 400
+    # level becomes part of the output filenames
+    if level not in PDFA_LEVELS:
+        return jsonify({'error': f"level must be one of {', '.join(PDFA_LEVELS)}"}), 400
+    try:
+        workers = int(data['workers']) if data.get('workers') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'workers must be a number'}), 400
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results, pending, jobs = [], [], []
+    used = set()
+    for filename in filenames:
+        name = secure_filename(filename)
+        input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+        if not name or not os.path.exists(input_path):
+            results.append({'file': filename, 'error': 'File not found'})
+            continue
+        # A file listed twice still gets its own output
+        output_filename = f"pdfa_{level}_{timestamp}_{name}"
+        stem, ext = os.path.splitext(output_filename)
+        counter = 1
+        while output_filename in used:
+            output_filename = f"{stem}_{counter}{ext}"
+            counter += 1
+        used.add(output_filename)
+        results.append({'file': filename, 'filename': output_filename})
+        pending.append(results[-1])
+        jobs.append((input_path, os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)))
+
+    batch = convert_pdfa_batch(jobs, level, workers=workers, force=bool(data.get('force', False)))
+    outputs = []
+    for entry, result in zip(pending, batch['results']):
+        if 'error' in result:
+            del entry['filename']
+        else:
+            entry['url'] = url_for('download_file', filename=entry['filename'])
+            outputs.append(entry['filename'])
+        entry.update(result)
+
+    # Missing files count as failed
+    batch['stats']['failed'] += len(filenames) - len(jobs)
+    batch['stats']['files'] = len(filenames)
+    response = {'results': results, 'stats': batch['stats']}
+    if data.get('zip') and outputs:
+        response['zip_url'] = url_for('pdf.download_pipeline_zip', files=outputs)
+    return jsonify(response)
+
 @pdf_bp.route('/api/sanitize', methods=['POST'])
 def sanitize_pdf():
     filename = request.form.get('filename')
-    remove_js = request.form.get('remove_js') == 'true'
-    remove_metadata = request.form.get('remove_metadata') == 'true' 
-    remove_layers = request.form.get('remove_layers') == 'true'
-    remove_embedded = request.form.get('remove_embedded') == 'true'
+    policy = SanitizePolicy.from_form(request.form)
 
     if not filename:
          return jsonify({'error': 'Filename required'}), 400
@@ -550,79 +710,151 @@ def sanitize_pdf():
          return jsonify({'error': 'File not found'}), 404
 
     try:
-        pdf = pikepdf.Pdf.open(input_path)
-        summary = []
-        
-        if remove_js:
-            if '/Names' in pdf.Root:
-                names = pdf.Root['/Names']
-                if '/JavaScript' in names:
-                    del names['/JavaScript']
-                    summary.append('Removed document-level JavaScript')
-            
-            if '/OpenAction' in pdf.Root:
-                 del pdf.Root['/OpenAction']
-                 summary.append('Removed OpenAction scripts')
-            
-            count = 0
-            for page in pdf.pages:
-                if '/AA' in page:
-                    del page['/AA']
-                    count += 1
-                if '/Annots' in page:
-                    for annot in page.Annots:
-                        if '/A' in annot and '/S' in annot.A and annot.A.S == '/JavaScript':
-                             del annot['/A']
-                             count += 1
-                        if '/AA' in annot:
-                             del annot['/AA']
-                             count += 1
-            if count > 0:
-                summary.append(f'Removed {count} JS actions from pages/annotations')
-
-        if remove_metadata:
-            keys = list(pdf.docinfo.keys())
-            for k in keys:
-                del pdf.docinfo[k]
-            summary.append('Cleared Document Info dictionary')
-            
-            if '/Metadata' in pdf.Root:
-                del pdf.Root['/Metadata']
-                summary.append('Removed XMP Metadata')
-
-        if remove_layers:
-            if '/OCProperties' in pdf.Root:
-                del pdf.Root['/OCProperties']
-                summary.append('Removed Optional Content (Layers)')
-
-        if remove_embedded:
-             if '/Names' in pdf.Root:
-                names = pdf.Root['/Names']
-                if '/EmbeddedFiles' in names:
-                  del names['/EmbeddedFiles']
-                  summary.append('Removed Embedded Files')
-                  
-             if '/EmbeddedFiles' in pdf.Root:
-                 del pdf.Root['/EmbeddedFiles']
-                 summary.append('Removed Root Embedded Files')
+        with pikepdf.Pdf.open(input_path) as pdf:
+            report = sanitize(pdf, policy)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"sanitized_{timestamp}_{secure_filename(filename)}"
-        output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
-        
-        pdf.save(output_path)
-        pdf.close()
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_filename = f"sanitized_{timestamp}_{secure_filename(filename)}"
+            output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
+            save_pdf(pdf, output_path)
         
         return jsonify({
             'filename': output_filename, 
             'url': url_for('download_file', filename=output_filename),
-            'summary': summary
+            'summary': report['summary'],
+            'counts': report['counts'],
+            'findings': report['findings'],
+            'objects_visited': report['objects_visited']
         })
         
     except Exception as e:
         logger.error(f"Sanitization failed: {e}")
         return jsonify({'error': str(e)}), 500
 
+@pdf_bp.route('/api/watermark', methods=['POST'])
+def watermark_pdf():
+    """Adds a text watermark, or with 'stamp': true a corner stamp, to the pages.
+
+    Body: 'filename' plus optional 'text', 'color' (#rrggbb), 'opacity',
+    'size', 'rotation', 'position' (center, top, bottom, top-left, ...),
+    'layer' ('over' or 'under') and 'pages' (ranges such as "1-3", "8-end").
+    """
+    data = request.json or {}
+    filename = data.get('filename')
+
+    if not filename:
+         return jsonify({'error': 'Filename required'}), 400
+
+    input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
+    if not os.path.exists(input_path):
+         return jsonify({'error': 'File not found'}), 404
+
+    try:
+        mark = Watermark.from_params(data, **(STAMP_DEFAULTS if data.get('stamp') else {}))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with pikepdf.Pdf.open(input_path) as pdf:
+            try:
+                pages = select_pages(data.get('pages'), len(pdf.pages))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            report = apply_watermark(pdf, mark, pages)
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_filename = f"watermarked_{timestamp}_{secure_filename(filename)}"
+            output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
+            save_pdf(pdf, output_path)
+
+        return jsonify({
+            'filename': output_filename,
+            'url': url_for('download_file', filename=output_filename),
+            'pages': report['pages'],
+            'seconds': report['seconds']
+        })
+
+    except Exception as e:
+        logger.error(f"Watermark failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@pdf_bp.route('/api/forms/fields', methods=['GET'])
+def list_form_fields():
+    filename = request.args.get('filename')
+    if not filename:
+         return jsonify({'error': 'Filename required'}), 400
+    input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
+    if not os.path.exists(input_path):
+         return jsonify({'error': 'File not found'}), 404
+    try:
+        return jsonify({'fields': FormTemplate(input_path).describe()})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@pdf_bp.route('/api/forms/fill', methods=['POST'])
+def fill_forms():
+    """Fills a template's form once per record (mail merge).
+
+    Body: 'template' (uploaded PDF) and the records as 'records' (list of
+    objects), 'csv' (CSV text with a header row) or 'data_file' (an uploaded
+    .csv or .json). Options: 'output' ('zip', default, or 'merge' for one
+    flattened PDF), 'flatten', 'name_pattern' (e.g. "{last_name}.pdf"),
+    'workers' and, for zips, 'stream' to send the archive while it is built.
+    """
+    data = request.json or {}
+    template_name = data.get('template')
+    output = data.get('output', 'zip')
+
+    if not template_name:
+        return jsonify({'error': 'Template required'}), 400
+    if output not in ('zip', 'merge'):
+        return jsonify({'error': "output must be 'zip' or 'merge'"}), 400
+    template_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(template_name))
+    if not os.path.exists(template_path):
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        if data.get('data_file'):
+            data_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(data['data_file']))
+            if not os.path.exists(data_path):
+                return jsonify({'error': 'Data file not found'}), 404
+            records = load_records_file(data_path)
+        else:
+            # Request text is data, never a path on the server
+            records = parse_records(data.get('records') or data.get('csv') or [])
+        if not records:
+            return jsonify({'error': 'Records required'}), 400
+        workers = int(data['workers']) if data.get('workers') else None
+        merge = MailMerge(FormTemplate(template_path), records, flatten=bool(data.get('flatten', False)),
+                          workers=workers, name_pattern=data.get('name_pattern') or DEFAULT_NAME_PATTERN)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    base_name = os.path.splitext(secure_filename(template_name))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_filename = f"filled_{timestamp}_{base_name}.{'pdf' if output == 'merge' else 'zip'}"
+
+    if output == 'zip' and data.get('stream'):
+        return Response(
+            stream_with_context(merge.iter_zip()),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="{output_filename}"'}
+        )
+
+    output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
+    try:
+        stats = merge.write_merged(output_path) if output == 'merge' else merge.write_zip(output_path)
+        return jsonify({
+            'filename': output_filename,
+            'url': url_for('download_file', filename=output_filename),
+            **stats
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e), **merge.stats}), 400
+    except Exception as e:
+        logger.error(f"Form fill failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @pdf_bp.route('/api/flatten', methods=['POST'])
 def flatten_pdf():
     filename = request.form.get('filename')
@@ -642,7 +874,7 @@ def flatten_pdf():
         output_filename = f"flattened_{timestamp}_{secure_filename(filename)}"
         output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
         
-        pdf.save(output_path)
+        save_pdf(pdf, output_path)
         pdf.close()
         
         return jsonify({
@@ -653,6 +885,10 @@ def flatten_pdf():
         logger.error(f"Flatten failed: {e}")
         return jsonify({'error': str(e)}), 500
 
+@pdf_bp.route('/api/pipeline/operations', methods=['GET'])
+def list_pipeline_operations():
+    return jsonify({'operations': describe_operations()})
+
 @pdf_bp.route('/api/pipeline/run', methods=['POST'])
 def run_pipeline():
     data = request.json
@@ -665,9 +901,63 @@ def run_pipeline():
     def generate():
         executor = PipelineExecutor(current_app.config['UPLOAD_FOLDER'], current_app.config['OUTPUT_FOLDER'])
         for update in executor.execute(filename, steps):
-             if update['status'] == 'complete' and 'download_url' in update:
-                 update['download_url'] = url_for('download_file', filename=update['download_url'])
-                 
-             yield f"data: {json.dumps(update)}\n\n"
+             yield f"data: {json.dumps(_pipeline_urls(update))}\n\n"
              
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+def _pipeline_urls(update):
+    # The executor reports output filenames; the client gets download URLs
+    if update['status'] == 'complete' and 'download_url' in update:
+        update['download_url'] = url_for('download_file', filename=update['download_url'])
+        for output in update.get('outputs', []):
+            output['url'] = url_for('download_file', filename=output['filename'])
+    return update
+
+@pdf_bp.route('/api/pipeline/batch', methods=['POST'])
+def run_pipeline_batch():
+    data = request.json or {}
+    filenames = data.get('filenames') or []
+    steps = data.get('steps') or []
+    make_zip = bool(data.get('zip', False))
+
+    if not filenames or not steps:
+        return jsonify({'error': 'Filenames and steps required'}), 400
+    try:
+        workers = int(data['workers']) if data.get('workers') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'workers must be a number'}), 400
+
+    executor = PipelineExecutor(current_app.config['UPLOAD_FOLDER'], current_app.config['OUTPUT_FOLDER'])
+    try:
+        executor.plan(steps)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        for update in executor.execute_batch(filenames, steps, workers=workers):
+            if update['status'] == 'batch_complete':
+                outputs = [r['download_url'] for r in update['results'] if r['status'] == 'complete']
+                for result in update['results']:
+                    if 'download_url' in result:
+                        result['download_url'] = url_for('download_file', filename=result['download_url'])
+                if make_zip and outputs:
+                    update['zip_url'] = url_for('pdf.download_pipeline_zip', files=outputs)
+            else:
+                _pipeline_urls(update)
+            yield f"data: {json.dumps(update)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+@pdf_bp.route('/api/pipeline/zip', methods=['GET'])
+def download_pipeline_zip():
+    # Built while it is sent: results are never assembled in memory or on disk
+    names = [secure_filename(name) for name in request.args.getlist('files')]
+    if not names:
+        return jsonify({'error': 'files required'}), 400
+    output_folder = current_app.config['OUTPUT_FOLDER']
+    members = ((name, os.path.join(output_folder, name)) for name in dict.fromkeys(names) if name)
+    return Response(
+        stream_with_context(iter_zip(members)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename="pipeline_results.zip"'}
+    )
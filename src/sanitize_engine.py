@@ -0,0 +1,265 @@
+"""
+Single-pass sanitizer for /api/sanitize and the pipeline 'sanitize' step.
+
+Active and hidden content can sit anywhere in a PDF, not only at the usual
+places (/Names/JavaScript, /OpenAction, page /AA, annotation /A). Examples
+are form field actions, /Next action chains, outline items and filespecs
+inside annotations. ``sanitize`` therefore visits every indirect object of
+the document exactly once. It then descends into that object's direct
+(inline) dictionaries and arrays, but does not follow references, which get
+their own visit. Cost is linear in the number of objects.
+
+What is removed is decided by a ``SanitizePolicy``:
+
+- ``javascript``: JavaScript actions (and any action carrying /JS), the
+  document-level JavaScript name tree and XFA forms (which embed scripts).
+- ``launch_actions``: /Launch actions, which start external programs.
+- ``uri_actions``: /URI and /SubmitForm actions, which reach the network.
+- ``embedded_files``: the /EmbeddedFiles name tree and the embedded file
+  streams (/EF) of every file specification, including file attachment
+  annotations.
+- ``metadata``: the trailer's /Info dictionary and every XMP /Metadata
+  stream (document, pages, images).
+- ``optional_content``: /OCProperties and the /OC entries that tie content
+  to layers, so hidden layers become ordinary visible content.
+
+Removed actions are detached from the key that triggers them (/A,
+/OpenAction, /AA entries, /Next) and their payload is dropped as well, so an
+action referenced from an unexpected place is inert too. Each removal is
+reported as a finding with the object it was found in.
+"""
+import logging
+import time
+
+import pikepdf
+
+logger = logging.getLogger(__name__)
+
+# Keys whose value is an action (or, for /Next, an action or array of actions)
+ACTION_KEYS = ('/A', '/OpenAction', '/Next')
+LAUNCH_ACTIONS = frozenset({'/Launch'})
+URI_ACTIONS = frozenset({'/URI', '/SubmitForm'})
+# Payload entries dropped from a removed action, per action type
+ACTION_PAYLOAD_KEYS = {
+    '/JavaScript': ('/JS',),
+    '/Launch': ('/F', '/Win', '/Mac', '/Unix'),
+    '/URI': ('/URI',),
+    '/SubmitForm': ('/F',),
+}
+
+CATEGORY_LABELS = {
+    'javascript': 'JavaScript',
+    'launch': 'launch actions',
+    'uri': 'URI/submit actions',
+    'embedded_files': 'embedded files',
+    'metadata': 'XMP metadata streams',
+    'optional_content': 'optional content (layers)',
+}
+
+
+class SanitizePolicy:
+    """What ``sanitize`` removes. Everything is off unless enabled."""
+
+    FIELDS = ('javascript', 'launch_actions', 'uri_actions', 'embedded_files', 'metadata', 'optional_content')
+
+    def __init__(self, javascript=False, launch_actions=False, uri_actions=False,
+                 embedded_files=False, metadata=False, optional_content=False):
+        self.javascript = javascript
+        self.launch_actions = launch_actions
+        self.uri_actions = uri_actions
+        self.embedded_files = embedded_files
+        self.metadata = metadata
+        self.optional_content = optional_content
+
+    @classmethod
+    def all(cls):
+        return cls(**{field: True for field in cls.FIELDS})
+
+    @classmethod
+    def from_form(cls, form):
+        """Policy from the /api/sanitize form flags ('true' enables)."""
+        flag = lambda name: form.get(name) == 'true'
+        return cls(
+            javascript=flag('remove_js'),
+            launch_actions=flag('remove_actions'),
+            uri_actions=flag('remove_actions'),
+            embedded_files=flag('remove_embedded'),
+            metadata=flag('remove_metadata'),
+            optional_content=flag('remove_layers'),
+        )
+
+    @classmethod
+    def from_params(cls, params, **defaults):
+        """Policy from pipeline step params named like the fields, over ``defaults``."""
+        values = dict(defaults)
+        values.update({field: bool(params[field]) for field in cls.FIELDS if field in params})
+        return cls(**values)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def _action_category(action, policy):
+    """The finding category if ``policy`` removes this action, else None."""
+    if not isinstance(action, pikepdf.Dictionary):
+        return None
+    kind = str(action.get('/S', ''))
+    if policy.javascript and (kind == '/JavaScript' or '/JS' in action):
+        return 'javascript'
+    if policy.launch_actions and kind in LAUNCH_ACTIONS:
+        return 'launch'
+    if policy.uri_actions and kind in URI_ACTIONS:
+        return 'uri'
+    return None
+
+
+class _Sanitizer:
+    def __init__(self, policy, apply):
+        self.policy = policy
+        self.apply = apply
+        self.findings = []
+        self.visited = 0
+        # (container, key, replacement or None to delete), applied after each object
+        self.edits = []
+
+    def report(self, category, where, detail):
+        self.findings.append({'category': category, 'object': where, 'detail': detail})
+
+    def visit(self, root, where):
+        """Inspects ``root`` and the direct containers inside it."""
+        self.visited += 1
+        stack = [root]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+                self._inspect(obj, where)
+                values = obj.values()
+            elif isinstance(obj, pikepdf.Array):
+                values = obj
+            else:
+                continue
+            stack.extend(value for value in values
+                         if isinstance(value, (pikepdf.Dictionary, pikepdf.Array)) and not value.is_indirect)
+
+        # Edited once the whole object is inspected, so detached inline
+        # actions are still visited and reported
+        if self.apply:
+            for container, key, replacement in self.edits:
+                if replacement is None:
+                    if key in container:
+                        del container[key]
+                else:
+                    container[key] = replacement
+        self.edits.clear()
+
+    def _inspect(self, obj, where):
+        policy = self.policy
+        removals = []
+        edits = self.edits
+
+        # The object itself may be an action
+        category = _action_category(obj, policy)
+        if category:
+            kind = str(obj.get('/S', '/JavaScript'))
+            self.report(category, where, f"{kind[1:]} action")
+            payload = set(ACTION_PAYLOAD_KEYS.get(kind, ()))
+            if category == 'javascript':
+                payload.add('/JS')
+            edits.extend((obj, key, None) for key in payload if key in obj)
+
+        for key in obj.keys():
+            if key in ACTION_KEYS:
+                value = obj[key]
+                if isinstance(value, pikepdf.Array):
+                    kept = [item for item in value if not _action_category(item, policy)]
+                    if len(kept) != len(value):
+                        edits.append((obj, key, pikepdf.Array(kept)))
+                elif _action_category(value, policy):
+                    removals.append(key)
+            elif key == '/AA':
+                triggers = obj[key]
+                if isinstance(triggers, pikepdf.Dictionary):
+                    dangerous = [t for t in triggers.keys() if _action_category(triggers[t], policy)]
+                    if dangerous and len(dangerous) == len(triggers.keys()):
+                        removals.append(key)
+                    else:
+                        edits.extend((triggers, trigger, None) for trigger in dangerous)
+            elif key == '/JavaScript' and policy.javascript and isinstance(obj[key], pikepdf.Dictionary):
+                self.report('javascript', where, "document-level JavaScript name tree")
+                removals.append(key)
+            elif key == '/XFA' and policy.javascript:
+                self.report('javascript', where, "XFA form")
+                removals.append(key)
+            elif key == '/EmbeddedFiles' and policy.embedded_files:
+                self.report('embedded_files', where, "embedded files name tree")
+                removals.append(key)
+            elif key == '/EF' and policy.embedded_files:
+                self.report('embedded_files', where, f"embedded file {obj.get('/UF', obj.get('/F', ''))}".strip())
+                removals.append(key)
+            elif key == '/Metadata' and policy.metadata:
+                self.report('metadata', where, "XMP metadata stream")
+                removals.append(key)
+            elif key in ('/OCProperties', '/OC') and policy.optional_content:
+                if key == '/OCProperties':
+                    self.report('optional_content', where, "optional content properties")
+                removals.append(key)
+
+        edits.extend((obj, key, None) for key in removals)
+
+
+def _where(obj):
+    return f"{obj.objgen[0]} {obj.objgen[1]} R"
+
+
+def sanitize(pdf, policy, apply=True):
+    """Removes what ``policy`` selects from the open ``pdf``, in one pass over its objects.
+
+    Args:
+        pdf (pikepdf.Pdf): Document to sanitize (modified in place when ``apply``).
+        policy (SanitizePolicy): What to remove.
+        apply (bool): False only reports what would be removed.
+
+    Returns:
+        dict: 'findings' (category, object, detail), 'counts' per category,
+        'info_removed' (Document Info keys cleared), 'objects_visited',
+        'seconds' and a human-readable 'summary' list.
+    """
+    start = time.perf_counter()
+    sanitizer = _Sanitizer(policy, apply)
+
+    for obj in pdf.objects:
+        if isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream, pikepdf.Array)):
+            sanitizer.visit(obj, _where(obj))
+    # The trailer is not an indirect object; /Info is handled below
+    sanitizer.visit(pdf.trailer, 'trailer')
+
+    info_removed = []
+    if policy.metadata and '/Info' in pdf.trailer:
+        info_removed = [str(key) for key in pdf.trailer.Info.keys()]
+        if apply:
+            del pdf.trailer['/Info']
+
+    counts = {}
+    for finding in sanitizer.findings:
+        counts[finding['category']] = counts.get(finding['category'], 0) + 1
+
+    return {
+        'findings': sanitizer.findings,
+        'counts': counts,
+        'info_removed': info_removed,
+        'objects_visited': sanitizer.visited,
+        'seconds': round(time.perf_counter() - start, 4),
+        'summary': _summary(sanitizer.findings, counts, info_removed, apply),
+    }
+
+
+def _summary(findings, counts, info_removed, apply):
+    verb = 'Removed' if apply else 'Found'
+    summary = []
+    if any(f['detail'] == 'document-level JavaScript name tree' for f in findings):
+        summary.append(f'{verb} document-level JavaScript')
+    for category, count in counts.items():
+        summary.append(f"{verb} {count} {CATEGORY_LABELS[category]} item{'s' if count != 1 else ''}")
+    if info_removed:
+        summary.append(f"{'Cleared' if apply else 'Found'} Document Info dictionary ({len(info_removed)} entries)")
+    return summary
@@ -0,0 +1,229 @@
+"""
+Single-pass split engine for /split, the AI agent tool and the MCP split_pdf tool.
+
+A split is planned as a list of parts, each a dict with a 'label' and a 0-based
+page range ['start', 'end'). Plans can come from explicit ranges
+(``range_parts``), fixed-size chunks (``every_parts``), top-level bookmarks
+(``bookmark_parts``) or a size budget (``size_parts``).
+
+``iter_split`` then opens the source once and builds every part from the same
+pikepdf document. A part copies only the objects its pages reference, and
+resources shared by several of its pages (fonts, images) are copied into it
+once. Each part is yielded as PDF bytes, so a caller can stream it into a zip
+without writing it to disk first.
+
+Size-based splitting estimates each page's cost in one walk over the page
+objects. Every indirect object reachable from a page is measured once (stream
+length plus dictionary size) and remembered. A part's estimate is the size of
+the union of its pages' objects, so a font used by every page is counted once
+per part, as it will be written.
+"""
+import io
+import re
+import logging
+
+import pikepdf
+
+from pdf_outline import page_numbers, named_destinations, outline_page
+
+logger = logging.getLogger(__name__)
+
+# Trailer, xref and header bytes added to every part, plus per-object framing
+PART_OVERHEAD_BYTES = 1024
+OBJECT_OVERHEAD_BYTES = 20
+
+
+def parse_page_range(text, total_pages):
+    """Parses '3', '2-5' or '10-end' (1-based, inclusive) into a 0-based ``(start, end)``.
+
+    Raises:
+        ValueError: If the text is not a page number or range.
+    """
+    text = text.strip()
+    if '-' in text:
+        first, last = (part.strip() for part in text.split('-', 1))
+        start = int(first)
+        end = total_pages if last.lower() == 'end' else int(last)
+    else:
+        start = end = int(text)
+    return start - 1, end
+
+
+def range_parts(ranges, total_pages):
+    """Parts for explicit page ranges.
+
+    Returns:
+        tuple: (parts, invalid). Out-of-bounds ranges are listed in ``invalid``
+        instead of ``parts``. Each part keeps its 1-based position in the request
+        as 'number'.
+
+    Raises:
+        ValueError: If a range is malformed.
+    """
+    parts, invalid = [], []
+    for number, text in enumerate(ranges, start=1):
+        text = text.strip()
+        start, end = parse_page_range(text, total_pages)
+        if start < 0 or end > total_pages or start >= end:
+            invalid.append(text)
+            continue
+        parts.append({'number': number, 'label': text, 'start': start, 'end': end})
+    return parts, invalid
+
+
+def every_parts(total_pages, pages_per_part):
+    """Consecutive parts of ``pages_per_part`` pages (the last one may be shorter)."""
+    if pages_per_part < 1:
+        raise ValueError("pages_per_part must be at least 1")
+    return [
+        {'number': n, 'label': f"{start + 1}-{min(start + pages_per_part, total_pages)}",
+         'start': start, 'end': min(start + pages_per_part, total_pages)}
+        for n, start in enumerate(range(0, total_pages, pages_per_part), start=1)
+    ]
+
+
+def bookmark_parts(pdf):
+    """One part per top-level bookmark, from its page up to the next bookmark's page.
+
+    Bookmarks may use destination arrays, named destinations or /GoTo actions
+    (see ``pdf_outline``). Pages before the first bookmark form a leading
+    part. Returns [] when the document has no usable top-level bookmarks.
+    """
+    pages = page_numbers(pdf)
+    dests = named_destinations(pdf)
+    starts = []
+    with pdf.open_outline() as outline:
+        for item in outline.root:
+            index = outline_page(item, pages, dests)
+            if index is not None:
+                starts.append((index, item.title))
+
+    # Bookmarks may be out of page order or share a page; keep the first per page
+    by_page = {}
+    for index, title in sorted(starts, key=lambda s: s[0]):
+        by_page.setdefault(index, title)
+    if not by_page:
+        return []
+
+    total_pages = len(pdf.pages)
+    indices = sorted(by_page)
+    if indices[0] > 0:
+        by_page[0] = 'Front matter'
+        indices.insert(0, 0)
+    bounds = indices[1:] + [total_pages]
+    return [
+        {'number': n, 'label': by_page[start], 'start': start, 'end': end}
+        for n, (start, end) in enumerate(zip(indices, bounds), start=1)
+    ]
+
+
+def _object_size(obj):
+    if isinstance(obj, pikepdf.Stream):
+        return len(obj.stream_dict.unparse(resolved=True)) + int(obj.stream_dict.get('/Length', 0)) \
+            + OBJECT_OVERHEAD_BYTES
+    return len(obj.unparse(resolved=True)) + OBJECT_OVERHEAD_BYTES
+
+
+def page_object_sizes(pdf):
+    """Per page, the indirect objects it needs, measured in one walk.
+
+    Returns:
+        tuple: (page_objects, sizes) where ``page_objects[i]`` is the set of
+        objgens reachable from page ``i`` (excluding the page tree) and
+        ``sizes`` maps each objgen to its estimated serialized size.
+    """
+    sizes = {}
+    page_objects = []
+
+    for page in pdf.pages:
+        reachable = set()
+        stack = [page.obj]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, pikepdf.Object) and obj.is_indirect:
+                key = obj.objgen
+                if key in reachable:
+                    continue
+                reachable.add(key)
+                if key not in sizes:
+                    sizes[key] = _object_size(obj)
+            if isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+                stack.extend(value for name, value in obj.items() if name not in ('/Parent', '/P'))
+            elif isinstance(obj, pikepdf.Array):
+                stack.extend(obj)
+        page_objects.append(reachable)
+    return page_objects, sizes
+
+
+def size_parts(pdf, max_bytes):
+    """Greedy parts whose estimated size stays under ``max_bytes``.
+
+    A single page larger than the budget becomes a part on its own (flagged
+    with 'oversized').
+    """
+    if max_bytes < 1:
+        raise ValueError("max_bytes must be positive")
+    page_objects, sizes = page_object_sizes(pdf)
+
+    parts = []
+    start, objects, estimate = 0, set(), PART_OVERHEAD_BYTES
+    for index, needed in enumerate(page_objects):
+        added = sum(sizes[key] for key in needed - objects)
+        if index > start and estimate + added > max_bytes:
+            parts.append({'start': start, 'end': index, 'estimated_bytes': estimate})
+            start, objects, estimate = index, set(), PART_OVERHEAD_BYTES
+            added = sum(sizes[key] for key in needed)
+        objects |= needed
+        estimate += added
+    if page_objects:
+        parts.append({'start': start, 'end': len(page_objects), 'estimated_bytes': estimate})
+
+    for number, part in enumerate(parts, start=1):
+        part['number'] = number
+        part['label'] = f"{part['start'] + 1}-{part['end']}"
+        if part['estimated_bytes'] > max_bytes:
+            part['oversized'] = True
+    return parts
+
+
+def part_filename(base_name, part):
+    """'<base>_part<N>_<label>.pdf', with the label reduced to filename-safe characters."""
+    label = re.sub(r'[^A-Za-z0-9._-]+', '_', part['label']).strip('._') or str(part['number'])
+    return f"{base_name}_part{part['number']}_{label[:60]}.pdf"
+
+
+def iter_split(pdf, parts):
+    """Builds each part from the open source ``pdf`` and yields ``(part, pdf_bytes)`` in order."""
+    for part in parts:
+        with pikepdf.new() as output:
+            output.pages.extend(pdf.pages[part['start']:part['end']])
+            buffer = io.BytesIO()
+            output.save(buffer, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        yield part, buffer.getvalue()
+
+
+def plan_split(pdf, mode='ranges', ranges=None, pages_per_part=None, max_bytes=None):
+    """Plans the parts of an open document for one of the split modes.
+
+    Args:
+        pdf (pikepdf.Pdf): Source document.
+        mode (str): 'ranges', 'every', 'bookmarks' or 'size'.
+
+    Returns:
+        tuple: (parts, invalid ranges).
+
+    Raises:
+        ValueError: For an unknown mode or missing/invalid mode parameters.
+    """
+    total_pages = len(pdf.pages)
+    if mode == 'ranges':
+        if not ranges:
+            raise ValueError("ranges required")
+        return range_parts(ranges, total_pages)
+    if mode == 'every':
+        return every_parts(total_pages, int(pages_per_part or 0)), []
+    if mode == 'bookmarks':
+        return bookmark_parts(pdf), []
+    if mode == 'size':
+        return size_parts(pdf, int(max_bytes or 0)), []
+    raise ValueError(f"Unknown split mode '{mode}'. Allowed: ranges, every, bookmarks, size")
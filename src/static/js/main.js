@@ -9,7 +9,7 @@ import './utils.js'; // Check if this path is correct relative to main.js (src/s
 import * as ui from './modules/ui.js';
 import { updateUnsavedIndicator } from './modules/ui.js';
 import { initRibbon } from './modules/ribbon.js';
-import { loadPdf, refreshView, zoomIn, zoomOut, initHandPan } from './modules/viewer.js';
+import { loadPdf, loadPdfFromUrl, refreshView, zoomIn, zoomOut, initHandPan } from './modules/viewer.js';
 import * as historyModule from './modules/history.js';
 import { undo, redo, saveState, setLoader, setAnnotationHandlers } from './modules/history.js';
 import * as pages from './modules/pages.js';
@@ -67,6 +67,7 @@ Object.assign(window, {
     applyWatermark,
     updateNoteSettings: notes.updateNoteSettings, // Expose for ribbon
     loadPdf,
+    loadPdfFromUrl,
     openPageNumbersModal,
     applyPageNumbers,
     openSignatureModal,
@@ -131,14 +132,12 @@ async function init() {
 
         // Load PDF
         const url = `/uploads/${state.filename}`;
-        console.log("Fetching PDF", url);
-        const existingPdfBytes = await fetch(url).then(res => res.arrayBuffer());
-        console.log("PDF fetched");
+        console.log("Loading PDF", url);
 
-        // Initial Load
+        // Initial Load: rendered by range requests while the bytes download
         setLoader(loadPdf);
         setAnnotationHandlers(captureAnnotationState, restoreAnnotationState);
-        await loadPdf(existingPdfBytes);
+        await loadPdfFromUrl(url);
         console.log("loadPdf done");
 
         // Initialize history
@@ -13,6 +13,31 @@ export function openCompressionModal() {
 
     const modal = new bootstrap.Modal(modalEl);
     modal.show();
+
+    loadCompressionEstimates(modalEl);
+}
+
+async function loadCompressionEstimates(modalEl) {
+    // Sample-based size prediction per preset, shown next to each option
+    try {
+        const res = await fetch('/compress/estimate', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                filename: window.filename,
+                qualities: ['screen', 'ebook', 'printer', 'prepress', 'scan']
+            })
+        });
+        if (!res.ok) return;
+        const data = await res.json();
+        const toMB = (b) => (b / (1024 * 1024)).toFixed(2);
+        data.estimates.forEach(e => {
+            const slot = modalEl.querySelector(`[data-estimate="${e.quality}"]`);
+            if (slot) slot.textContent = `~${toMB(e.estimated_size)} MB (-${e.estimated_reduction_percent}%)`;
+        });
+    } catch (e) {
+        console.warn("Compression estimate unavailable", e);
+    }
 }
 
 function resetCompressionModal(modalEl) {
@@ -41,6 +66,7 @@ function resetCompressionModal(modalEl) {
                     <strong>Screen (72 DPI)</strong>
                     <small class="d-block text-muted">Smallest file size. Best for email or viewing on screens.</small>
                 </span>
+                <small class="ms-auto pt-1 text-muted text-nowrap" data-estimate="screen"></small>
             </label>
             <label class="list-group-item d-flex gap-3">
                 <input class="form-check-input flex-shrink-0" type="radio" name="editorCompressionQuality" value="ebook" checked style="font-size: 1.375em;">
@@ -48,6 +74,7 @@ function resetCompressionModal(modalEl) {
                     <strong>eBook (150 DPI)</strong>
                     <small class="d-block text-muted">Balanced quality and size. Recommended for most documents.</small>
                 </span>
+                <small class="ms-auto pt-1 text-muted text-nowrap" data-estimate="ebook"></small>
             </label>
             <label class="list-group-item d-flex gap-3">
                 <input class="form-check-input flex-shrink-0" type="radio" name="editorCompressionQuality" value="printer" style="font-size: 1.375em;">
@@ -55,6 +82,7 @@ function resetCompressionModal(modalEl) {
                     <strong>Printer (300 DPI)</strong>
                     <small class="d-block text-muted">High quality. Suitable for home or office printing.</small>
                 </span>
+                <small class="ms-auto pt-1 text-muted text-nowrap" data-estimate="printer"></small>
             </label>
             <label class="list-group-item d-flex gap-3">
                 <input class="form-check-input flex-shrink-0" type="radio" name="editorCompressionQuality" value="prepress" style="font-size: 1.375em;">
@@ -62,6 +90,15 @@ function resetCompressionModal(modalEl) {
                     <strong>Prepress (300 DPI+)</strong>
                     <small class="d-block text-muted">Maximum quality. Preserves color accuracy for professional printing.</small>
                 </span>
+                <small class="ms-auto pt-1 text-muted text-nowrap" data-estimate="prepress"></small>
+            </label>
+            <label class="list-group-item d-flex gap-3">
+                <input class="form-check-input flex-shrink-0" type="radio" name="editorCompressionQuality" value="scan" style="font-size: 1.375em;">
+                <span class="pt-1 form-checked-content">
+                    <strong>Scanned Document</strong>
+                    <small class="d-block text-muted">Black-and-white pages as 1-bit images, text over a light background for color pages.</small>
+                </span>
+                <small class="ms-auto pt-1 text-muted text-nowrap" data-estimate="scan"></small>
             </label>
         </div>
     `;
@@ -92,7 +129,8 @@ export async function confirmEditorCompression() {
         const res = await fetch('/compress', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ filename, quality })
+            // The scan preset is only implemented by the native engine
+            body: JSON.stringify({ filename, quality, engine: quality === 'scan' ? 'native' : 'ghostscript' })
         });
         const data = await res.json();
 
@@ -386,9 +386,8 @@ async function applyCrop(allPages) {
         // Support Undo: Save current state
         await saveState(true);
 
-        if (data.download_url && window.loadPdf) {
-            const newBytes = await fetch(data.download_url).then(res => res.arrayBuffer());
-            await window.loadPdf(newBytes);
+        if (data.download_url && window.loadPdfFromUrl) {
+            await window.loadPdfFromUrl(data.download_url);
 
             if (data.filename) {
                 state.filename = data.filename;
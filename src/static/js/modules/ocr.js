@@ -90,7 +90,9 @@ function pollOCRStatus(taskId) {
                 } else {
                     const percent = data.current || 0;
                     if (progressBar) progressBar.style.width = `${percent}%`;
-                    if (statusText) statusText.innerText = data.status || 'Processing...';
+                    let text = data.status || 'Processing...';
+                    if (data.eta != null) text += ` — about ${Math.ceil(data.eta)}s left`;
+                    if (statusText) statusText.innerText = text;
                 }
             })
             .catch(err => {
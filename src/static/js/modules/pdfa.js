@@ -48,7 +48,9 @@ export async function convertToPdfA() {
         const result = await response.json();
 
         if (response.ok) {
-            showToast("Conversion successful! Downloading...", "success");
+            showToast(result.skipped
+                ? "Already PDF/A conformant, no conversion needed. Downloading..."
+                : "Conversion successful! Downloading...", "success");
             // Trigger download
             const a = document.createElement('a');
             a.href = result.url;
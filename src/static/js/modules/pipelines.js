@@ -6,6 +6,8 @@ let pipelineSteps = [];
 const availableOps = [
     { id: 'sanitize', label: 'Sanitize (Remove JS)', icon: 'bi-bandaid' },
     { id: 'flatten', label: 'Flatten Annotations', icon: 'bi-layers-half' },
+    { id: 'watermark', label: 'Watermark (CONFIDENTIAL)', icon: 'bi-droplet-half' },
+    { id: 'stamp', label: 'Stamp (APPROVED)', icon: 'bi-patch-check' },
     { id: 'compress', label: 'Compress PDF', icon: 'bi-file-earmark-zip' }
 ];
 
@@ -223,7 +225,8 @@ function handlePipelineUpdate(update) {
         showProcessingOverlay(`Step ${update.step_index + 1}: ${update.message}`);
     } else if (update.status === 'complete') {
         hideProcessingOverlay();
-        showToast("Pipeline Completed Successfully!", "success");
+        const hits = update.cache ? update.cache.hits : 0;
+        showToast(hits ? `Pipeline Completed (${hits} cached step${hits === 1 ? '' : 's'})` : "Pipeline Completed Successfully!", "success");
         if (update.download_url) {
             const link = document.createElement('a');
             link.href = update.download_url;
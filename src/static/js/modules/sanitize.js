@@ -6,11 +6,12 @@ export function openSanitizeModal() {
 
 export async function runSanitization() {
     const removeJS = document.getElementById('sanitize-js').checked;
+    const removeActions = document.getElementById('sanitize-actions').checked;
     const removeMetadata = document.getElementById('sanitize-metadata').checked;
     const removeLayers = document.getElementById('sanitize-layers').checked;
     const removeEmbedded = document.getElementById('sanitize-embedded').checked;
 
-    if (!removeJS && !removeMetadata && !removeLayers && !removeEmbedded) {
+    if (!removeJS && !removeActions && !removeMetadata && !removeLayers && !removeEmbedded) {
         window.showToast("Please select at least one option", "warning");
         return;
     }
@@ -26,6 +27,7 @@ export async function runSanitization() {
         const formData = new FormData();
         formData.append('filename', window.filename);
         formData.append('remove_js', removeJS);
+        formData.append('remove_actions', removeActions);
         formData.append('remove_metadata', removeMetadata);
         formData.append('remove_layers', removeLayers);
         formData.append('remove_embedded', removeEmbedded);
@@ -118,11 +118,9 @@ async function pollTranslationStatus(taskId) {
                 // And offer a download button (already in Ribbon).
 
                 // We need to load this "Output" file. 
-                // The viewer usually loads from /uploads/. 
-                // We can fetch bytes and load.
+                // The viewer usually loads from /uploads/; outputs open inline.
 
-                const pdfBytes = await fetch(fileUrl).then(r => r.arrayBuffer());
-                await window.loadPdf(pdfBytes);
+                await window.loadPdfFromUrl(`${fileUrl}?inline=1`);
 
                 // Update filename in state so subsequent saves might work?
                 // But this file is in 'outputs', not 'uploads'. 
@@ -11,6 +11,26 @@ import { updateCurrentPage, onPdfLoaded } from './navigation.js';
 // const pdfjsLib = window.pdfjsLib;
 
 let pageObserver = null;
+// Password pdf.js last opened a document with, reused for pdf-lib
+let lastPassword = null;
+
+// pdf.js fetches a URL source in ranges of this size, and only the ranges it needs
+const RANGE_CHUNK_SIZE = 64 * 1024;
+
+// getDocument params for a source that is either the PDF's bytes or { url }
+function documentParams(source, password) {
+    let params;
+    if (source && source.url) {
+        // Range requests: a linearized file shows its first page after its first few chunks
+        params = { url: source.url, rangeChunkSize: RANGE_CHUNK_SIZE, disableAutoFetch: true, disableStream: true };
+    } else {
+        // Clone data to avoid 'detached ArrayBuffer' issues if worker transfers it
+        // new Uint8Array(bytes) creates a view if bytes is ArrayBuffer, so we use slice() to copy.
+        params = { data: new Uint8Array(source).slice() };
+    }
+    if (password) params.password = password;
+    return params;
+}
 
 
 // Redefining proper export to replace logic
@@ -58,27 +78,42 @@ export async function loadPdf(bytes, password = null) {
     renderDocumentInfo(bytes);
 }
 
-export async function renderPdf(bytes, password = null) {
+// Opens a file the server serves (/uploads/... or /outputs/...?inline=1).
+// pdf.js renders it from range requests while the full bytes, which pdf-lib
+// needs for editing, download alongside. Returns those bytes.
+export async function loadPdfFromUrl(url) {
+    const download = fetch(url).then(res => res.arrayBuffer());
+    lastPassword = null;
+    await renderPdf({ url });
+
+    const bytes = await download;
+    try {
+        const options = lastPassword ? { password: lastPassword } : {};
+        state.pdfDoc = await window.PDFLib.PDFDocument.load(bytes, options);
+    } catch (e) {
+        console.error("PDF Load Error:", e);
+        throw e;
+    }
+    await renderThumbnails({ url }, lastPassword);
+    renderDocumentInfo(bytes);
+    return bytes;
+}
+
+export async function renderPdf(source, password = null) {
     const container = document.getElementById('pdf-viewer');
     container.innerHTML = '';
 
     if (pageObserver) pageObserver.disconnect();
 
-    // Clone data to avoid 'detached ArrayBuffer' issues if worker transfers it
-    // new Uint8Array(bytes) creates a view if bytes is ArrayBuffer, so we use slice() to copy.
-    const dataCopy = new Uint8Array(bytes).slice();
-
     // PDF.js handling with password
-    const params = { data: dataCopy };
-    if (password) params.password = password;
-
-    const loadingTask = window.pdfjsLib.getDocument(params);
+    const loadingTask = window.pdfjsLib.getDocument(documentParams(source, password));
 
     loadingTask.onPassword = async (updatePassword, reason) => {
         // This callback is called if pdf.js needs a password
         // reason: 1 (NEED_PASSWORD), 2 (INCORRECT_PASSWORD)
         const msg = reason === 2 ? "Incorrect password." : "Password required.";
         const pass = await requestPassword(msg);
+        lastPassword = pass;
         updatePassword(pass);
     };
 
@@ -306,13 +341,11 @@ export function initHandPan() {
     });
 }
 
-export async function renderThumbnails(bytes, password = null) {
+export async function renderThumbnails(source, password = null) {
     const container = document.getElementById('thumbnails-container');
     container.innerHTML = '';
 
-    const dataCopy = new Uint8Array(bytes).slice();
-    const params = { data: dataCopy };
-    if (password) params.password = password;
+    const params = documentParams(source, password);
 
     // We can handle password callback here too, but usually renderPdf handles it first and we reuse?
     // Actually renderPdf and renderThumbnails are independent. 
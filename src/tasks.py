@@ -8,6 +8,8 @@ from extract_tables_to_csv import extract_tables as extract_tables_to_csv
 from translation_utils import translate_text, install_languages
 import subprocess
 from logging_config import get_logger
+from ocr_progress import forward_progress, PLUGIN_NAME as OCR_PROGRESS_PLUGIN
+from pdf_output import LINEARIZE_MIN_BYTES
 
 logger = get_logger("tasks")
 
@@ -203,34 +205,29 @@ def process_ocr(filename, upload_folder, output_folder, language='eng', progress
         if progress_callback:
             progress_callback('PROCESSING', {'status': 'Starting OCR engine...', 'current': 0, 'total': 100})
             
-        # Hook into ocrmypdf's progress via a wrapper or just simple estimation?
-        # ocrmypdf supports --progress but capturing it via library call is trickier.
-        # We can use the 'progress_bar' argument if we implement a tqdm-like wrapper, 
-        # or we just rely on steps.
-        
         # Simple invocation
         # We force 'redo_ocr=False' (skip_text=True) by default to be safe, 
         # unless user specifically asked to Force OCR (redo). 
         # Let's stick to standard behavior: skip pages that have text.
         
-        # Define a custom progress bar to capture updates if possible, 
-        # otherwise we just update start/end.
-        
-        if progress_callback:
-            progress_callback('PROCESSING', {'status': 'Running OCR (this may take a while)...', 'current': 20, 'total': 100})
-
-        ocrmypdf.ocr(
-            input_path,
-            output_path,
-            language=language,
-            deskew=True,
-            skip_text=True, # Don't OCR text pages
-            jobs=4,
-            progress_bar=False 
-        )
+        # ocr_progress plugs into ocrmypdf's progress bar hook and forwards
+        # per-page updates (pages done, elapsed, ETA) to progress_callback.
+        with forward_progress(progress_callback):
+            ocrmypdf.ocr(
+                input_path,
+                output_path,
+                language=language,
+                deskew=True,
+                skip_text=True, # Don't OCR text pages
+                jobs=4,
+                # Same fast-web-view threshold as our other outputs (in MB; a huge value disables it)
+                fast_web_view=LINEARIZE_MIN_BYTES / 1e6 if LINEARIZE_MIN_BYTES >= 0 else 1e9,
+                progress_bar=False,
+                plugins=[OCR_PROGRESS_PLUGIN]
+            )
         
         if progress_callback:
-            progress_callback('PROCESSING', {'status': 'Optimizing PDF...', 'current': 90, 'total': 100})
+            progress_callback('PROCESSING', {'status': 'Finalizing PDF...', 'current': 96, 'total': 100})
 
         return {'status': 'Completed', 'result_file': new_filename}
 
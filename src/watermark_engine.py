@@ -0,0 +1,248 @@
+"""
+Server-side watermarks and stamps for /api/watermark and the pipeline
+'watermark' and 'stamp' steps.
+
+The mark is drawn once, as a Form XObject holding the text, its font and an
+ExtGState for the opacity. Each page only references it: ``Do`` inside a
+short placement stream (``q <matrix> cm /Name Do Q``) appended to (or, for
+``layer='under'``, prepended to) the page's /Contents array. Pages with the
+same box, rotation and resource name share one placement stream, and all
+pages share the ``q`` and ``Q`` streams that isolate their original graphics
+state from the mark. Output therefore grows by a roughly constant amount, plus a few
+bytes per page for the /Contents and /XObject references, whatever the
+page count. Page content streams are never parsed or rewritten.
+
+Placement is computed in the page's displayed space (CropBox, after
+/Rotate), so marks appear upright and in the requested corner on rotated
+pages too.
+"""
+import re
+import math
+import time
+import logging
+
+import fitz  # PyMuPDF, for the Helvetica metrics
+import pikepdf
+
+from split_engine import parse_page_range
+
+logger = logging.getLogger(__name__)
+
+POSITIONS = ('center', 'top', 'bottom', 'top-left', 'top-right', 'bottom-left', 'bottom-right')
+LAYERS = ('over', 'under')
+MARGIN = 36
+
+# A stamp is a small upright mark in a corner
+STAMP_DEFAULTS = dict(text='APPROVED', color='#cc0000', opacity=1.0, size=12, rotation=0, position='top-right')
+
+
+class Watermark:
+    """Text mark settings. ``from_params`` validates them."""
+
+    FIELDS = ('text', 'color', 'opacity', 'size', 'rotation', 'position', 'layer')
+
+    def __init__(self, text='CONFIDENTIAL', color='#cccccc', opacity=0.3, size=48, rotation=45,
+                 position='center', layer='over'):
+        self.text = text
+        self.color = color
+        self.opacity = opacity
+        self.size = size
+        self.rotation = rotation
+        self.position = position
+        self.layer = layer
+
+    @classmethod
+    def from_params(cls, params, **defaults):
+        """Settings from request or step params named like the fields, over ``defaults``.
+
+        Raises:
+            ValueError: For an empty text, a malformed color or an unknown position or layer.
+        """
+        values = dict(defaults)
+        values.update({field: params[field] for field in cls.FIELDS if params.get(field) is not None})
+        mark = cls(**values)
+        if not str(mark.text).strip():
+            raise ValueError("Watermark text required")
+        if not re.fullmatch(r'#?[0-9a-fA-F]{6}', str(mark.color)):
+            raise ValueError(f"Invalid color '{mark.color}', expected #rrggbb")
+        if mark.position not in POSITIONS:
+            raise ValueError(f"Unknown position '{mark.position}'. Available: {', '.join(POSITIONS)}")
+        if mark.layer not in LAYERS:
+            raise ValueError(f"Unknown layer '{mark.layer}'. Available: {', '.join(LAYERS)}")
+        mark.opacity = min(max(float(mark.opacity), 0.0), 1.0)
+        mark.size = float(mark.size)
+        if mark.size <= 0:
+            raise ValueError("Watermark size must be positive")
+        mark.rotation = float(mark.rotation)
+        return mark
+
+    def rgb(self):
+        color = str(self.color).lstrip('#')
+        return [int(color[i:i + 2], 16) / 255 for i in (0, 2, 4)]
+
+
+def build_xobject(pdf, mark):
+    """The mark as a Form XObject; returns (xobject, width, height)."""
+    text = str(mark.text)
+    width = fitz.get_text_length(text, fontname='helv', fontsize=mark.size)
+    height = mark.size
+    font = pdf.make_indirect(pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1,
+        BaseFont=pikepdf.Name.Helvetica, Encoding=pikepdf.Name.WinAnsiEncoding))
+    state = pikepdf.Dictionary(Type=pikepdf.Name.ExtGState, ca=mark.opacity, CA=mark.opacity)
+    r, g, b = mark.rgb()
+    content = pikepdf.unparse_content_stream([
+        ([pikepdf.Name('/GS0')], pikepdf.Operator('gs')),
+        ([r, g, b], pikepdf.Operator('rg')),
+        ([], pikepdf.Operator('BT')),
+        ([pikepdf.Name('/F0'), mark.size], pikepdf.Operator('Tf')),
+        # Baseline above the descenders
+        ([0, round(mark.size * 0.22, 2)], pikepdf.Operator('Td')),
+        ([pikepdf.String(text.encode('cp1252', errors='replace'))], pikepdf.Operator('Tj')),
+        ([], pikepdf.Operator('ET')),
+    ])
+    xobject = pdf.make_stream(
+        content,
+        Type=pikepdf.Name.XObject, Subtype=pikepdf.Name.Form,
+        BBox=[0, 0, round(width, 2), round(height, 2)],
+        Resources=pikepdf.Dictionary(Font=pikepdf.Dictionary(F0=font), ExtGState=pikepdf.Dictionary(GS0=state)),
+    )
+    return xobject, width, height
+
+
+def _anchor(position, width, height, extent_x, extent_y):
+    """Center of the mark in displayed coordinates (origin bottom-left)."""
+    x = {'left': MARGIN + extent_x, 'right': width - MARGIN - extent_x}
+    y = {'top': height - MARGIN - extent_y, 'bottom': MARGIN + extent_y}
+    vertical, _, horizontal = position.partition('-')
+    if position == 'center':
+        return width / 2, height / 2
+    if not horizontal:
+        return width / 2, y[vertical]
+    return x[horizontal], y[vertical]
+
+
+def placement_matrix(box, rotate, mark, mark_width, mark_height):
+    """The ``cm`` operands placing the mark on a page with ``box`` and ``/Rotate``."""
+    x0, y0, x1, y1 = box
+    box_width, box_height = x1 - x0, y1 - y0
+    rotate %= 360
+    shown_width, shown_height = (box_height, box_width) if rotate in (90, 270) else (box_width, box_height)
+
+    # The viewer turns the page clockwise by /Rotate, which the angle undoes
+    angle = math.radians(mark.rotation + rotate)
+    cos, sin = math.cos(angle), math.sin(angle)
+    shown = math.radians(mark.rotation)
+    extent_x = (abs(mark_width * math.cos(shown)) + abs(mark_height * math.sin(shown))) / 2
+    extent_y = (abs(mark_width * math.sin(shown)) + abs(mark_height * math.cos(shown))) / 2
+    xd, yd = _anchor(mark.position, shown_width, shown_height, extent_x, extent_y)
+
+    # Displayed point -> user space
+    ux, uy = {
+        0: (xd, yd),
+        90: (box_width - yd, xd),
+        180: (box_width - xd, box_height - yd),
+        270: (yd, box_height - xd),
+    }.get(rotate, (xd, yd))
+    cx, cy = x0 + ux, y0 + uy
+
+    # Rotate the form about its center, then move that center to (cx, cy)
+    half_w, half_h = mark_width / 2, mark_height / 2
+    e = cx - (cos * half_w - sin * half_h)
+    f = cy - (sin * half_w + cos * half_h)
+    return [round(v, 4) for v in (cos, sin, -sin, cos, e, f)]
+
+
+def select_pages(ranges, total_pages):
+    """0-based page indices for page range strings ('1-3', '5', '8-end'); None means all.
+
+    Raises:
+        ValueError: For a malformed range.
+    """
+    if not ranges:
+        return None
+    if isinstance(ranges, str):
+        ranges = ranges.split(',')
+    indices = set()
+    for text in ranges:
+        try:
+            start, end = parse_page_range(str(text), total_pages)
+        except ValueError:
+            raise ValueError(f"Invalid page range '{text}'")
+        indices.update(range(max(start, 0), min(end, total_pages)))
+    return sorted(indices)
+
+
+def _resource_name(xobjects):
+    name, n = '/Wm0', 0
+    while name in xobjects:
+        n += 1
+        name = f'/Wm{n}'
+    return name
+
+
+def apply_watermark(pdf, mark, pages=None):
+    """Marks the pages of the open ``pdf`` (modified in place).
+
+    Args:
+        pdf (pikepdf.Pdf): Document to mark.
+        mark (Watermark): What to draw and where.
+        pages (iterable, optional): 0-based page indices. Defaults to all pages.
+
+    Returns:
+        dict: 'pages' marked, 'placements' (distinct placement streams) and 'seconds'.
+    """
+    start = time.perf_counter()
+    xobject, mark_width, mark_height = build_xobject(pdf, mark)
+    open_state = pdf.make_stream(b'q\n')
+    close_state = pdf.make_stream(b'Q\n')
+    # (box, rotate, name) -> placement stream
+    placements = {}
+    # objgen of a shared Resources or /XObject dict -> name the mark was given in it
+    named = {}
+    indices = range(len(pdf.pages)) if pages is None else sorted(set(pages))
+    count = 0
+
+    for index in indices:
+        page = pdf.pages[index].obj
+        resources = page.get('/Resources')
+        if resources is None:
+            resources = page.Resources = pikepdf.Dictionary()
+        xobjects = resources.get('/XObject')
+        if xobjects is None:
+            xobjects = resources.XObject = pikepdf.Dictionary()
+
+        # Pages often share one resource dictionary; register the mark once in it
+        shared = xobjects if xobjects.is_indirect else resources
+        shared_key = shared.objgen if shared.is_indirect else None
+        name = named.get(shared_key) if shared_key else None
+        if name is None:
+            name = _resource_name(xobjects)
+            xobjects[name] = xobject
+            if shared_key:
+                named[shared_key] = name
+
+        box = tuple(float(v) for v in page.get('/CropBox', page.MediaBox))
+        rotate = int(page.get('/Rotate', 0))
+        key = (box, rotate % 360, name)
+        placement = placements.get(key)
+        if placement is None:
+            matrix = placement_matrix(box, rotate, mark, mark_width, mark_height)
+            placement = placements[key] = pdf.make_stream(pikepdf.unparse_content_stream([
+                ([], pikepdf.Operator('q')),
+                (matrix, pikepdf.Operator('cm')),
+                ([pikepdf.Name(name)], pikepdf.Operator('Do')),
+                ([], pikepdf.Operator('Q')),
+            ]))
+
+        contents = page.get('/Contents')
+        existing = list(contents) if isinstance(contents, pikepdf.Array) else ([contents] if contents is not None else [])
+        if mark.layer == 'under':
+            page.Contents = pikepdf.Array([placement, *existing])
+        else:
+            # Restore the original graphics state before drawing on top
+            page.Contents = pikepdf.Array([open_state, *existing, close_state, placement])
+        count += 1
+
+    return {'pages': count, 'placements': len(placements), 'seconds': round(time.perf_counter() - start, 4)}
+
@@ -0,0 +1,87 @@
+"""
+Helpers for fanning CPU-bound work out to worker processes.
+
+Every engine that parallelises over pages or files goes through ``imap_ordered``
+so they share the same rules: results come back in input order, only a bounded
+number of tasks is in flight, and the work runs inline when a pool would not help
+(single worker) or is not allowed (inside a daemonic Celery prefork worker).
+"""
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def default_workers(limit=None):
+    """Number of worker processes to use by default (CPU count, optionally capped)."""
+    count = os.cpu_count() or 1
+    if limit:
+        count = min(count, limit)
+    return max(1, count)
+
+
+def available_memory():
+    """Bytes of memory available to new work, or None when it cannot be read."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def memory_bound_workers(bytes_per_task, limit=None):
+    """Workers to use when each task needs about ``bytes_per_task`` of memory.
+
+    The CPU count (capped by ``limit``), lowered so that the tasks in flight
+    fit in the memory available now. Never less than one.
+    """
+    workers = default_workers(limit)
+    memory = available_memory()
+    if memory is not None and bytes_per_task > 0:
+        workers = min(workers, memory // bytes_per_task)
+    return max(1, int(workers))
+
+
+def can_spawn_processes():
+    """Daemonic processes (e.g. Celery prefork children) may not have children."""
+    return not multiprocessing.current_process().daemon
+
+
+def imap_ordered(func, items, workers=None, prefetch=None, use_threads=False):
+    """Applies ``func`` to every item in parallel, yielding results in input order.
+
+    Args:
+        func (callable): Picklable top-level function (when using processes).
+        items (iterable): Task arguments, consumed lazily.
+        workers (int, optional): Pool size. Defaults to the CPU count.
+        prefetch (int, optional): Maximum tasks in flight. Defaults to 2x workers.
+        use_threads (bool): Use a thread pool instead of processes, for work that
+            releases the GIL or objects that cannot be pickled.
+
+    Yields:
+        The result of ``func(item)`` for each item, in order.
+    """
+    workers = workers or default_workers()
+    if workers <= 1 or (not use_threads and not can_spawn_processes()):
+        for item in items:
+            yield func(item)
+        return
+
+    prefetch = prefetch or workers * 2
+    executor_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_cls(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
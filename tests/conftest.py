@@ -80,6 +80,14 @@ def live_server_url():
     proc.terminate()
     proc.wait()
 
+@pytest.fixture(autouse=True)
+def pipeline_cache_dir(tmp_path, monkeypatch):
+    """Each test gets its own pipeline step cache."""
+    import pipeline_cache
+    directory = str(tmp_path / 'pipeline_cache')
+    monkeypatch.setattr(pipeline_cache, 'PIPELINE_CACHE_DIR', directory)
+    return directory
+
 @pytest.fixture
 def client(app):
     return app.test_client()
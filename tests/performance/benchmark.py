@@ -0,0 +1,354 @@
+"""
+Throughput benchmarks for the document engines.
+
+Each suite generates its own synthetic input, runs the engines it covers and
+prints one result row per engine. Unlike load_test.js (k6, HTTP level), these
+run in-process and need no server.
+
+Usage:
+    python tests/performance/benchmark.py                 # all suites
+    python tests/performance/benchmark.py text --pages 400
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from reportlab.pdfgen import canvas
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a suite: func(workdir, args) -> list of result dicts."""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def make_text_pdf(path, pages, lines_per_page=40):
+    c = canvas.Canvas(path)
+    for p in range(pages):
+        for line in range(lines_per_page):
+            c.drawString(50, 800 - line * 18, f"Page {p + 1} line {line + 1}: the quick brown fox jumps over the lazy dog")
+        c.showPage()
+    c.save()
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@benchmark('text')
+def bench_text_engines(workdir, args):
+    """Text-layer extraction throughput per engine (pages/s)."""
+    from converters.text_engines import available_engines, iter_page_texts
+
+    pdf_path = os.path.join(workdir, 'text.pdf')
+    make_text_pdf(pdf_path, args.pages)
+
+    results = []
+    for engine in available_engines():
+        texts, seconds = timed(lambda: list(iter_page_texts(pdf_path, engine=engine, workers=args.workers)))
+        results.append({
+            'engine': engine,
+            'pages': len(texts),
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(len(texts) / seconds, 1) if seconds else None,
+        })
+    return results
+
+
+@benchmark('render')
+def bench_render(workdir, args):
+    """Page-to-PNG export throughput, serial vs. the process-pool render farm."""
+    from page_renderer import render_to_files
+
+    pdf_path = os.path.join(workdir, 'render.pdf')
+    make_text_pdf(pdf_path, args.pages)
+
+    results = []
+    for workers in sorted({1, args.workers or os.cpu_count() or 1}):
+        output_dir = os.path.join(workdir, f'render_{workers}')
+        os.makedirs(output_dir, exist_ok=True)
+        files, seconds = timed(render_to_files, pdf_path, output_dir, 'PNG', dpi=150, workers=workers)
+        results.append({
+            'workers': workers,
+            'pages': len(files),
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(len(files) / seconds, 1) if seconds else None,
+        })
+    return results
+
+
+@benchmark('compare')
+def bench_compare(workdir, args):
+    """Per-page /compare diff time at 150 DPI (rendering excluded)."""
+    from page_renderer import iter_pages
+    from compare_engine import compare_pages
+
+    pages = min(args.pages, 20)
+    pdf1, pdf2 = os.path.join(workdir, 'compare_a.pdf'), os.path.join(workdir, 'compare_b.pdf')
+    make_text_pdf(pdf1, pages)
+    c = canvas.Canvas(pdf2)
+    for p in range(pages):
+        for line in range(40):
+            word = 'cat' if line == 7 else 'dog'
+            c.drawString(50, 800 - line * 18, f"Page {p + 1} line {line + 1}: the quick brown fox jumps over the lazy {word}")
+        c.showPage()
+    c.save()
+
+    rendered = list(zip((img for _, img in iter_pages(pdf1, dpi=150)), (img for _, img in iter_pages(pdf2, dpi=150))))
+    _, seconds = timed(lambda: [compare_pages(a, b) for a, b in rendered])
+    return [{
+        'engine': 'numpy',
+        'pages': len(rendered),
+        'ms_per_page': round(seconds / len(rendered) * 1000, 1) if rendered else None,
+    }]
+
+
+@benchmark('merge')
+def bench_merge(workdir, args):
+    """Merging many inputs that share fonts and a logo: pypdf append vs. the dedup engine."""
+    from PIL import Image
+    from pypdf import PdfWriter
+    from merge_engine import merge_pdfs
+
+    logo = os.path.join(workdir, 'logo.png')
+    Image.new('RGB', (400, 200), (20, 120, 200)).save(logo)
+    inputs = []
+    for n in range(min(args.pages, 200)):
+        path = os.path.join(workdir, f'statement_{n}.pdf')
+        c = canvas.Canvas(path)
+        c.drawImage(logo, 50, 700)
+        c.drawString(50, 650, f"Monthly statement {n + 1}")
+        c.showPage()
+        c.save()
+        inputs.append(path)
+
+    def pypdf_merge(output_path):
+        writer = PdfWriter()
+        for path in inputs:
+            writer.append(path)
+        writer.write(output_path)
+
+    results = []
+    for engine, func in (('pypdf', pypdf_merge), ('dedup', lambda out: merge_pdfs(inputs, out))):
+        output_path = os.path.join(workdir, f'merged_{engine}.pdf')
+        _, seconds = timed(func, output_path)
+        results.append({
+            'engine': engine,
+            'inputs': len(inputs),
+            'seconds': round(seconds, 3),
+            'ms_per_input': round(seconds / len(inputs) * 1000, 2),
+            'output_bytes': os.path.getsize(output_path),
+        })
+    return results
+
+
+@benchmark('compress')
+def bench_compress(workdir, args):
+    """Scanned-photo PDF at the ebook preset: Ghostscript (if installed) vs. the native engine."""
+    import shutil
+    from PIL import Image
+    from compress_engine import compress, estimate
+
+    photo = os.path.join(workdir, 'photo.png')
+    channels = [Image.effect_noise((1200, 900), 50).rotate(angle) for angle in (0, 90, 180)]
+    Image.merge('RGB', channels).save(photo)
+    pdf_path = os.path.join(workdir, 'photos.pdf')
+    c = canvas.Canvas(pdf_path)
+    for p in range(min(args.pages, 40)):
+        c.drawImage(photo, 50, 300, width=480, height=360)
+        c.drawString(50, 750, f"Photo page {p + 1}")
+        c.showPage()
+    c.save()
+
+    engines = [('native', workers) for workers in sorted({1, args.workers or os.cpu_count() or 1})]
+    if shutil.which('gs'):
+        engines.insert(0, ('ghostscript', 1))
+
+    results = []
+    for engine, workers in engines:
+        output_path = os.path.join(workdir, f'compressed_{engine}_{workers}.pdf')
+        stats, seconds = timed(compress, pdf_path, output_path, 'ebook', engine, workers=workers)
+        results.append({
+            'engine': engine,
+            'workers': workers,
+            'seconds': round(seconds, 3),
+            'input_bytes': stats['original_size'],
+            'output_bytes': stats['compressed_size'],
+        })
+
+    prediction, seconds = timed(estimate, pdf_path, ['ebook'])
+    results.append({
+        'engine': 'estimate',
+        'workers': args.workers or '',
+        'seconds': round(seconds, 3),
+        'input_bytes': prediction['original_size'],
+        'output_bytes': prediction['estimates'][0]['estimated_size'],
+    })
+    return results
+
+
+@benchmark('sanitize')
+def bench_sanitize(workdir, args):
+    """Single-pass sanitizer on a document with tens of thousands of objects (objects/s)."""
+    import pikepdf
+    from sanitize_engine import SanitizePolicy, sanitize
+
+    # 50 link annotations per page, each with its own indirect URI or JavaScript action
+    pdf_path = os.path.join(workdir, 'annotated.pdf')
+    with pikepdf.new() as pdf:
+        for p in range(args.pages):
+            pdf.add_blank_page()
+            annots = []
+            for i in range(50):
+                action = pikepdf.Dictionary(S=pikepdf.Name('/URI'), URI=f"https://example.com/{p}/{i}".encode()) \
+                    if i % 2 else pikepdf.Dictionary(S=pikepdf.Name('/JavaScript'), JS=b"app.alert(1)")
+                annots.append(pdf.make_indirect(pikepdf.Dictionary(
+                    Type=pikepdf.Name('/Annot'), Subtype=pikepdf.Name('/Link'),
+                    Rect=[10, 10 + i * 15, 200, 20 + i * 15], A=pdf.make_indirect(action))))
+            pdf.pages[-1].Annots = pikepdf.Array(annots)
+        pdf.save(pdf_path)
+
+    results = []
+    for mode, apply in (('report', False), ('sanitize', True)):
+        with pikepdf.open(pdf_path) as pdf:
+            report, seconds = timed(sanitize, pdf, SanitizePolicy.all(), apply=apply)
+        results.append({
+            'mode': mode,
+            'objects': report['objects_visited'],
+            'findings': len(report['findings']),
+            'seconds': round(seconds, 3),
+            'objects_per_s': round(report['objects_visited'] / seconds) if seconds else '',
+        })
+    return results
+
+
+
+@benchmark('redact')
+def bench_redact(workdir, args):
+    """Pattern search (pages/s per worker count) and true redaction of every match."""
+    from redaction_engine import build_patterns, find_matches, apply_redactions
+    from worker_pool import default_workers
+
+    pdf_path = os.path.join(workdir, 'text.pdf')
+    make_text_pdf(pdf_path, args.pages)
+    patterns = build_patterns(terms=['fox', 'lazy dog'], whole_words=True)
+
+    results = []
+    for workers in sorted({1, args.workers or default_workers()}):
+        found, seconds = timed(find_matches, pdf_path, patterns, workers=workers)
+        results.append({
+            'step': f'search ({workers} workers)',
+            'hits': sum(len(m) for m in found.values()),
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(args.pages / seconds, 1) if seconds else None,
+        })
+    report, seconds = timed(apply_redactions, pdf_path, os.path.join(workdir, 'redacted.pdf'), found)
+    results.append({
+        'step': 'apply',
+        'hits': report['total_hits'],
+        'seconds': round(seconds, 3),
+        'pages_per_second': round(report['pages_redacted'] / seconds, 1) if seconds else None,
+    })
+    return results
+
+
+@benchmark('watermark')
+def bench_watermark(workdir, args):
+    """Shared Form XObject watermark: pages/s and bytes added per page."""
+    import pikepdf
+    from watermark_engine import Watermark, STAMP_DEFAULTS, apply_watermark
+
+    pdf_path = os.path.join(workdir, 'text.pdf')
+    make_text_pdf(pdf_path, args.pages)
+    # Growth is measured against an unmarked save with the same writer
+    with pikepdf.open(pdf_path) as pdf:
+        pdf.save(os.path.join(workdir, 'unmarked.pdf'))
+    source_size = os.path.getsize(os.path.join(workdir, 'unmarked.pdf'))
+
+    results = []
+    for kind, mark in (('watermark', Watermark()), ('stamp', Watermark(**STAMP_DEFAULTS))):
+        output = os.path.join(workdir, f'{kind}.pdf')
+        with pikepdf.open(pdf_path) as pdf:
+            report, seconds = timed(apply_watermark, pdf, mark)
+            pdf.save(output)
+        results.append({
+            'mark': kind,
+            'pages': report['pages'],
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(report['pages'] / seconds) if seconds else None,
+            'bytes_per_page': round((os.path.getsize(output) - source_size) / report['pages'], 1),
+        })
+    return results
+
+
+@benchmark('forms')
+def bench_forms(workdir, args):
+    """Mail merge: records/s filled into a zip and into one merged PDF."""
+    from form_fill_engine import FormTemplate, MailMerge
+
+    template_path = os.path.join(workdir, 'form.pdf')
+    c = canvas.Canvas(template_path)
+    c.drawString(72, 780, "Contract")
+    for i in range(10):
+        c.acroForm.textfield(name=f'field{i}', x=72, y=700 - i * 30, width=300, height=20)
+    c.showPage()
+    c.save()
+
+    template = FormTemplate(template_path)
+    records = [{f'field{i}': f'Record {r} value {i}' for i in range(10)} for r in range(args.pages)]
+    results = []
+    for output, flatten in (('zip', False), ('zip', True), ('merge', True)):
+        merge = MailMerge(template, records, flatten=flatten, workers=args.workers)
+        path = os.path.join(workdir, f'filled.{"pdf" if output == "merge" else "zip"}')
+        stats = merge.write_merged(path) if output == 'merge' else merge.write_zip(path)
+        results.append({
+            'output': output,
+            'flatten': flatten,
+            'records': stats['filled'],
+            'seconds': stats['seconds'],
+            'records_per_second': stats['records_per_second'],
+            'bytes': os.path.getsize(path),
+        })
+    return results
+
+def print_results(name, results):
+    print(f"\n== {name} ==")
+    if not results:
+        print("(no results)")
+        return
+    columns = list(results[0].keys())
+    widths = [max(len(str(c)), *(len(str(r.get(c))) for r in results)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in results:
+        print("  ".join(str(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suites', nargs='*', help=f"Suites to run (default: all). Available: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--pages', type=int, default=200, help="Pages in generated documents")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    suites = args.suites or list(BENCHMARKS)
+    unknown = [s for s in suites if s not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown suite(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in suites:
+            print_results(name, BENCHMARKS[name](workdir, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import io
 import os
 import pytest
 from reportlab.pdfgen import canvas
@@ -92,15 +93,18 @@ def test_compare_identical(client, app):
         
         # Identical PDFs should have 0 differences
         assert data['summary']['total_differences'] == 0
+        # Identical pages are detected from their content and never rendered
+        assert data['summary']['identical_pages'] == [1]
+        assert data['summary']['pages_rendered'] == 0
         
-        # Verify no diff images were created (only side-by-side)
+        # Verify no page images were created
         output_path = os.path.join(app.config['OUTPUT_FOLDER'], data['filename'])
         import zipfile
         with zipfile.ZipFile(output_path, 'r') as zf:
             names = zf.namelist()
-            # Should have summary and side-by-side, but no diff
+            # Should have only the summary
             assert 'summary.json' in names
-            assert 'page_1_sidebyside.jpg' in names
+            assert 'page_1_sidebyside.jpg' not in names
             assert 'page_1_diff.png' not in names
         
     finally:
@@ -175,3 +179,164 @@ def test_compare_different_page_counts(client, app):
         if os.path.exists(path1): os.remove(path1)
         if os.path.exists(path2): os.remove(path2)
         if output_path and os.path.exists(output_path): os.remove(output_path)
+
+
+def test_compare_engine_scores_and_regions():
+    """Array diff reports the changed fraction and one box per changed area."""
+    from PIL import Image, ImageDraw
+    from compare_engine import compare_pages, overlay, diff_mask
+
+    base = Image.new('RGB', (400, 300), (255, 255, 255))
+    changed = base.copy()
+    draw = ImageDraw.Draw(changed)
+    draw.rectangle([10, 20, 49, 39], fill=(0, 0, 0))      # 40 x 20
+    draw.rectangle([300, 200, 319, 219], fill=(0, 0, 0))  # 20 x 20
+
+    result = compare_pages(base, changed)
+
+    assert result['has_diff']
+    assert result['score'] == (40 * 20 + 20 * 20) / (400 * 300)
+    assert sorted(result['regions']) == [[10, 20, 50, 40], [300, 200, 320, 220]]
+
+    # Overlay matches the previous per-pixel alpha_composite output
+    mask, _ = diff_mask(base, changed)
+    red = Image.new('RGBA', base.size, (0, 0, 0, 0))
+    red.paste((255, 0, 0, 128), mask=Image.fromarray(mask))
+    expected = Image.alpha_composite(base.convert('RGBA'), red).convert('RGB')
+    assert overlay(base, mask).tobytes() == expected.tobytes()
+
+
+def test_compare_summary_includes_scores(client, app):
+    pdf1 = "compare_score_1.pdf"
+    pdf2 = "compare_score_2.pdf"
+    create_dummy_pdf(os.path.join(app.config['UPLOAD_FOLDER'], pdf1), "Version one")
+    create_dummy_pdf(os.path.join(app.config['UPLOAD_FOLDER'], pdf2), "Version two")
+
+    response = client.post('/compare', json={'filename1': pdf1, 'filename2': pdf2})
+
+    assert response.status_code == 200
+    summary = response.get_json()['summary']
+    assert summary['pages_with_differences'] == [1]
+    assert 0 < summary['page_scores']['1'] < 0.01
+    x0, y0, x1, y1 = summary['changed_regions']['1'][0]
+    # The edit is in the text line drawn at (100, 750) pt, near the top of the page
+    assert x0 >= 100 * summary['dpi'] / 72 - 1 and y1 < 200
+
+
+def test_compare_renders_only_changed_pages(client, app):
+    """Unchanged pages are skipped; changed ones get a word-level text diff."""
+    pdf1 = "compare_partial_1.pdf"
+    pdf2 = "compare_partial_2.pdf"
+    for name, changed_word in ((pdf1, "approved"), (pdf2, "rejected")):
+        c = canvas.Canvas(os.path.join(app.config['UPLOAD_FOLDER'], name))
+        for i in range(5):
+            word = changed_word if i == 3 else "unchanged"
+            c.drawString(100, 750, f"Clause {i + 1} is {word}")
+            c.showPage()
+        c.save()
+
+    response = client.post('/compare', json={'filename1': pdf1, 'filename2': pdf2})
+
+    assert response.status_code == 200
+    summary = response.get_json()['summary']
+    assert summary['identical_pages'] == [1, 2, 3, 5]
+    assert summary['pages_rendered'] == 1
+    assert summary['pages_with_differences'] == [4]
+    assert summary['text_diff']['4'] == [{'op': 'replace', 'old': 'approved', 'new': 'rejected'}]
+
+
+def test_compare_adaptive_crops_changed_tiles(client, app):
+    """Adaptive mode confirms a one-digit change in a single high-DPI tile."""
+    pdf1 = "compare_adaptive_1.pdf"
+    pdf2 = "compare_adaptive_2.pdf"
+    for name, amount in ((pdf1, "1,250.00"), (pdf2, "1,260.00")):
+        c = canvas.Canvas(os.path.join(app.config['UPLOAD_FOLDER'], name))
+        c.drawString(100, 750, "Invoice total")
+        c.drawString(400, 300, f"Amount due: {amount}")
+        c.showPage()
+        c.save()
+
+    response = client.post('/compare', json={
+        'filename1': pdf1,
+        'filename2': pdf2,
+        'mode': 'adaptive',
+        'tile_size': 144,
+        'dpi_ladder': [36, 100, 200]
+    })
+
+    assert response.status_code == 200
+    data = response.get_json()
+    summary = data['summary']
+    assert summary['pages_with_differences'] == [1]
+    assert summary['dpi'] == 200
+    tiles = summary['changed_tiles']['1']
+    assert 1 <= len(tiles) <= 2
+    # The change sits around (400-520, 300) pt from the bottom: right half, lower part
+    assert all(tile['bbox'][0] >= 288 and tile['bbox'][1] >= 432 for tile in tiles)
+
+    import zipfile
+    from PIL import Image
+    with zipfile.ZipFile(os.path.join(app.config['OUTPUT_FOLDER'], data['filename'])) as zf:
+        crop = Image.open(io.BytesIO(zf.read(tiles[0]['image'])))
+        # Two 144 pt tiles at 200 DPI side by side
+        assert crop.height == 400
+
+
+def test_compare_adaptive_rejects_bad_ladder(client, app):
+    pdf = "compare_ladder.pdf"
+    create_dummy_pdf(os.path.join(app.config['UPLOAD_FOLDER'], pdf), "Ladder")
+
+    response = client.post('/compare', json={
+        'filename1': pdf, 'filename2': pdf, 'mode': 'adaptive', 'dpi_ladder': [300, 72]
+    })
+
+    assert response.status_code == 400
+
+
+def test_fingerprints_of_linked_pages(tmp_path):
+    """Links chaining every page to the next neither recurse nor tie pages together."""
+    import pikepdf
+    from compare_engine import page_fingerprints
+
+    paths = []
+    for version in ('old', 'new'):
+        pdf = pikepdf.new()
+        for i in range(1500):
+            pdf.add_blank_page()
+            text = f'BT /F1 12 Tf 72 720 Td (Page {i} {version if i == 700 else ""}) Tj ET'.encode()
+            pdf.pages[i].obj.Contents = pdf.make_stream(text)
+        for i, page in enumerate(pdf.pages):
+            target = pdf.pages[(i + 1) % len(pdf.pages)].obj
+            link = pikepdf.Dictionary(Type=pikepdf.Name.Annot, Subtype=pikepdf.Name.Link, Rect=[0, 0, 10, 10],
+                                      Dest=[target, pikepdf.Name.Fit])
+            page.obj.Annots = pdf.make_indirect(pikepdf.Array([pdf.make_indirect(link)]))
+        paths.append(str(tmp_path / f'{version}.pdf'))
+        pdf.save(paths[-1])
+
+    old, new = page_fingerprints(paths[0]), page_fingerprints(paths[1])
+    assert [i for i, (a, b) in enumerate(zip(old, new)) if a != b] == [700]
+    # The same content linking elsewhere is a different page
+    assert len(set(old)) == len(old)
+
+
+def test_adaptive_tiles_stay_on_the_point_grid(tmp_path):
+    """A change just left of a tile edge is found in its own tile at any screening DPI."""
+    from compare_engine import compare_page_adaptive
+    from page_renderer import PageRenderer
+
+    paths = []
+    for n, marked in enumerate((False, True)):
+        path = str(tmp_path / f"edge_{n}.pdf")
+        c = canvas.Canvas(path, pagesize=(612, 792))
+        c.drawString(100, 750, "Edge case")
+        if marked:
+            # 100 pt tiles at 50 DPI are 69.4 px; a rounded 69 px grid puts this in column 6
+            c.rect(597.5, 100, 2, 20, stroke=0, fill=1)
+        c.save()
+        paths.append(path)
+
+    with PageRenderer(paths[0], dpi=100) as renderer1, PageRenderer(paths[1], dpi=100) as renderer2:
+        result = compare_page_adaptive(renderer1, renderer2, 0, dpi_ladder=(50, 100), tile_size=100)
+
+    assert result['has_diff']
+    assert [(tile['row'], tile['col']) for tile in result['tiles']] == [(6, 5)]
@@ -34,6 +34,185 @@ def test_compress_success(client, app):
         if 'output_path' in locals() and os.path.exists(output_path):
              os.remove(output_path)
 
+def test_compress_native_downsamples_images(client, app, tmp_path):
+    # A 1600x1200 photo drawn 4x3 inches is ~400 dpi; ebook targets 150 dpi
+    from PIL import Image
+    image_path = str(tmp_path / "photo.png")
+    channels = [Image.effect_noise((1600, 1200), 60).rotate(angle) for angle in (0, 90, 180)]
+    Image.merge('RGB', channels).save(image_path)
+    pdf = "compress_native_test.pdf"
+    path = os.path.join(app.config['UPLOAD_FOLDER'], pdf)
+    c = canvas.Canvas(path)
+    c.drawImage(image_path, 50, 400, width=288, height=216)
+    c.drawString(100, 750, "Compress Me")
+    c.save()
+
+    try:
+        response = client.post('/compress', json={'filename': pdf, 'quality': 'ebook', 'engine': 'native'})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['engine'] == 'native'
+        assert data['compressed_size'] < data['original_size']
+        assert data['images_recompressed'] == 1
+        image = data['images'][0]
+        assert image['page'] == 1
+        assert image['encoding'] == 'jpeg'
+        assert image['new_dimensions'] == [600, 450]
+        assert image['saved_bytes'] > 0
+
+        output_path = os.path.join(app.config['OUTPUT_FOLDER'], data['filename'])
+        import fitz
+        with fitz.open(output_path) as doc:
+            assert "Compress Me" in doc[0].get_text()
+            assert doc[0].get_images()[0][2:4] == (600, 450)
+    finally:
+        if os.path.exists(path): os.remove(path)
+        if 'output_path' in locals() and os.path.exists(output_path):
+            os.remove(output_path)
+
+def test_compress_estimate(client, app, tmp_path):
+    from PIL import Image
+    image_path = str(tmp_path / "photo.png")
+    channels = [Image.effect_noise((1200, 900), 60).rotate(angle) for angle in (0, 90, 180)]
+    Image.merge('RGB', channels).save(image_path)
+    pdf = "compress_estimate_test.pdf"
+    path = os.path.join(app.config['UPLOAD_FOLDER'], pdf)
+    c = canvas.Canvas(path)
+    c.drawImage(image_path, 50, 400, width=288, height=216)
+    c.save()
+
+    try:
+        response = client.post('/compress/estimate', json={'filename': pdf})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['images'] == 1
+        assert data['sampled_images'] == 1
+        estimates = {e['quality']: e for e in data['estimates']}
+        assert list(estimates) == ['screen', 'ebook', 'printer', 'prepress']
+        # Lower presets are smaller, and all beat the original
+        sizes = [estimates[q]['estimated_size'] for q in ('screen', 'ebook', 'printer', 'prepress')]
+        assert sizes == sorted(sizes)
+        assert sizes[-1] < data['original_size']
+
+        # The sampled image is the whole document, so the estimate matches a real run
+        actual = client.post('/compress', json={'filename': pdf, 'quality': 'screen', 'engine': 'native'}).get_json()
+        output_path = os.path.join(app.config['OUTPUT_FOLDER'], actual['filename'])
+        assert abs(actual['compressed_size'] - estimates['screen']['estimated_size']) < data['original_size'] * 0.05
+
+        response = client.post('/compress/estimate', json={'filename': pdf, 'qualities': ['tiny']})
+        assert response.status_code == 400
+    finally:
+        if os.path.exists(path): os.remove(path)
+        if 'output_path' in locals() and os.path.exists(output_path):
+            os.remove(output_path)
+
+def test_compress_scan_preset(client, app, tmp_path):
+    # A black-and-white "scan" stored as a grayscale JPEG becomes 1-bit G4
+    from PIL import Image, ImageDraw
+    scan = Image.new('L', (1275, 1650), 255)
+    draw = ImageDraw.Draw(scan)
+    for line in range(40):
+        draw.text((100, 100 + line * 36), f"Scanned line {line} of a black and white office document", fill=0)
+    image_path = str(tmp_path / "scan.jpg")
+    scan.save(image_path, quality=90)
+    pdf = "compress_scan_test.pdf"
+    path = os.path.join(app.config['UPLOAD_FOLDER'], pdf)
+    c = canvas.Canvas(path, pagesize=(612, 792))
+    c.drawImage(image_path, 0, 0, width=612, height=792)
+    c.save()
+
+    try:
+        response = client.post('/compress', json={'filename': pdf, 'quality': 'scan', 'engine': 'native'})
+        assert response.status_code == 200
+        data = response.get_json()
+        image = data['images'][0]
+        assert image['classification'] == 'bitonal'
+        assert image['encoding'] == 'ccitt'
+        assert image['new_size'] * 5 < image['original_size']
+
+        output_path = os.path.join(app.config['OUTPUT_FOLDER'], data['filename'])
+        import fitz
+        with fitz.open(output_path) as doc:
+            xref = doc[0].get_images()[0][0]
+            assert doc.xref_get_key(xref, 'Filter')[1] == '/CCITTFaxDecode'
+            rendered = doc[0].get_pixmap(dpi=72, colorspace=fitz.csGRAY)
+        with fitz.open(path) as doc:
+            original = doc[0].get_pixmap(dpi=72, colorspace=fitz.csGRAY)
+        # Same page, not inverted
+        difference = sum(abs(a - b) for a, b in zip(rendered.samples, original.samples)) / len(original.samples)
+        assert difference < 10
+
+        response = client.post('/compress', json={'filename': pdf, 'quality': 'scan', 'engine': 'ghostscript'})
+        assert response.status_code == 400
+    finally:
+        if os.path.exists(path): os.remove(path)
+        if 'output_path' in locals() and os.path.exists(output_path):
+            os.remove(output_path)
+
+def test_compress_scan_mixed_raster_content(tmp_path):
+    # Dark text on a tinted page with a red figure: text mask over a JPEG background
+    from PIL import Image, ImageDraw
+    import fitz
+    from compress_engine import compress_pdf
+    scan = Image.new('RGB', (1275, 1650), (245, 235, 200))
+    draw = ImageDraw.Draw(scan)
+    draw.rectangle((700, 100, 1150, 500), fill=(200, 60, 60))
+    for line in range(30):
+        draw.text((100, 600 + line * 30), f"Invoice line {line}: consulting services", fill=(20, 20, 60))
+    image_path = str(tmp_path / "color.png")
+    scan.save(image_path)
+    path, output_path = str(tmp_path / "color.pdf"), str(tmp_path / "color_out.pdf")
+    c = canvas.Canvas(path, pagesize=(612, 792))
+    c.drawImage(image_path, 0, 0, width=612, height=792)
+    c.save()
+
+    stats = compress_pdf(path, output_path, 'scan', workers=1)
+    image = stats['images'][0]
+    assert (image['classification'], image['encoding']) == ('color', 'mrc')
+    assert stats['compressed_size'] < stats['original_size']
+
+    with fitz.open(output_path) as doc:
+        rendered = doc[0].get_pixmap(dpi=36)
+    with fitz.open(path) as doc:
+        original = doc[0].get_pixmap(dpi=36)
+    difference = sum(abs(a - b) for a, b in zip(rendered.samples, original.samples)) / len(original.samples)
+    assert difference < 10
+    # The red figure stays red (it is not part of the text mask)
+    assert rendered.pixel(int(925 / 1275 * rendered.width), int(300 / 1650 * rendered.height))[0] > 150
+
+def test_compress_invalid_engine(client, app):
+    pdf = "compress_engine_test.pdf"
+    path = os.path.join(app.config['UPLOAD_FOLDER'], pdf)
+    create_dummy_pdf(path, "Compress Me")
+    try:
+        response = client.post('/compress', json={'filename': pdf, 'engine': 'zip'})
+        assert response.status_code == 400
+    finally:
+        os.remove(path)
+
 def test_compress_missing_file(client):
     response = client.post('/compress', json={'filename': 'fake.pdf'})
     assert response.status_code == 404
+
+def test_compress_reopens_replaced_upload(tmp_path):
+    # An upload replaced at the same path must not be served from a cached open document
+    import numpy as np
+    from PIL import Image
+    from compress_engine import compress_pdf
+    import fitz
+
+    path = str(tmp_path / "upload.pdf")
+    output = str(tmp_path / "out.pdf")
+    for color in ((26, 24, 229), (20, 200, 40)):
+        image_path = str(tmp_path / "photo.png")
+        noise = np.random.default_rng(0).integers(-20, 20, (1200, 1600, 3))
+        Image.fromarray(np.clip(np.array(color) + noise, 0, 255).astype(np.uint8)).save(image_path)
+        c = canvas.Canvas(path + ".tmp")
+        c.drawImage(image_path, 50, 300, width=288, height=216)
+        c.save()
+        os.replace(path + ".tmp", path)
+
+        compress_pdf(path, output, 'screen', workers=1)
+        with fitz.open(output) as doc:
+            pixel = doc[0].get_pixmap(clip=fitz.Rect(150, 400, 151, 401)).pixel(0, 0)
+        assert all(abs(a - b) < 40 for a, b in zip(pixel, color))
@@ -0,0 +1,146 @@
+import io
+import os
+import zipfile
+
+import fitz
+from reportlab.pdfgen import canvas
+
+from form_fill_engine import FormTemplate, MailMerge, parse_records, main
+
+
+def make_form_pdf(path):
+    c = canvas.Canvas(path)
+    c.drawString(72, 780, "Contract")
+    form = c.acroForm
+    form.textfield(name='name', x=72, y=700, width=200, height=20)
+    form.textfield(name='amount', x=72, y=660, width=200, height=20)
+    form.checkbox(name='agree', x=72, y=620, buttonStyle='check')
+    form.choice(name='plan', options=['basic', 'pro'], value='basic', x=72, y=580, width=100, height=20)
+    form.radio(name='tier', value='gold', selected=False, x=72, y=540)
+    form.radio(name='tier', value='silver', selected=True, x=100, y=540)
+    c.showPage()
+    c.save()
+
+
+CSV_DATA = "name,amount,agree,plan,tier,notes\nAda,100,yes,pro,gold,x\nBob,200,no,basic,silver,y\nCyd,300,1,premium,gold,z\n"
+
+
+def widget_values(data):
+    # One entry per field: the radio group is represented by its selected button
+    with fitz.open(stream=data, filetype='pdf') as doc:
+        return {w.field_name: w.field_value for w in doc[0].widgets() if w.field_value != 'Off' or w.field_name != 'tier'}
+
+
+def test_template_field_tree(tmp_path):
+    path = str(tmp_path / 'form.pdf')
+    make_form_pdf(path)
+    fields = {f['name']: f for f in FormTemplate(path).describe()}
+    assert {name: f['kind'] for name, f in fields.items()} == {
+        'name': 'text', 'amount': 'text', 'agree': 'checkbox', 'plan': 'choice', 'tier': 'radio'}
+    assert fields['tier']['options'] == ['gold', 'silver']
+
+
+def test_mail_merge_zip(tmp_path):
+    path = str(tmp_path / 'form.pdf')
+    make_form_pdf(path)
+    merge = MailMerge(FormTemplate(path), parse_records(CSV_DATA), workers=2, chunk_size=1,
+                      name_pattern='{name}.pdf')
+    results = list(merge.results())
+
+    assert [name for name, _ in results] == ['Ada.pdf', 'Bob.pdf']
+    assert widget_values(results[0][1]) == {'name': 'Ada', 'amount': '100', 'agree': 'Yes', 'plan': 'pro', 'tier': 'gold'}
+    assert widget_values(results[1][1])['agree'] == 'Off'
+    stats = merge.stats
+    assert stats['filled'] == 2 and stats['failed'] == 1
+    assert stats['errors'][0]['record'] == 3 and 'premium' in stats['errors'][0]['error']
+    assert stats['unknown_columns'] == ['notes']
+
+
+def test_forms_fill_endpoint(client, upload_folder, output_folder):
+    make_form_pdf(os.path.join(upload_folder, 'form.pdf'))
+
+    response = client.post('/api/forms/fill', json={
+        'template': 'form.pdf', 'csv': CSV_DATA, 'output': 'merge',
+    })
+    assert response.status_code == 200
+    assert response.json['filled'] == 2
+    with fitz.open(os.path.join(output_folder, response.json['filename'])) as doc:
+        assert doc.page_count == 2
+        # Merged records are flattened
+        assert not list(doc[0].widgets())
+        assert 'Ada' in doc[0].get_text() and 'Bob' in doc[1].get_text()
+
+    records = [{'name': f'Person {i}', 'agree': True} for i in range(5)]
+    response = client.post('/api/forms/fill', json={'template': 'form.pdf', 'records': records, 'stream': True})
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert zf.namelist() == [f'{i:05d}.pdf' for i in range(1, 6)]
+
+    assert client.post('/api/forms/fill', json={'template': 'form.pdf'}).status_code == 400
+
+
+def test_forms_fill_csv_is_never_a_path(client, upload_folder):
+    make_form_pdf(os.path.join(upload_folder, 'form.pdf'))
+    data_path = os.path.join(upload_folder, 'records.csv')
+    with open(data_path, 'w') as f:
+        f.write(CSV_DATA)
+
+    # Parsed as CSV text: a header named after the path and no rows
+    response = client.post('/api/forms/fill', json={'template': 'form.pdf', 'csv': data_path})
+    assert response.status_code == 400
+    assert response.json['error'] == 'Records required'
+
+    response = client.post('/api/forms/fill', json={'template': 'form.pdf', 'data_file': 'records.csv'})
+    assert response.status_code == 200
+    assert response.json['filled'] == 2
+    assert client.post('/api/forms/fill', json={'template': 'form.pdf', 'records': [1]}).status_code == 400
+
+
+def test_form_fill_cli(tmp_path, capsys):
+    template = str(tmp_path / 'form.pdf')
+    make_form_pdf(template)
+    data = tmp_path / 'records.json'
+    data.write_text('[{"name": "Ada", "tier": "silver"}, {"name": "Bob"}]')
+    output = str(tmp_path / 'out.zip')
+
+    assert main([template, str(data), '-o', output, '--flatten', '--workers', '1']) == 0
+    with zipfile.ZipFile(output) as zf:
+        assert len(zf.namelist()) == 2
+    assert 'records/s' in capsys.readouterr().out
+
+
+def test_replaced_template_is_read_again(tmp_path):
+    path = str(tmp_path / 'form.pdf')
+    make_form_pdf(path)
+    assert widget_values(FormTemplate(path).fill({'name': 'Ada'}))['name'] == 'Ada'
+
+    # A different form uploaded under the same name
+    c = canvas.Canvas(path)
+    c.drawString(72, 780, "Invoice")
+    c.acroForm.textfield(name='customer', x=72, y=700, width=200, height=20)
+    c.showPage()
+    c.save()
+
+    template = FormTemplate(path)
+    assert [f['name'] for f in template.describe()] == ['customer']
+    results = list(MailMerge(template, [{'customer': 'Bob'}], workers=1).results())
+    assert widget_values(results[0][1]) == {'customer': 'Bob'}
+
+
+def test_write_merged_in_batches(tmp_path, monkeypatch):
+    import form_fill_engine
+
+    path = str(tmp_path / 'form.pdf')
+    make_form_pdf(path)
+    monkeypatch.setattr(form_fill_engine, 'MERGE_BATCH', 3)
+    records = [{'name': f'Person {i}'} for i in range(7)]
+    output = str(tmp_path / 'all.pdf')
+
+    stats = MailMerge(FormTemplate(path), records, workers=1).write_merged(output)
+
+    assert stats['filled'] == 7
+    with fitz.open(output) as doc:
+        assert [page.get_text().count('Person') for page in doc] == [1] * 7
+        assert 'Person 6' in doc[6].get_text()
+    # The batch files are gone
+    assert sorted(os.listdir(tmp_path)) == ['all.pdf', 'form.pdf']
@@ -12,23 +12,20 @@ def test_pdf_to_jpg_success(client, app):
     filename = "test_image.pdf"
     filepath = os.path.join(upload_dir, filename)
     
-    # We need a real PDF or mock the pdf2image conversion
-    # Mocking pdf2image is safer as we don't want to rely on poppler in unit test environment if not fully setup
-    # But for "Integration" we might want real. 
-    # Let's mock pdf2image to isolate from system dependencies in this test file, 
-    # relying on the fact that we checked availability earlier.
+    # Mock the shared page renderer to isolate the route from real rendering.
     
     with open(filepath, "wb") as f:
          f.write(b"%PDF-1.4 mock content")
          
-    # Patching pdf2image.convert_from_path directly
-    # We need to ensure pdf2image is imported or patch string works
-    with patch('pdf2image.convert_from_path') as mock_convert:
+    # Patch the renderer where the route looks it up
+    with patch('routes.pdf_routes.PageRenderer') as mock_renderer_cls:
         # Mock returned images (Pillow Image objects)
         mock_image = MagicMock()
-        # Side effect to create the file so zipfile.write and os.remove work
-        mock_image.save.side_effect = lambda path, format: open(path, 'wb').write(b'fake_jpg_content')
-        mock_convert.return_value = [mock_image, mock_image] # 2 pages
+        # Side effect writes into the in-memory buffer the route passes
+        mock_image.save.side_effect = lambda fp, format: fp.write(b'fake_jpg_content')
+        mock_renderer = mock_renderer_cls.return_value.__enter__.return_value
+        mock_renderer.page_count = 2
+        mock_renderer.render.return_value = mock_image
         
         response = client.post('/pdf-to-jpg', json={'filename': filename})
         
@@ -43,3 +40,34 @@ def test_pdf_to_jpg_missing_file(client):
     """Test conversion with missing file."""
     response = client.post('/pdf-to-jpg', json={'filename': 'nonexistent.pdf'})
     assert response.status_code == 404
+
+
+def test_pdf_to_jpg_passthrough_scanned_pages(client, app, tmp_path):
+    """Scanned pages are exported from their embedded JPEG; other pages are rendered."""
+    import zipfile
+    from PIL import Image
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
+    scan_path = str(tmp_path / "scan.jpg")
+    Image.new('RGB', (200, 280), (180, 40, 40)).save(scan_path, 'JPEG', quality=80)
+    with open(scan_path, 'rb') as f:
+        scan_bytes = f.read()
+
+    filename = "scanned.pdf"
+    c = canvas.Canvas(os.path.join(app.config['UPLOAD_FOLDER'], filename), pagesize=A4)
+    c.drawImage(scan_path, 0, 0, width=A4[0], height=A4[1])
+    c.showPage()
+    c.drawString(100, 750, "Born-digital page")
+    c.showPage()
+    c.save()
+
+    response = client.post('/pdf-to-jpg', json={'filename': filename, 'passthrough': True})
+
+    assert response.status_code == 200
+    assert response.json['passthrough_pages'] == 1
+    zip_path = os.path.join(app.config['OUTPUT_FOLDER'], response.json['filename'])
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.read('scanned_page1.jpg') == scan_bytes
+        rendered = Image.open(io.BytesIO(zf.read('scanned_page2.jpg')))
+        assert rendered.size[0] > 200
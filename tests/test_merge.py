@@ -55,3 +55,89 @@ def test_merge_missing_file(client):
     # Or if first is missing, returns 404
     # The logic loops.
     assert response.status_code == 404
+
+def test_merge_shares_identical_resources(client, app, tmp_path):
+    """A logo embedded in every input is stored once in the merged file."""
+    import pikepdf
+    from PIL import Image
+
+    logo = str(tmp_path / "logo.png")
+    Image.new('RGB', (200, 200), (20, 120, 200)).save(logo)
+    filenames = []
+    for n in range(4):
+        name = f"statement_{n}.pdf"
+        c = canvas.Canvas(os.path.join(app.config['UPLOAD_FOLDER'], name))
+        c.drawImage(logo, 50, 650)
+        c.drawString(100, 600, f"Statement {n + 1}")
+        c.bookmarkPage(f"s{n}")
+        c.addOutlineEntry(f"Statement {n + 1}", f"s{n}")
+        c.save()
+        filenames.append(name)
+
+    response = client.post('/merge', json={'filenames': filenames})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    stats = data['stats']
+    assert stats['pages'] == 4
+    assert [entry['file'] for entry in stats['inputs']] == filenames
+    assert all(entry['seconds'] >= 0 for entry in stats['inputs'])
+    assert stats['duplicates_removed'] > 0
+    assert stats['deduplicated_bytes'] > 0
+
+    with pikepdf.open(os.path.join(app.config['OUTPUT_FOLDER'], data['filename'])) as pdf:
+        images = [obj for obj in pdf.objects
+                  if isinstance(obj, pikepdf.Stream) and obj.get('/Subtype') == '/Image']
+        assert len(images) == 1
+        with pdf.open_outline() as outline:
+            assert [item.title for item in outline.root] == [f"Statement {n + 1}" for n in range(4)]
+
+def make_linked_pdf(path, title):
+    """Three pages with hyperref-style bookmarks (/GoTo actions to named destinations) and a form field."""
+    import pikepdf
+    c = canvas.Canvas(path)
+    c.acroForm.textfield(name='signature', x=72, y=700, width=200, height=20)
+    for i in range(3):
+        c.drawString(100, 750, f"{title} section {i + 1}")
+        c.showPage()
+    c.save()
+
+    with pikepdf.open(path, allow_overwriting_input=True) as pdf:
+        pages = [page.obj for page in pdf.pages]
+        dests = pikepdf.NameTree.new(pdf)
+        for i, page in enumerate(pages):
+            dests[f'section.{i + 1}'] = pikepdf.Array([page, pikepdf.Name.XYZ, 0, 792, None])
+        pdf.Root.Names = pikepdf.Dictionary(Dests=dests.obj)
+        with pdf.open_outline() as outline:
+            for i in range(3):
+                item = pikepdf.OutlineItem(f"{title} {i + 1}")
+                item.action = pikepdf.Dictionary(S=pikepdf.Name.GoTo, D=pikepdf.String(f'section.{i + 1}'))
+                outline.root.append(item)
+        pdf.save(path)
+
+
+def test_merge_keeps_named_destinations_and_fields(tmp_path):
+    import pikepdf
+    from merge_engine import merge_pdfs
+    from pdf_outline import page_numbers, named_destinations, outline_page
+
+    paths = []
+    for title in ('Intro', 'Terms'):
+        paths.append(str(tmp_path / f"{title}.pdf"))
+        make_linked_pdf(paths[-1], title)
+    output = str(tmp_path / "merged.pdf")
+
+    stats = merge_pdfs(paths, output)
+
+    assert 'bytes_saved' not in stats
+    with pikepdf.open(output) as pdf:
+        pages = page_numbers(pdf)
+        dests = named_destinations(pdf)
+        with pdf.open_outline() as outline:
+            assert [(item.title, outline_page(item, pages, dests)) for item in outline.root] == [
+                ('Intro 1', 0), ('Intro 2', 1), ('Intro 3', 2), ('Terms 1', 3), ('Terms 2', 4), ('Terms 3', 5)]
+        # The first input keeps its names
+        assert [pages[dests[f'section.{i}'][0].objgen] for i in (1, 2, 3)] == [0, 1, 2]
+        # Both forms work, the second field renamed
+        fields = pdf.Root.AcroForm.Fields
+        assert len(fields) == 2 and len({str(field.T) for field in fields}) == 2
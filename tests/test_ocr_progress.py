@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import MagicMock
+from ocr_progress import ThrottledProgress, CallbackProgressBar, forward_progress, get_progressbar_class
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_throttle_drops_fast_updates():
+    clock = FakeClock()
+    callback = MagicMock()
+    progress = ThrottledProgress(callback, min_interval=1.0, clock=clock)
+
+    assert progress.report({'current': 1})
+    clock.now = 0.5
+    assert not progress.report({'current': 2})
+    # Forced updates (stage boundaries) always go through
+    assert progress.report({'current': 3}, force=True)
+    clock.now = 1.6
+    assert progress.report({'current': 4})
+
+    assert callback.call_count == 3
+
+
+def test_progress_bar_reports_pages_and_eta():
+    callback = MagicMock()
+
+    with forward_progress(callback, min_interval=0):
+        assert get_progressbar_class() is CallbackProgressBar
+        with CallbackProgressBar(total=10, desc='OCR', unit='page', disable=True) as bar:
+            bar.update()
+            bar.update(4)
+
+    states = [c.args[0] for c in callback.call_args_list]
+    metas = [c.args[1] for c in callback.call_args_list]
+    assert set(states) == {'PROCESSING'}
+
+    # enter + 2 updates + exit
+    assert len(metas) == 4
+    assert metas[2]['pages_completed'] == 5
+    assert metas[2]['pages_total'] == 10
+    assert '5/10' in metas[2]['status']
+    assert metas[2]['eta'] is not None
+    assert 'elapsed' in metas[2]
+
+    # Progress is monotonic inside the OCR band and completes it on exit
+    currents = [m['current'] for m in metas]
+    assert currents == sorted(currents)
+    assert metas[-1]['pages_completed'] == 10
+    assert metas[-1]['eta'] is None
+
+
+def test_progress_bar_without_callback_is_silent():
+    bar = CallbackProgressBar(total=3, desc='OCR', unit='page')
+    with bar:
+        bar.update()
+    # Nothing to assert beyond "does not raise": no reporter is installed
+    assert bar.completed == 3
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import subprocess
+import textwrap
+import pytest
+import fitz
+from reportlab.pdfgen import canvas
+
+from page_renderer import PageRenderer, iter_pages, fit_dpi, render_to_files
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+
+
+def create_pdf(path, pages):
+    c = canvas.Canvas(path)
+    for i in range(pages):
+        c.drawString(100, 750, f"Rendered page {i + 1}")
+        c.showPage()
+    c.save()
+
+
+def test_iter_pages_yields_one_image_per_page(tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    create_pdf(pdf_path, 3)
+
+    results = list(iter_pages(pdf_path, dpi=72))
+
+    assert [index for index, _ in results] == [0, 1, 2]
+    # reportlab's default page size is A4 (595 x 842 pt)
+    assert results[0][1].size in ((595, 842), (596, 842))
+    assert results[0][1].mode == 'RGB'
+
+
+def test_render_subset_grayscale_and_clip(tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    create_pdf(pdf_path, 4)
+
+    with PageRenderer(pdf_path, dpi=144, mode='L') as renderer:
+        indices = [index for index, _ in renderer.iter_pages([1, 3])]
+        crop = renderer.render(0, clip=(0, 0, 100, 50))
+
+    assert indices == [1, 3]
+    assert crop.mode == 'L'
+    assert crop.size == (200, 100)
+
+
+def test_dpi_is_capped_by_page_budget():
+    # A4 at 300 DPI in RGB is ~26 MB
+    assert fit_dpi(595, 842, 300, 3, 64 * 1024 * 1024) == 300
+    capped = fit_dpi(595, 842, 300, 3, 8 * 1024 * 1024)
+    assert capped < 300
+    assert (595 * capped / 72) * (842 * capped / 72) * 3 <= 8 * 1024 * 1024
+
+
+def test_render_to_files_parallel_is_deterministic(tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    create_pdf(pdf_path, 7)
+    serial_dir, parallel_dir = tmp_path / "serial", tmp_path / "parallel"
+    serial_dir.mkdir()
+    parallel_dir.mkdir()
+
+    serial = render_to_files(pdf_path, str(serial_dir), 'PNG', dpi=36, workers=1)
+    parallel = render_to_files(pdf_path, str(parallel_dir), 'PNG', dpi=36, workers=2, chunk_size=2)
+
+    assert serial == parallel == [f"page_{n}.png" for n in range(1, 8)]
+    for name in parallel:
+        assert (parallel_dir / name).read_bytes() == (serial_dir / name).read_bytes()
+
+
+def test_render_to_files_passthrough_transcodes_scanned_pages(tmp_path):
+    from PIL import Image
+    from reportlab.lib.pagesizes import A4
+
+    scan_path = str(tmp_path / "scan.jpg")
+    Image.new('RGB', (200, 280), (40, 40, 180)).save(scan_path, 'JPEG')
+    pdf_path = str(tmp_path / "scan.pdf")
+    c = canvas.Canvas(pdf_path, pagesize=A4)
+    for _ in range(3):
+        c.drawImage(scan_path, 0, 0, width=A4[0], height=A4[1])
+        c.showPage()
+    c.drawImage(scan_path, 100, 100, width=200, height=280)  # not full-page
+    c.showPage()
+    c.save()
+
+    stats = {}
+    files = render_to_files(pdf_path, str(tmp_path), 'PNG', dpi=36, workers=1, passthrough=True, stats=stats)
+
+    assert stats['passthrough_pages'] == 3
+    with Image.open(tmp_path / files[0]) as first, Image.open(tmp_path / files[3]) as last:
+        assert first.format == 'PNG' and first.size == (200, 280)  # native resolution
+        assert last.size == (298, 421)  # rendered at 36 DPI
+
+
+@pytest.mark.slow
+def test_peak_memory_stays_within_documented_budget(tmp_path):
+    """Peak RSS growth while streaming a document stays under 2 x max_page_bytes.
+
+    Runs in a fresh interpreter so ru_maxrss reflects this workload only.
+    Holding every page of this document at once would need ~40 x 8 MB.
+    """
+    pdf_path = str(tmp_path / "large.pdf")
+    create_pdf(pdf_path, 40)
+    budget = 8 * 1024 * 1024
+
+    script = textwrap.dedent(f"""
+        import io, json, resource, sys
+        sys.path.insert(0, {SRC_DIR!r})
+        from page_renderer import PageRenderer
+
+        def peak_rss():
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        with PageRenderer({pdf_path!r}, dpi=300, max_page_bytes={budget}) as renderer:
+            # Warm up allocator, fonts and encoder on the first page
+            renderer.render(0).save(io.BytesIO(), 'JPEG')
+            baseline = peak_rss()
+            largest = 0
+            for index, image in renderer.iter_pages():
+                largest = max(largest, image.width * image.height * 3)
+                image.save(io.BytesIO(), 'JPEG')
+                del image
+        print(json.dumps({{'growth': peak_rss() - baseline, 'largest': largest}}))
+    """)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert stats['largest'] <= budget
+    # Documented bound: 2 rasters; allow a little allocator slack on top
+    assert stats['growth'] <= 2 * budget + 16 * 1024 * 1024, stats
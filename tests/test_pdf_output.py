@@ -0,0 +1,103 @@
+import os
+import pikepdf
+import pytest
+from reportlab.pdfgen import canvas
+
+import pdf_output
+
+
+def make_pdf(path, pages=3):
+    c = canvas.Canvas(path)
+    for i in range(pages):
+        c.drawString(100, 750, f"Page {i + 1}")
+        c.showPage()
+    c.save()
+
+
+def test_save_pdf_threshold(tmp_path, monkeypatch):
+    source = str(tmp_path / "source.pdf")
+    make_pdf(source)
+
+    monkeypatch.setattr(pdf_output, 'LINEARIZE_MIN_BYTES', 10 ** 9)
+    with pikepdf.open(source) as pdf:
+        assert pdf_output.save_pdf(pdf, str(tmp_path / "small.pdf")) is False
+    assert not pdf_output.is_linearized(str(tmp_path / "small.pdf"))
+
+    # The source size decides by default
+    monkeypatch.setattr(pdf_output, 'LINEARIZE_MIN_BYTES', 1)
+    with pikepdf.open(source) as pdf:
+        assert pdf_output.save_pdf(pdf, str(tmp_path / "large.pdf")) is True
+    assert pdf_output.is_linearized(str(tmp_path / "large.pdf"))
+
+    # Disabled, unless forced
+    monkeypatch.setattr(pdf_output, 'LINEARIZE_MIN_BYTES', -1)
+    with pikepdf.open(source) as pdf:
+        assert pdf_output.save_pdf(pdf, str(tmp_path / "off.pdf")) is False
+        assert pdf_output.save_pdf(pdf, str(tmp_path / "forced.pdf"), linearize=True) is True
+
+
+def test_linearize_file_in_place(tmp_path, monkeypatch):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path)
+    monkeypatch.setattr(pdf_output, 'LINEARIZE_MIN_BYTES', 1)
+
+    assert pdf_output.linearize_file(path) is True
+    assert pdf_output.is_linearized(path)
+    with pikepdf.open(path) as pdf:
+        assert len(pdf.pages) == 3
+    # Already linearized: left as is
+    assert pdf_output.linearize_file(path) is True
+
+
+def test_merge_output_linearized(client, app, monkeypatch):
+    monkeypatch.setattr(pdf_output, 'LINEARIZE_MIN_BYTES', 1)
+    names = ["lin_a.pdf", "lin_b.pdf"]
+    for name in names:
+        make_pdf(os.path.join(app.config['UPLOAD_FOLDER'], name))
+
+    response = client.post('/merge', json={'filenames': names})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['stats']['linearized'] is True
+    assert pdf_output.is_linearized(os.path.join(app.config['OUTPUT_FOLDER'], data['filename']))
+
+
+@pytest.mark.parametrize('route,folder', [('/outputs', 'OUTPUT_FOLDER'), ('/uploads', 'UPLOAD_FOLDER')])
+def test_range_and_etag(client, app, route, folder):
+    path = os.path.join(app.config[folder], "ranged.pdf")
+    make_pdf(path, pages=20)
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    try:
+        response = client.get(f'{route}/ranged.pdf', headers={'Range': 'bytes=0-1023'})
+        assert response.status_code == 206
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert response.headers['Content-Range'] == f'bytes 0-1023/{size}'
+        assert response.data == content[:1024]
+        etag = response.headers['ETag']
+
+        # Revalidation and conditional ranges
+        assert client.get(f'{route}/ranged.pdf', headers={'If-None-Match': etag}).status_code == 304
+        response = client.get(f'{route}/ranged.pdf', headers={'Range': 'bytes=1024-', 'If-Range': etag})
+        assert response.status_code == 206
+        assert response.data == content[1024:]
+        response = client.get(f'{route}/ranged.pdf', headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        assert response.status_code == 200
+        assert response.data == content
+
+        assert client.get(f'{route}/ranged.pdf', headers={'Range': f'bytes={size + 10}-'}).status_code == 416
+    finally:
+        os.remove(path)
+
+
+def test_outputs_inline(client, app):
+    path = os.path.join(app.config['OUTPUT_FOLDER'], "inline.pdf")
+    make_pdf(path)
+    try:
+        assert client.get('/outputs/inline.pdf').headers['Content-Disposition'].startswith('attachment')
+        disposition = client.get('/outputs/inline.pdf?inline=1').headers.get('Content-Disposition', 'inline')
+        assert not disposition.startswith('attachment')
+    finally:
+        os.remove(path)
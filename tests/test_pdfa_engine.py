@@ -0,0 +1,94 @@
+import os
+
+import pikepdf
+import pytest
+from reportlab.pdfgen import canvas
+
+from pdfa_engine import pdfa_command, precheck
+
+
+def make_declared_pdfa(path, part='2'):
+    pdf = pikepdf.new()
+    pdf.add_blank_page()
+    with pdf.open_metadata() as meta:
+        meta['pdfaid:part'] = part
+        meta['pdfaid:conformance'] = 'B'
+    profile = pdf.make_stream(b'icc', N=3)
+    pdf.Root.OutputIntents = pikepdf.Array([pikepdf.Dictionary(
+        Type=pikepdf.Name('/OutputIntent'), S=pikepdf.Name('/GTS_PDFA1'),
+        OutputConditionIdentifier=pikepdf.String('sRGB'), DestOutputProfile=profile)])
+    pdf.save(path)
+
+
+def test_precheck(tmp_path):
+    declared = str(tmp_path / 'declared.pdf')
+    make_declared_pdfa(declared)
+    check = precheck(declared, '2b')
+    assert check['declared'] == '2B'
+    assert check['conformant']
+    # Part 2 does not satisfy a part 1 request
+    assert not precheck(declared, '1b')['conformant']
+
+    plain = str(tmp_path / 'plain.pdf')
+    c = canvas.Canvas(plain)
+    c.drawString(100, 750, "Standard 14 font, not embedded")
+    c.save()
+    check = precheck(plain, '2b')
+    assert not check['conformant']
+    assert check['declared'] is None
+    assert not check['output_intent']
+    assert check['unembedded_fonts'] == ['Helvetica']
+
+
+def test_pdfa_skips_conformant(client, upload_folder, output_folder):
+    make_declared_pdfa(os.path.join(upload_folder, 'archive.pdf'))
+
+    response = client.post('/pdf-to-pdfa', json={'filename': 'archive.pdf', 'level': '2b'})
+
+    assert response.status_code == 200
+    assert response.json['skipped'] is True
+    assert os.path.exists(os.path.join(output_folder, response.json['filename']))
+
+
+def test_pdfa_batch(client, upload_folder, output_folder):
+    for i in range(3):
+        make_declared_pdfa(os.path.join(upload_folder, f'archive{i}.pdf'))
+
+    response = client.post('/api/pdfa/batch', json={
+        'filenames': ['archive0.pdf', 'archive1.pdf', 'missing.pdf', 'archive2.pdf'],
+        'workers': 2, 'zip': True,
+    })
+
+    assert response.status_code == 200
+    data = response.json
+    assert [r['file'] for r in data['results']] == ['archive0.pdf', 'archive1.pdf', 'missing.pdf', 'archive2.pdf']
+    assert data['results'][2]['error'] == 'File not found'
+    assert all(data['results'][i]['skipped'] for i in (0, 1, 3))
+    assert data['stats']['files'] == 4
+    assert data['stats']['skipped'] == 3
+    assert data['stats']['failed'] == 1
+    assert 'zip_url' in data
+    assert client.post('/api/pdfa/batch', json={}).status_code == 400
+
+
+def test_pdfa_rejects_unknown_level(client, upload_folder, output_folder):
+    make_declared_pdfa(os.path.join(upload_folder, 'archive.pdf'))
+
+    response = client.post('/pdf-to-pdfa', json={'filename': 'archive.pdf', 'level': '../../escape'})
+    assert response.status_code == 400
+    response = client.post('/api/pdfa/batch', json={'filenames': ['archive.pdf'], 'level': '4b'})
+    assert response.status_code == 400
+    assert not [name for name in os.listdir(output_folder) if 'escape' in name or '4b' in name]
+    with pytest.raises(ValueError):
+        pdfa_command('in.pdf', 'out.pdf', '4b')
+
+
+def test_pdfa_batch_duplicate_names(client, upload_folder, output_folder):
+    make_declared_pdfa(os.path.join(upload_folder, 'archive.pdf'))
+
+    response = client.post('/api/pdfa/batch', json={'filenames': ['archive.pdf', 'archive.pdf', 'archive.pdf']})
+
+    assert response.status_code == 200
+    names = [r['filename'] for r in response.json['results']]
+    assert len(set(names)) == 3
+    assert all(os.path.exists(os.path.join(output_folder, name)) for name in names)
@@ -72,3 +72,277 @@ def test_pipeline_execution(client, upload_folder, output_folder):
             found = True
             break
     assert found
+
+def _run(client, filename, steps):
+    response = client.post('/api/pipeline/run', json={'filename': filename, 'steps': steps})
+    return [json.loads(line[6:]) for line in response.data.decode('utf-8').split('\n') if line.startswith('data: ')]
+
+def test_pipeline_chains_in_memory(client, upload_folder, output_folder):
+    input_path = os.path.join(upload_folder, 'chain_test.pdf')
+    pdf = pikepdf.new()
+    pdf.add_blank_page()
+    pdf.Root.Names = pikepdf.Dictionary({
+        '/JavaScript': pikepdf.Dictionary({'/Names': [pikepdf.String('x'), pikepdf.Dictionary(S=pikepdf.Name('/JavaScript'), JS=b"1")]})
+    })
+    pdf.save(input_path)
+    before = set(os.listdir(output_folder))
+
+    # Three in-memory steps: one output file, no intermediates
+    updates = _run(client, 'chain_test.pdf', [{'op': 'sanitize'}, {'op': 'flatten'}, {'op': 'compress'}])
+    assert updates[-1]['status'] == 'complete'
+    created = set(os.listdir(output_folder)) - before
+    assert len(created) == 1
+    output = created.pop()
+    assert output.startswith('pipeline_comp_')
+    with pikepdf.open(os.path.join(output_folder, output)) as result:
+        assert '/JavaScript' not in result.Root.Names
+
+    # A file-based step in the middle; its temporary files are removed too
+    before = set(os.listdir(output_folder))
+    updates = _run(client, 'chain_test.pdf', [
+        {'op': 'sanitize'}, {'op': 'compress', 'params': {'quality': 'screen'}}, {'op': 'flatten'}
+    ])
+    assert updates[-1]['status'] == 'complete'
+    created = set(os.listdir(output_folder)) - before
+    assert len(created) == 1 and created.pop().startswith('pipeline_flat_')
+
+    # Failures clean up as well
+    before = set(os.listdir(output_folder))
+    updates = _run(client, 'chain_test.pdf', [{'op': 'sanitize'}, {'op': 'compress', 'params': {'quality': 'screen'}}, {'op': 'nope'}])
+    assert updates[-1]['status'] == 'error'
+    assert set(os.listdir(output_folder)) == before
+
+def _make_pages(path, pages):
+    pdf = pikepdf.new()
+    for _ in range(pages):
+        pdf.add_blank_page()
+    pdf.save(path)
+
+def test_pipeline_dag_fan_out_and_in(upload_folder, output_folder):
+    import zipfile
+    from pipeline_executor import PipelineExecutor
+
+    _make_pages(os.path.join(upload_folder, 'dag_test.pdf'), 3)
+    before = set(os.listdir(output_folder))
+    steps = [
+        {'id': 'clean', 'op': 'sanitize'},
+        {'id': 'text', 'op': 'txt', 'after': 'clean'},
+        {'id': 'flat', 'op': 'flatten', 'after': 'clean'},
+        {'id': 'parts', 'op': 'split', 'params': {'mode': 'every', 'pages_per_part': 1}, 'after': 'clean'},
+        {'id': 'joined', 'op': 'merge', 'after': ['flat', 'parts']},
+    ]
+    # Two workers: the CPU-bound branches go to a process pool
+    updates = list(PipelineExecutor(upload_folder, output_folder, workers=2).execute('dag_test.pdf', steps))
+
+    assert updates[-1]['status'] == 'complete', updates[-1]
+    assert {u['step_id'] for u in updates if u['status'] == 'step_complete'} == {'clean', 'text', 'flat', 'parts', 'joined'}
+    outputs = {o['step_id']: o['filename'] for o in updates[-1]['outputs']}
+    assert set(outputs) == {'text', 'joined'}
+    with pikepdf.open(os.path.join(output_folder, outputs['joined'])) as result:
+        assert len(result.pages) == 6
+    with zipfile.ZipFile(os.path.join(output_folder, updates[-1]['download_url'])) as zf:
+        assert sorted(zf.namelist()) == sorted(outputs.values())
+
+    created = set(os.listdir(output_folder)) - before
+    assert len(created) == 3
+    assert not any(name.startswith('pipeline_tmp_') for name in created)
+
+def test_pipeline_plan(upload_folder, output_folder):
+    from pipeline_executor import PipelineExecutor
+    executor = PipelineExecutor(upload_folder, output_folder)
+
+    # A chain is one segment; a branch starts new ones
+    assert len(executor.plan([{'op': 'sanitize'}, {'op': 'compress', 'params': {'quality': 'screen'}}, {'op': 'flatten'}])) == 1
+    segments = executor.plan([
+        {'id': 'ocr', 'op': 'ocr'}, {'id': 'word', 'op': 'docx', 'after': 'ocr'}, {'id': 'tables', 'op': 'csv', 'after': 'ocr'},
+    ])
+    assert [s['id'] for s in segments] == ['ocr', 'word', 'tables']
+    assert segments[0]['cost'] == 'subprocess' and segments[1]['parents'] == ['ocr']
+
+    for steps in (
+        [{'op': 'txt'}, {'op': 'sanitize'}],                                  # txt -> pdf
+        [{'op': 'split', 'params': {'mode': 'every', 'pages_per_part': 1}}, {'op': 'flatten'}],  # several -> one
+        [{'id': 'a', 'op': 'sanitize', 'after': 'b'}, {'id': 'b', 'op': 'flatten', 'after': 'a'}],  # cycle
+        [{'id': 'a', 'op': 'sanitize', 'after': 'missing'}],
+        [{'op': 'nope'}],
+    ):
+        with pytest.raises(ValueError):
+            executor.plan(steps)
+
+def test_pipeline_operations_registry(client):
+    from pipeline_ops import OPERATIONS, COSTS
+    for name in ('ocr', 'split', 'merge', 'docx', 'csv', 'txt', 'translate', 'pdfa', 'images'):
+        assert OPERATIONS[name]['cost'] in COSTS
+
+    response = client.get('/api/pipeline/operations')
+    assert response.status_code == 200
+    merge = next(op for op in response.get_json()['operations'] if op['name'] == 'merge')
+    assert merge['inputs'] == ['pdf*'] and merge['outputs'] == ['pdf']
+
+def test_pipeline_cache_resumes_prefix(client, upload_folder, output_folder, monkeypatch):
+    import pipeline_ops
+
+    _make_pages(os.path.join(upload_folder, 'cache_test.pdf'), 2)
+    prefix = [{'op': 'sanitize'}, {'op': 'compress', 'params': {'quality': 'screen'}}]
+
+    updates = _run(client, 'cache_test.pdf', prefix + [{'op': 'flatten'}])
+    assert updates[-1]['status'] == 'complete'
+    assert updates[-1]['cache']['hits'] == 0
+    assert not any(u.get('cached') for u in updates)
+
+    # Same pipeline with the last step changed: the prefix is not run again
+    def fail(*args, **kwargs):
+        raise AssertionError("compress ran again")
+    monkeypatch.setattr(pipeline_ops, 'compress', fail)
+    updates = _run(client, 'cache_test.pdf', prefix + [{'op': 'compress', 'params': {}}])
+    assert updates[-1]['status'] == 'complete', updates[-1]
+    assert [u['step_name'] for u in updates if u.get('cached')] == ['sanitize', 'compress']
+    assert updates[-1]['cache']['hits'] == 2 and updates[-1]['cache']['misses'] == 1
+    with pikepdf.open(os.path.join(output_folder, updates[-1]['download_url'].rsplit('/', 1)[-1])) as result:
+        assert len(result.pages) == 2
+
+def test_pipeline_cache_resumes_in_memory_chain(client, upload_folder, output_folder, monkeypatch):
+    import pipeline_ops
+
+    # Every step runs on the open document, as the UI's operations do
+    _make_pages(os.path.join(upload_folder, 'memory_cache.pdf'), 2)
+    prefix = [{'op': 'sanitize'}, {'op': 'flatten'}]
+    updates = _run(client, 'memory_cache.pdf', prefix + [{'op': 'watermark', 'params': {'text': 'DRAFT'}}])
+    assert updates[-1]['status'] == 'complete', updates[-1]
+    assert updates[-1]['cache']['hits'] == 0
+
+    def fail(*args, **kwargs):
+        raise AssertionError("flatten ran again")
+    monkeypatch.setitem(pipeline_ops.OPERATIONS['flatten'], 'func', fail)
+    updates = _run(client, 'memory_cache.pdf', prefix + [{'op': 'stamp', 'params': {'text': 'PAID'}}])
+    assert updates[-1]['status'] == 'complete', updates[-1]
+    assert [u['step_name'] for u in updates if u.get('cached')] == ['sanitize', 'flatten']
+    assert updates[-1]['cache']['hits'] == 2 and updates[-1]['cache']['misses'] == 1
+
+def test_pipeline_cache_entry_pruned_before_run(client, upload_folder, output_folder, monkeypatch):
+    import pipeline_cache
+
+    _make_pages(os.path.join(upload_folder, 'pruned_test.pdf'), 2)
+    steps = [{'op': 'sanitize'}, {'op': 'flatten'}]
+    assert _run(client, 'pruned_test.pdf', steps[:1])[-1]['status'] == 'complete'
+
+    # Planning still sees the entry, but it is gone when the segment runs
+    monkeypatch.setattr(pipeline_cache.StepCache, 'get', lambda self, key, directory: None)
+    updates = _run(client, 'pruned_test.pdf', steps)
+
+    assert updates[-1]['status'] == 'complete', updates[-1]
+    assert updates[-1]['cache']['hits'] == 0 and updates[-1]['cache']['misses'] == 2
+    sanitize = [u for u in updates if u['status'] == 'progress' and u['step_name'] == 'sanitize']
+    assert sanitize[0]['cached'] and sanitize[-1]['cached'] is False
+
+def test_pipeline_cache_limits(tmp_path):
+    from pipeline_cache import StepCache, step_key
+
+    assert step_key(['a'], 'split', {'mode': 'every', 'ranges': None, 'pages_per_part': 1}) == \
+        step_key(['a'], 'split', {'pages_per_part': 1, 'mode': 'every'})
+    assert step_key(['a'], 'split', {'pages_per_part': 1}) != step_key(['b'], 'split', {'pages_per_part': 1})
+
+    source = tmp_path / 'out.pdf'
+    source.write_bytes(b'%PDF-1.4 ' + b'x' * 1000)
+    cache = StepCache(str(tmp_path / 'cache'), max_bytes=10 ** 6, max_entries=2)
+    for key in ('k1', 'k2', 'k3'):
+        cache.put(key, [str(source)])
+    assert not cache.contains('k1') and cache.contains('k3')
+    assert [os.path.basename(p) for p in cache.get('k3', str(tmp_path / 'restored'))] == ['out.pdf']
+
+    small = StepCache(str(tmp_path / 'small'), max_bytes=500)
+    small.put('big', [str(source)])
+    assert small.stats()['entries'] == 0
+    assert StepCache(str(tmp_path / 'off'), max_bytes=0).get('k3', str(tmp_path)) is None
+
+def test_pipeline_batch(client, upload_folder, output_folder):
+    import zipfile
+
+    names = [f'batch_{i}.pdf' for i in range(3)]
+    for i, name in enumerate(names):
+        _make_pages(os.path.join(upload_folder, name), i + 1)
+
+    response = client.post('/api/pipeline/batch', json={
+        'filenames': names + ['batch_missing.pdf'],
+        'steps': [{'op': 'sanitize'}, {'op': 'compress'}],
+        'workers': 2,
+        'zip': True,
+    })
+    assert response.status_code == 200
+    updates = [json.loads(line[6:]) for line in response.data.decode('utf-8').split('\n') if line.startswith('data: ')]
+
+    assert updates[0]['status'] == 'batch_start' and updates[0]['total_files'] == 4 and updates[0]['workers'] == 2
+    assert {u['file'] for u in updates if u['status'] == 'complete'} == set(names)
+    progress = [u for u in updates if u['status'] == 'batch_progress']
+    assert len(progress) == 4 and progress[-1]['percent'] == 100
+
+    final = updates[-1]
+    assert final['status'] == 'batch_complete'
+    assert final['completed'] == 3 and final['failed'] == 1
+    assert [r['file'] for r in final['results']] == names + ['batch_missing.pdf']
+    assert final['results'][-1]['status'] == 'error'
+
+    response = client.get(final['zip_url'])
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        members = zf.namelist()
+    assert len(members) == 3 and all(m.startswith('pipeline_comp_') for m in members)
+
+    assert client.post('/api/pipeline/batch', json={'filenames': names, 'steps': [{'op': 'nope'}]}).status_code == 400
+    assert client.post('/api/pipeline/batch', json={'filenames': [], 'steps': [{'op': 'sanitize'}]}).status_code == 400
+
+def test_batch_workers_bounded_by_memory(tmp_path, monkeypatch):
+    import worker_pool
+    import pipeline_executor
+
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(b'x' * 1024)
+    monkeypatch.setattr(worker_pool, 'default_workers', lambda limit=None: min(8, limit or 8))
+    monkeypatch.setattr(worker_pool, 'available_memory', lambda: None)
+    assert pipeline_executor.batch_workers([str(path)] * 20) == 8
+    assert pipeline_executor.batch_workers([str(path)] * 3) == 3
+
+    monkeypatch.setattr(worker_pool, 'available_memory', lambda: 3 * pipeline_executor.BATCH_MEMORY_BASE)
+    assert pipeline_executor.batch_workers([str(path)] * 20) == 2
+    monkeypatch.setattr(worker_pool, 'available_memory', lambda: 0)
+    assert pipeline_executor.batch_workers([str(path)] * 20) == 1
+
+def test_cpu_segments_serial_without_processes(upload_folder, output_folder, monkeypatch):
+    import time
+    import threading
+    import pipeline_ops
+    import pipeline_executor
+    from concurrent.futures import ThreadPoolExecutor
+    from pipeline_executor import PipelineExecutor
+
+    monkeypatch.setattr(pipeline_executor, 'can_spawn_processes', lambda: False)
+    cpu, threads = pipeline_executor.make_pools(4)
+    assert isinstance(cpu, ThreadPoolExecutor) and cpu._max_workers == 1
+    cpu.shutdown()
+    threads.shutdown()
+
+    # CPU steps may rely on process-wide state, so branches must not overlap in one process
+    running, overlaps = [], []
+    lock = threading.Lock()
+    flatten = pipeline_ops.OPERATIONS['flatten']['func']
+
+    def tracked(*args):
+        with lock:
+            running.append(1)
+            overlaps.append(len(running))
+        time.sleep(0.05)
+        try:
+            return flatten(*args)
+        finally:
+            with lock:
+                running.pop()
+
+    monkeypatch.setitem(pipeline_ops.OPERATIONS['flatten'], 'func', tracked)
+    _make_pages(os.path.join(upload_folder, 'serial.pdf'), 2)
+    steps = [{'id': 'clean', 'op': 'sanitize'}] + [
+        {'id': f'flat{i}', 'op': 'flatten', 'params': {'n': i}, 'after': 'clean'} for i in range(3)]
+    cache = pipeline_executor.StepCache(max_bytes=0)
+    updates = list(PipelineExecutor(upload_folder, output_folder, workers=4, cache=cache).execute('serial.pdf', steps))
+
+    assert updates[-1]['status'] == 'complete', updates[-1]
+    assert len(overlaps) == 3 and max(overlaps) == 1
@@ -0,0 +1,96 @@
+import os
+
+import fitz
+from reportlab.pdfgen import canvas
+
+from redaction_engine import build_patterns, find_matches, apply_redactions
+
+
+def make_pii_pdf(path, pages=3):
+    c = canvas.Canvas(path)
+    for i in range(pages):
+        c.drawString(72, 750, f"Page {i + 1} contact: jane.doe{i}@example.com")
+        c.drawString(72, 730, "Card 4111 1111 1111 1111, not a card 1234 5678 9012 3456")
+        c.drawString(72, 710, "SSN 123-45-6789 and the codename Bluebird")
+        c.showPage()
+    c.save()
+
+
+def test_apply_redactions_removes_text(client, upload_folder):
+    make_pii_pdf(os.path.join(upload_folder, 'pii.pdf'))
+
+    response = client.post('/api/apply_redactions', json={
+        'filename': 'pii.pdf',
+        'presets': ['email', 'credit_card', 'ssn'],
+        'terms': ['bluebird'],
+        'redactions': [{'pageIndex': 0, 'x': 72, 'y': 20, 'width': 200, 'height': 30}],
+    })
+
+    assert response.status_code == 200
+    data = response.json
+    assert data['filename'].startswith('redacted_')
+    assert 'download_url' in data
+    # email, Luhn-valid card, SSN and term on each page
+    assert data['hits_per_page'] == {'1': 4, '2': 4, '3': 4}
+    assert data['total_hits'] == 12
+    assert data['pages_redacted'] == 3
+
+    with fitz.open(os.path.join(upload_folder, data['filename'])) as doc:
+        for page in doc:
+            text = page.get_text()
+            assert '@example.com' not in text
+            assert '4111 1111' not in text
+            assert '123-45-6789' not in text
+            assert 'Bluebird' not in text
+            # Unmatched text stays
+            assert '1234 5678 9012 3456' in text
+            assert 'Page' in text
+            assert not list(page.annots())
+
+
+def test_find_matches_parallel_chunks(tmp_path):
+    path = str(tmp_path / 'pii.pdf')
+    make_pii_pdf(path, pages=7)
+    patterns = build_patterns(patterns=[r'jane\.doe\d@'], case_sensitive=True)
+
+    found = find_matches(path, patterns, workers=2, chunk_size=2)
+
+    assert sorted(found) == list(range(7))
+    assert [m['text'] for m in found[6]] == ['jane.doe6@']
+
+    output = str(tmp_path / 'out.pdf')
+    report = apply_redactions(path, output, found)
+    assert report['total_hits'] == 7
+
+
+def test_apply_redactions_validation(client, upload_folder):
+    make_pii_pdf(os.path.join(upload_folder, 'pii.pdf'), pages=1)
+
+    assert client.post('/api/apply_redactions', json={'filename': 'pii.pdf'}).status_code == 400
+    response = client.post('/api/apply_redactions', json={'filename': 'pii.pdf', 'presets': ['passport']})
+    assert response.status_code == 400
+    response = client.post('/api/apply_redactions', json={'filename': 'pii.pdf', 'patterns': ['(']})
+    assert response.status_code == 400
+
+    preview = client.post('/api/apply_redactions', json={'filename': 'pii.pdf', 'presets': ['ssn'], 'preview': True})
+    assert preview.json['total_hits'] == 1
+    assert preview.json['matches']['1'][0]['text'] == '123-45-6789'
+
+
+def test_phone_preset_skips_dates_amounts_and_versions(tmp_path):
+    path = str(tmp_path / 'numbers.pdf')
+    c = canvas.Canvas(path)
+    lines = [
+        "Call +1 555 123 4567 or (555) 123-4567, fax 555.123.4567",
+        "Signed 2023-10-19, due 19.10.2023",
+        "Total 1 234 567.00 EUR, deposit 12 345 678.90",
+        "Built with version 10.20.30 on host 192.168.10.20",
+        "SSN 123-45-6789",
+    ]
+    for i, line in enumerate(lines):
+        c.drawString(72, 750 - 20 * i, line)
+    c.save()
+
+    found = find_matches(path, build_patterns(presets=['phone']), workers=1)
+
+    assert [m['text'] for m in found[0]] == ['+1 555 123 4567', '(555) 123-4567', '555.123.4567']
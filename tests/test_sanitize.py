@@ -64,3 +64,78 @@ def test_sanitize_full(client, upload_folder, output_folder):
             assert False, "JS Names tree should be removed"
         
     clean_pdf.close()
+
+def make_hostile_pdf(path):
+    """Active content outside the usual places: outline actions, /Next chains, widgets, attachments, layers."""
+    pdf = pikepdf.new()
+    pdf.add_blank_page()
+    pdf.add_blank_page()
+    js = pdf.make_indirect(pikepdf.Dictionary(S=pikepdf.Name('/JavaScript'), JS=b"app.alert(1)"))
+    launch = pikepdf.Dictionary(S=pikepdf.Name('/Launch'), F=b"calc.exe")
+    uri = pikepdf.Dictionary(S=pikepdf.Name('/URI'), URI=b"http://example.com")
+    goto = pikepdf.Dictionary(S=pikepdf.Name('/GoTo'), D=[pdf.pages[1].obj, pikepdf.Name('/Fit')], Next=js)
+
+    pdf.Root.OpenAction = goto
+    pdf.pages[0].Annots = pdf.make_indirect(pikepdf.Array([
+        pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name('/Annot'), Subtype=pikepdf.Name('/Link'),
+                                             Rect=[0, 0, 10, 10], A=uri)),
+        pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name('/Annot'), Subtype=pikepdf.Name('/Widget'),
+                                             Rect=[0, 0, 10, 10], AA=pikepdf.Dictionary(K=js, Fo=launch))),
+        pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name('/Annot'), Subtype=pikepdf.Name('/FileAttachment'),
+                                             Rect=[0, 0, 10, 10], FS=pikepdf.Dictionary(
+                                                 Type=pikepdf.Name('/Filespec'), F=b"payload.exe",
+                                                 EF=pikepdf.Dictionary(F=pikepdf.Stream(pdf, b"MZ"))))),
+    ]))
+    outline = pdf.make_indirect(pikepdf.Dictionary(Title=b"Chapter", A=launch))
+    pdf.Root.Outlines = pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name('/Outlines'), First=outline, Last=outline, Count=1))
+    ocg = pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name('/OCG'), Name=b"Hidden"))
+    pdf.Root.OCProperties = pikepdf.Dictionary(OCGs=[ocg], D=pikepdf.Dictionary(OFF=[ocg]))
+    with pdf.open_metadata() as meta:
+        meta['dc:title'] = 'Hostile'
+    pdf.docinfo['/Author'] = 'Someone'
+    pdf.save(path)
+
+
+def test_sanitize_engine_single_pass(tmp_path):
+    from sanitize_engine import SanitizePolicy, sanitize
+
+    path = str(tmp_path / 'hostile.pdf')
+    make_hostile_pdf(path)
+
+    with pikepdf.open(path) as pdf:
+        report = sanitize(pdf, SanitizePolicy.all(), apply=False)
+        assert report['objects_visited'] == len(pdf.objects) + 1
+        # Dry run reports without touching the document
+        assert report['counts'] == {'javascript': 1, 'launch': 2, 'uri': 1, 'embedded_files': 1,
+                                    'metadata': 1, 'optional_content': 1}
+        assert '/OpenAction' in pdf.Root
+
+        report = sanitize(pdf, SanitizePolicy.all())
+        pdf.save(str(tmp_path / 'clean.pdf'))
+
+    with pikepdf.open(str(tmp_path / 'clean.pdf')) as clean:
+        assert '/Next' not in clean.Root.OpenAction
+        link, widget, attachment = clean.pages[0].Annots
+        assert '/A' not in link and '/AA' not in widget and '/EF' not in attachment.FS
+        assert '/A' not in clean.Root.Outlines.First
+        assert '/OCProperties' not in clean.Root and '/Metadata' not in clean.Root
+        assert '/Author' not in clean.docinfo
+        for obj in clean.objects:
+            if isinstance(obj, pikepdf.Dictionary):
+                assert '/JS' not in obj
+
+
+def test_sanitize_policy_selects(tmp_path, client, upload_folder):
+    from sanitize_engine import SanitizePolicy, sanitize
+
+    path = os.path.join(upload_folder, 'hostile.pdf')
+    make_hostile_pdf(path)
+    with pikepdf.open(path) as pdf:
+        report = sanitize(pdf, SanitizePolicy(uri_actions=True))
+        assert report['counts'] == {'uri': 1}
+        assert '/Next' in pdf.Root.OpenAction and '/OCProperties' in pdf.Root
+
+    # The route maps its form flags onto the policy
+    response = client.post('/api/sanitize', data={'filename': 'hostile.pdf', 'remove_actions': 'true'})
+    assert response.status_code == 200
+    assert response.json['counts'] == {'launch': 2, 'uri': 1}
@@ -63,3 +63,89 @@ def test_split_invalid_ranges(client, app):
         
     finally:
         if os.path.exists(path): os.remove(path)
+
+def test_split_every_n_pages_streamed(client, app):
+    pdf = "split_every.pdf"
+    create_dummy_pdf(os.path.join(app.config['UPLOAD_FOLDER'], pdf), pages=7)
+
+    response = client.post('/split', json={'filename': pdf, 'mode': 'every', 'pages_per_part': 3, 'stream': True})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    import io
+    import pikepdf
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert zf.namelist() == ['split_every_part1_1-3.pdf', 'split_every_part2_4-6.pdf', 'split_every_part3_7-7.pdf']
+        page_counts = [len(pikepdf.open(io.BytesIO(zf.read(name))).pages) for name in zf.namelist()]
+    assert page_counts == [3, 3, 1]
+
+def test_split_by_bookmarks(client, app):
+    pdf = "split_chapters.pdf"
+    c = canvas.Canvas(os.path.join(app.config['UPLOAD_FOLDER'], pdf))
+    for i in range(1, 7):
+        if i in (2, 5):
+            c.bookmarkPage(f"ch{i}")
+            c.addOutlineEntry(f"Chapter {i}", f"ch{i}")
+        c.drawString(100, 750, f"Page {i}")
+        c.showPage()
+    c.save()
+
+    response = client.post('/split', json={'filename': pdf, 'mode': 'bookmarks'})
+
+    assert response.status_code == 200
+    parts = response.get_json()['parts']
+    assert [p['pages'] for p in parts] == [[1, 1], [2, 4], [5, 6]]
+    assert parts[1]['filename'] == 'split_chapters_part2_Chapter_2.pdf'
+
+def test_split_by_max_size(client, app, tmp_path):
+    """Pages carrying distinct images are grouped so each part stays under the limit."""
+    from PIL import Image
+    pdf = "split_size.pdf"
+    c = canvas.Canvas(os.path.join(app.config['UPLOAD_FOLDER'], pdf))
+    for i in range(6):
+        image_path = str(tmp_path / f"noise_{i}.png")
+        Image.effect_noise((200, 200), 80 + i).save(image_path)
+        c.drawImage(image_path, 100, 400)
+        c.showPage()
+    c.save()
+    max_bytes = 100 * 1024
+
+    response = client.post('/split', json={'filename': pdf, 'mode': 'size', 'max_bytes': max_bytes})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['parts']) > 1
+    with zipfile.ZipFile(os.path.join(app.config['OUTPUT_FOLDER'], data['filename'])) as zf:
+        sizes = [info.file_size for info in zf.infolist()]
+    assert all(size <= max_bytes for size in sizes)
+    assert sum(p['pages'][1] - p['pages'][0] + 1 for p in data['parts']) == 6
+
+def test_split_unknown_mode(client, app):
+    pdf = "split_mode.pdf"
+    create_dummy_pdf(os.path.join(app.config['UPLOAD_FOLDER'], pdf), pages=2)
+    response = client.post('/split', json={'filename': pdf, 'mode': 'chapters'})
+    assert response.status_code == 400
+
+def test_bookmark_parts_follow_goto_actions(tmp_path):
+    """hyperref-style bookmarks: /GoTo actions to named destinations, and a /Root/Dests name."""
+    import pikepdf
+    from split_engine import bookmark_parts
+
+    path = str(tmp_path / "thesis.pdf")
+    create_dummy_pdf(path, pages=6)
+    with pikepdf.open(path) as pdf:
+        pages = [page.obj for page in pdf.pages]
+        dests = pikepdf.NameTree.new(pdf)
+        dests['chapter.1'] = pikepdf.Dictionary(D=pikepdf.Array([pages[1], pikepdf.Name.Fit]))
+        pdf.Root.Names = pikepdf.Dictionary(Dests=dests.obj)
+        pdf.Root.Dests = pikepdf.Dictionary(appendix=pikepdf.Array([pages[4], pikepdf.Name.Fit]))
+        with pdf.open_outline() as outline:
+            chapter = pikepdf.OutlineItem("Chapter 1")
+            chapter.action = pikepdf.Dictionary(S=pikepdf.Name.GoTo, D=pikepdf.String('chapter.1'))
+            outline.root.append(chapter)
+            outline.root.append(pikepdf.OutlineItem("Appendix", pikepdf.Name('/appendix')))
+
+        parts = bookmark_parts(pdf)
+
+    assert [(p['label'], p['start'], p['end']) for p in parts] == [
+        ('Front matter', 0, 1), ('Chapter 1', 1, 4), ('Appendix', 4, 6)]
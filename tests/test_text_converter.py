@@ -0,0 +1,93 @@
+import os
+import pytest
+from unittest.mock import patch
+from reportlab.pdfgen import canvas
+
+from converters import pdf_to_txt
+from converters.ocr_fallback import PageOcr
+from converters.text_engines import available_engines, iter_page_texts, resolve_engine
+
+
+def create_pdf(path, page_texts):
+    """Creates a PDF where an empty string produces a page without text."""
+    c = canvas.Canvas(path)
+    for text in page_texts:
+        if text:
+            c.drawString(100, 750, text)
+        c.showPage()
+    c.save()
+
+
+def test_ocr_pages_renders_grayscale_in_bounded_pool(tmp_path):
+    pdf_path = str(tmp_path / "scan.pdf")
+    create_pdf(pdf_path, [""] * 6)
+
+    seen = []
+
+    def fake_recognize(self, pix):
+        # Raw 8-bit grayscale buffer, no alpha
+        assert pix.n == 1
+        assert len(pix.samples) == pix.stride * pix.height
+        seen.append(pix.width)
+        return f"text {pix.width}x{pix.height}"
+
+    with patch.object(PageOcr, '_recognize', fake_recognize):
+        with PageOcr(pdf_path, dpi=72, workers=2) as ocr:
+            assert ocr.max_in_flight == 4
+            results = ocr.ocr_pages([0, 2, 3, 5])
+
+    assert sorted(results) == [0, 2, 3, 5]
+    assert all(text.startswith("text ") for text in results.values())
+    assert len(seen) == 4
+
+
+def test_ocr_failure_yields_empty_text(tmp_path):
+    pdf_path = str(tmp_path / "scan.pdf")
+    create_pdf(pdf_path, [""])
+
+    with patch.object(PageOcr, '_recognize', side_effect=RuntimeError("tesseract missing")):
+        with PageOcr(pdf_path, dpi=72) as ocr:
+            assert ocr.ocr_pages([0]) == {0: ''}
+
+
+def test_pdf_to_txt_ocrs_only_empty_pages(tmp_path):
+    pdf_path = str(tmp_path / "mixed.pdf")
+    create_pdf(pdf_path, ["Native text layer", "", "More native text"])
+
+    with patch('converters.text_converter.OCR_AVAILABLE', True), \
+         patch.object(PageOcr, 'ocr_pages', return_value={1: 'Recognized text'}) as mock_ocr:
+        files = pdf_to_txt(pdf_path, str(tmp_path))
+
+    mock_ocr.assert_called_once_with([1])
+    content = (tmp_path / files[0]).read_text(encoding='utf-8')
+    assert "--- Page 1 ---\nNative text layer" in content
+    assert "--- Page 2 ---\nRecognized text" in content
+    assert "--- Page 3 ---\nMore native text" in content
+
+
+@pytest.mark.parametrize("engine", available_engines())
+def test_text_engines_extract_pages_in_order(tmp_path, engine):
+    pdf_path = str(tmp_path / "engines.pdf")
+    create_pdf(pdf_path, [f"Engine page {i}" for i in range(1, 8)])
+
+    texts = list(iter_page_texts(pdf_path, engine=engine, chunk_size=3, workers=2))
+
+    assert len(texts) == 7
+    for i, text in enumerate(texts, start=1):
+        assert f"Engine page {i}" in text
+
+
+def test_resolve_engine_rejects_unknown():
+    with pytest.raises(ValueError):
+        resolve_engine('acrobat')
+    assert resolve_engine() in available_engines()
+
+
+def test_pdf_to_txt_engine_option(tmp_path):
+    pdf_path = str(tmp_path / "plain.pdf")
+    create_pdf(pdf_path, ["First page text", "Second page text"])
+
+    files = pdf_to_txt(pdf_path, str(tmp_path), {'engine': 'pdfplumber', 'page_separator': False})
+
+    content = (tmp_path / files[0]).read_text(encoding='utf-8')
+    assert content == "First page text\nSecond page text"
@@ -0,0 +1,75 @@
+import os
+import json
+
+import fitz
+import pikepdf
+from reportlab.pdfgen import canvas
+
+from watermark_engine import Watermark, apply_watermark
+
+
+def make_pages_pdf(path, pages):
+    c = canvas.Canvas(path)
+    for i in range(pages):
+        c.drawString(72, 750, f"Page {i + 1}")
+        c.showPage()
+    c.save()
+
+
+def test_watermark_endpoint(client, upload_folder, output_folder):
+    make_pages_pdf(os.path.join(upload_folder, 'doc.pdf'), 4)
+
+    response = client.post('/api/watermark', json={
+        'filename': 'doc.pdf', 'text': 'DRAFT', 'pages': ['2-end'],
+    })
+
+    assert response.status_code == 200
+    assert response.json['pages'] == 3
+    with fitz.open(os.path.join(output_folder, response.json['filename'])) as doc:
+        assert 'DRAFT' not in doc[0].get_text()
+        for page in doc.pages(1):
+            assert 'DRAFT' in page.get_text()
+            # The original content is still drawn
+            assert 'Page' in page.get_text()
+
+    assert client.post('/api/watermark', json={'filename': 'doc.pdf', 'color': 'red'}).status_code == 400
+    assert client.post('/api/watermark', json={'filename': 'doc.pdf', 'pages': ['x']}).status_code == 400
+
+
+def test_watermark_shares_one_xobject(tmp_path):
+    sizes = {}
+    for pages in (10, 200):
+        source = str(tmp_path / f'src{pages}.pdf')
+        make_pages_pdf(source, pages)
+        output = str(tmp_path / f'out{pages}.pdf')
+        with pikepdf.open(source) as pdf:
+            report = apply_watermark(pdf, Watermark(text='CONFIDENTIAL'))
+            pdf.save(output)
+        assert report['pages'] == pages
+        # Same-size pages share one placement stream
+        assert report['placements'] == 1
+        sizes[pages] = os.path.getsize(output) - os.path.getsize(source)
+
+        with pikepdf.open(output) as pdf:
+            forms = {page.Resources.XObject.Wm0.objgen for page in pdf.pages}
+            assert len(forms) == 1
+
+    # A few bytes of references per page, not a copy of the drawing
+    assert sizes[200] - sizes[10] < 190 * 40
+
+
+def test_stamp_pipeline_step(client, upload_folder, output_folder):
+    from pipeline_ops import OPERATIONS
+    assert OPERATIONS['stamp']['in_memory'] and OPERATIONS['watermark']['in_memory']
+
+    make_pages_pdf(os.path.join(upload_folder, 'doc.pdf'), 2)
+    response = client.post('/api/pipeline/run', json={
+        'filename': 'doc.pdf', 'steps': [{'op': 'stamp', 'params': {'text': 'PAID'}}],
+    })
+    assert response.status_code == 200
+    updates = [json.loads(line[6:]) for line in response.data.decode().split('\n') if line.startswith('data: ')]
+    assert updates[-1]['status'] == 'complete'
+
+    output_path = os.path.join(output_folder, os.path.basename(updates[-1]['download_url']))
+    with fitz.open(output_path) as doc:
+        assert all('PAID' in page.get_text() for page in doc)
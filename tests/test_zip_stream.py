@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+from zip_stream import iter_zip, write_zip
+
+
+def test_iter_zip_streams_valid_archive(tmp_path):
+    docx = tmp_path / "report.docx"
+    docx.write_bytes(b"PK fake docx " * 1000)
+    text = b"line of text\n" * 20000
+
+    chunks = list(iter_zip([
+        ('report.docx', str(docx)),
+        ('notes.txt', text),
+        ('pages.txt', (b"page %d\n" % i for i in range(100))),
+        ('missing.pdf', str(tmp_path / "missing.pdf")),
+    ]))
+
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.namelist() == ['report.docx', 'notes.txt', 'pages.txt']
+        assert zf.read('report.docx') == docx.read_bytes()
+        assert zf.read('notes.txt') == text
+        assert zf.read('pages.txt').startswith(b"page 0\npage 1\n")
+        # Already-compressed formats are stored, the rest deflated
+        assert zf.getinfo('report.docx').compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo('notes.txt').compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_write_zip_skips_missing_files(tmp_path):
+    image = tmp_path / "page_1.jpg"
+    image.write_bytes(b"\xff\xd8fake")
+    zip_path = tmp_path / "out.zip"
+
+    count = write_zip(str(zip_path), [('page_1.jpg', str(image)), ('page_2.jpg', str(tmp_path / "nope.jpg"))])
+
+    assert count == 1
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.namelist() == ['page_1.jpg']
+
+
+def test_create_zip_endpoint_streams_outputs(client, app):
+    import os
+    for name in ('a.docx', 'b.docx'):
+        with open(os.path.join(app.config['OUTPUT_FOLDER'], name), 'wb') as f:
+            f.write(name.encode() * 100)
+
+    response = client.post('/create_zip', json={'filenames': ['a.docx', 'b.docx']})
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert zf.namelist() == ['a.docx', 'b.docx']